@@ -1,21 +1,126 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, g
 from werkzeug.utils import secure_filename
+from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import os
+import sys
+import json
+import gzip
 import uuid
-from document_processor import process_document, generate_quiz, answer_question
+import time
+import hashlib
+import itertools
+import tarfile
+import zipfile
+import threading
+import click
+from document_processor import (ingest_document, replan_document, build_quiz_pool,
+                                retrieve_passages, validate_dates, load_material_indexes,
+                                materialize_plan)
+from quiz import sample_quiz, new_seed, QUESTION_COUNTS
+from content_model import parse_chunk_ranges
+from jobs import JobQueue
+import batch_ingest
+import crawler
+import progress
+import shared_cache
+import text_cache
+from models import db, User, Material, PlanDay, QuizItem, MaterialProgress
+import config
+import nlp
+import metrics
+import profiler
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this for production
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+app.config['SQLALCHEMY_DATABASE_URI'] = config.DATABASE_URL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': config.DATABASE_POOL_SIZE,
+    'pool_pre_ping': True
+}
+
+db.init_app(app)
+with app.app_context():
+    db.create_all()
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# In-memory databases (replace with real DB in production)
-users = {}
-study_materials = {}
+# NLTK loads on first use; preloading suits servers that fork workers from
+# an already-imported app (e.g. gunicorn --preload), which then share it
+if config.NLTK_PRELOAD:
+    nlp.warm()
+
+# Token, search and distractor indexes ('indexes') and quiz pools
+# ('quiz_pool'), keyed by content key and shared by all workers through
+# CACHE_BACKEND. Materials themselves live in the database; indexes are
+# rebuilt from the text cache when no worker has built them yet.
+object_cache = shared_cache.create_cache()
+
+# Per-process cross-material search indexes, keyed by username and bounded
+# by USER_SEARCH_MAX_BYTES (least recently searched go first); synced with
+# the user's materials in the database on every search
+user_search_indexes = shared_cache.LocalTier(config.USER_SEARCH_MAX_BYTES)
+# One lock per username serializes changes to that user's index;
+# user_search_lock only guards the dict of locks
+user_search_locks = {}
+user_search_lock = threading.Lock()
+
+# /get_study_plan paging
+PLAN_PAGE_DEFAULT = 30
+PLAN_PAGE_MAX = 400
+PLAN_FIRST_LINE_CHARS = 160
+
+# Background ingestion for /upload. Job status lives in the shared store, so
+# whichever worker receives a /jobs/<id> poll can answer it
+ingest_jobs = JobQueue(max_workers=config.INGEST_WORKERS, mode=config.INGEST_EXECUTOR,
+                       retention_seconds=config.JOB_RETENTION_SECONDS, store=object_cache.shared)
+
+# Per-route latency, stage timings (also sent as a Server-Timing header) and
+# the optional slow-request profiler
+stack_sampler = profiler.StackSampler(config.PROFILE_INTERVAL_SECONDS)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+    if config.PROFILE_SLOW_REQUEST_SECONDS > 0:
+        stack_sampler.track(threading.get_ident())
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUEST_SECONDS.observe(elapsed, route=route, method=request.method,
+                                    status=str(response.status_code))
+    
+    stages = metrics.finish_request()
+    if stages:
+        response.headers['Server-Timing'] = metrics.server_timing(stages)
+    
+    if config.PROFILE_SLOW_REQUEST_SECONDS > 0:
+        samples = stack_sampler.untrack(threading.get_ident())
+        if samples and elapsed >= config.PROFILE_SLOW_REQUEST_SECONDS:
+            name = f"{request.endpoint or 'unmatched'}_{int(elapsed * 1000)}ms"
+            try:
+                path = profiler.write_folded(samples, config.PROFILE_FOLDER, name)
+                app.logger.warning("Slow request %s %s (%.2fs), stacks in %s",
+                                   request.method, request.path, elapsed, path)
+            except OSError as e:
+                app.logger.warning("Could not write profile for %s: %s", request.path, e)
+    return response
+
+@app.teardown_request
+def stop_request_profiling(exc):
+    if config.PROFILE_SLOW_REQUEST_SECONDS > 0:
+        stack_sampler.untrack(threading.get_ident())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return app.response_class(metrics.registry.render(),
+                              mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/')
 def index():
@@ -32,10 +137,11 @@ def register():
         if not username or not password:
             return render_template('register.html', error="Username and password are required")
         
-        if username in users:
+        if User.query.filter_by(username=username).first():
             return render_template('register.html', error="Username already exists")
         
-        users[username] = {'password': password, 'materials': []}
+        db.session.add(User(username=username, password_hash=generate_password_hash(password)))
+        db.session.commit()
         session['username'] = username
         return redirect(url_for('dashboard'))
     
@@ -47,7 +153,8 @@ def login():
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '').strip()
         
-        if username not in users or users[username]['password'] != password:
+        user = User.query.filter_by(username=username).first()
+        if not user or not check_password_hash(user.password_hash, password):
             return render_template('login.html', error="Invalid username or password")
         
         session['username'] = username
@@ -66,12 +173,347 @@ def dashboard():
         return redirect(url_for('login'))
     
     username = session['username']
-    user_materials = users.get(username, {}).get('materials', [])
+    
+    # Listing columns only; plan content stays in PlanDay
+    user_materials = db.session.query(Material.id, Material.filename, Material.created_at,
+                                      Material.overloaded) \
+        .join(User, Material.user_id == User.id) \
+        .filter(User.username == username) \
+        .order_by(Material.created_at) \
+        .all()
     
     return render_template('dashboard.html', 
                          username=username, 
                          materials=user_materials)
 
+def get_user_material(material_id):
+    """The session user's material with this id, or None"""
+    return Material.query.join(User, Material.user_id == User.id) \
+        .filter(Material.id == material_id, User.username == session.get('username')) \
+        .first()
+
+def get_material_indexes(material):
+    """MaterialIndexes (token, search and distractor indexes) for a material,
+    built once and shared by every worker"""
+    content_key = material.content_key or material.id
+    cached = object_cache.get('indexes', content_key)
+    if cached is not None:
+        return cached
+    
+    with metrics.span('index'):
+        cached = load_material_indexes(material.filepath, material.content_key)
+    object_cache.set('indexes', content_key, cached)
+    return cached
+
+def user_search_lock_for(username):
+    """Lock held while a user's search index is synced or changed"""
+    with user_search_lock:
+        return user_search_locks.setdefault(username, threading.Lock())
+
+def get_user_search_index(username):
+    """UserSearchIndex over all of a user's materials and {material id: Material}.
+
+    Materials added or deleted since the last search, by any worker, are
+    added to or removed from the index; the rest are left as they are.
+    """
+    # Imported here so app startup does not pay for NumPy and SciPy
+    from user_search import UserSearchIndex
+    
+    with user_search_lock_for(username):
+        search_index = user_search_indexes.get(username)
+        if search_index is None:
+            search_index = UserSearchIndex(config.SEARCH_HASH_FEATURES)
+        
+        materials = {
+            material.id: material
+            for material in Material.query.join(User, Material.user_id == User.id)
+                .filter(User.username == username).all()
+        }
+        indexed = search_index.material_ids()
+        metrics.cache_result('user_search', indexed == materials.keys())
+        
+        for material_id in indexed - materials.keys():
+            search_index.remove(material_id)
+        for material_id, material in materials.items():
+            if material_id not in indexed:
+                with metrics.span('index'):
+                    search_index.add(material_id, get_material_indexes(material).index)
+        
+        # Re-put so the LRU accounts for the index's current size
+        if not user_search_indexes.put(username, search_index, search_index.nbytes):
+            # Not kept, so every search by this user rebuilds it
+            metrics.CACHE_REJECTED.inc(cache='user_search')
+            app.logger.warning("Search index for %s (%d bytes) is over USER_SEARCH_MAX_BYTES",
+                               username, search_index.nbytes)
+    return search_index, materials
+
+def get_quiz_pool(material, difficulty):
+    """Question pool for a material and difficulty.
+
+    Served from the shared object cache when any worker has it; otherwise
+    read from QuizItem rows, or built and stored there when the rows are
+    missing or came from an older content key. difficulty must be one of
+    quiz.QUESTION_COUNTS.
+    """
+    if difficulty not in QUESTION_COUNTS:
+        raise ValueError(f"Unknown difficulty: {difficulty}")
+    
+    content_key = material.content_key or material.id
+    cached = object_cache.get('quiz_pool', f"{content_key}:{difficulty}")
+    if cached is not None:
+        return cached
+    
+    rows = QuizItem.query.filter_by(material_id=material.id, difficulty=difficulty) \
+        .order_by(QuizItem.position).all()
+    
+    stored = bool(rows) and all(row.content_key == content_key for row in rows)
+    metrics.cache_result('quiz_pool_db', stored)
+    if stored:
+        pool = [
+            {'question': row.question, 'options': row.options, 'correct_answer': row.correct_answer}
+            for row in rows
+        ]
+    else:
+        indexes = get_material_indexes(material)
+        pool = build_quiz_pool(content_key, difficulty, indexes.index, indexes.distractors)
+        
+        QuizItem.query.filter_by(material_id=material.id, difficulty=difficulty).delete()
+        db.session.add_all([
+            QuizItem(material_id=material.id, difficulty=difficulty, position=position,
+                     content_key=content_key, question=item['question'],
+                     options=item['options'], correct_answer=item['correct_answer'])
+            for position, item in enumerate(pool)
+        ])
+        db.session.commit()
+    
+    object_cache.set('quiz_pool', f"{content_key}:{difficulty}", pool)
+    return pool
+
+def plan_day_rows(material_id, study_plan, first_day_number=0):
+    """PlanDay column values for an iterable of day dicts"""
+    rows = [
+        {
+            'material_id': material_id,
+            'day_number': first_day_number + n,
+            'date': day['date'],
+            'duration_hours': day['duration_hours'],
+            'content': day['content'],
+            'recap': day.get('recap'),
+            'chunk_ranges': day.get('chunk_ranges'),
+            'completed_at': day.get('completed_at')
+        }
+        for n, day in enumerate(study_plan)
+    ]
+    progress.add_hours_through(rows)
+    return rows
+
+def insert_plan_days(material_id, study_plan, first_day_number=0):
+    """Bulk-insert plan days and return their total hours; the caller commits"""
+    rows = plan_day_rows(material_id, study_plan, first_day_number)
+    if rows:
+        db.session.execute(db.insert(PlanDay), rows)
+    return sum(row['duration_hours'] for row in rows)
+
+def material_row(material_id, user_id, filename, filepath, start_date, end_date, daily_hours,
+                 processed_data, skip_dates=None, weekday_hours=None):
+    """Material column values for a processed document"""
+    return {
+        'id': material_id,
+        'user_id': user_id,
+        'filename': filename,
+        'filepath': filepath,
+        'start_date': start_date,
+        'end_date': end_date,
+        'daily_hours': daily_hours,
+        'content_key': processed_data.get('content_key'),
+        'fingerprint': processed_data.get('fingerprint'),
+        'skip_dates': sorted(d.isoformat() for d in skip_dates or ()),
+        'weekday_hours': {str(k): v for k, v in (weekday_hours or {}).items()},
+        'word_count': processed_data['word_count'],
+        'estimated_hours': processed_data['estimated_hours'],
+        'available_hours': processed_data['available_hours'],
+        'overloaded': processed_data['overloaded'],
+        'content_summary': processed_data['content_summary']
+    }
+
+def is_url(filepath):
+    return filepath.startswith(('http://', 'https://'))
+
+def stored_copy(content_key, filepath):
+    """An already stored file with this content key, so identical uploads
+    share one copy on disk; filepath itself when there is none"""
+    if not content_key or is_url(filepath):
+        return filepath
+    paths = db.session.query(Material.filepath).distinct() \
+        .filter(Material.content_key == content_key, Material.filepath != filepath)
+    for (path,) in paths:
+        if not is_url(path) and os.path.exists(path):
+            return path
+    return filepath
+
+def remove_unreferenced_upload(filepath):
+    """Delete an uploaded file once no material points at it"""
+    if not is_url(filepath) and not Material.query.filter_by(filepath=filepath).count():
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+
+def discard_upload(filepath):
+    """remove_unreferenced_upload for a failed background job"""
+    with app.app_context():
+        remove_unreferenced_upload(filepath)
+
+def store_material(username, filename, filepath, start_date, end_date, daily_hours,
+                   processed_data, indexes, skip_dates=None, weekday_hours=None):
+    """Persist a processed material and its plan in one transaction and return its id.
+    
+    Content that is already stored is not kept twice: the material points
+    at the existing file (the near-duplicate named by processed_data's
+    'filepath', or another material's file with the same content key) and
+    the uploaded copy is removed.
+    """
+    material_id = str(uuid.uuid4())
+    
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise ValueError("User no longer exists")
+        
+        stored_path = processed_data.get('filepath') or filepath
+        if stored_path == filepath:
+            stored_path = stored_copy(processed_data.get('content_key'), filepath)
+        
+        db.session.add(Material(**material_row(material_id, user.id, filename, stored_path,
+                                               start_date, end_date, daily_hours,
+                                               processed_data, skip_dates, weekday_hours)))
+        db.session.flush()
+        planned_hours = insert_plan_days(
+            material_id, materialize_plan(stored_path, processed_data['study_plan'],
+                                          processed_data.get('content_key')))
+        db.session.add(MaterialProgress(**progress.progress_row(material_id, planned_hours)))
+        db.session.commit()
+        
+        if stored_path != filepath:
+            remove_unreferenced_upload(filepath)
+    
+    # Reused content has no fresh indexes; they are loaded when first needed
+    if indexes is not None:
+        object_cache.set('indexes', processed_data.get('content_key') or material_id, indexes)
+    return material_id
+
+def upload_result(username, material_id, processed_data):
+    """Job result of a single upload: the new material, whether its plan
+    needs more hours than the dates allow and, for a near-duplicate, the
+    id of the user's material whose content it reuses, so the client can
+    tell the user"""
+    result = {'material_id': material_id, 'overloaded': processed_data['overloaded'],
+              'duplicate_of': None}
+    if processed_data.get('duplicate_of'):
+        with app.app_context():
+            result['duplicate_of'] = db.session.query(Material.id) \
+                .join(User, Material.user_id == User.id) \
+                .filter(User.username == username,
+                        Material.content_key == processed_data['duplicate_of'],
+                        Material.id != material_id) \
+                .order_by(Material.created_at).limit(1).scalar()
+    return result
+
+def store_materials(username, processed, start_date, end_date, daily_hours,
+                    skip_dates=None, weekday_hours=None):
+    """Persist batch-ingested materials with multi-row inserts, committing
+    every BATCH_COMMIT_SIZE materials. processed is a list of
+    (Source, processed_data); returns the new material ids in order."""
+    material_ids = []
+    
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise ValueError("User no longer exists")
+        
+        for first in range(0, len(processed), config.BATCH_COMMIT_SIZE):
+            materials, plan_days, progress_rows = [], [], []
+            for source, processed_data in processed[first:first + config.BATCH_COMMIT_SIZE]:
+                material_id = str(uuid.uuid4())
+                material_ids.append(material_id)
+                materials.append(material_row(material_id, user.id, source.filename,
+                                              source.filepath, start_date, end_date,
+                                              daily_hours, processed_data, skip_dates,
+                                              weekday_hours))
+                rows = plan_day_rows(
+                    material_id, materialize_plan(source.filepath, processed_data['study_plan'],
+                                                  processed_data.get('content_key')))
+                plan_days.extend(rows)
+                progress_rows.append(progress.progress_row(
+                    material_id, sum(row['duration_hours'] for row in rows)))
+            
+            db.session.execute(db.insert(Material), materials)
+            if plan_days:
+                db.session.execute(db.insert(PlanDay), plan_days)
+            db.session.execute(db.insert(MaterialProgress), progress_rows)
+            db.session.commit()
+    
+    return material_ids
+
+def user_content_keys(username):
+    """content key -> material id for a user's materials, for batch dedupe"""
+    rows = db.session.query(Material.content_key, Material.id) \
+        .join(User, Material.user_id == User.id) \
+        .filter(User.username == username, Material.content_key.isnot(None)) \
+        .all()
+    return {content_key: material_id for content_key, material_id in rows}
+
+def user_fingerprints(username):
+    """content key -> (MinHash signature, filepath) of a user's materials that
+    are stored files, for spotting near-duplicate uploads"""
+    rows = db.session.query(Material.content_key, Material.fingerprint, Material.filepath) \
+        .join(User, Material.user_id == User.id) \
+        .filter(User.username == username, Material.content_key.isnot(None),
+                Material.fingerprint.isnot(None)) \
+        .all()
+    return {content_key: (fingerprint, filepath) for content_key, fingerprint, filepath in rows
+            if not is_url(filepath) and os.path.exists(filepath)}
+
+def finish_batch(username, sources, processed, report, start_date, end_date, daily_hours,
+                 skip_dates=None, weekday_hours=None):
+    """Store a batch's processed materials, add their ids to the report and
+    remove staged files that were not stored"""
+    material_ids = store_materials(username, processed, start_date, end_date, daily_hours,
+                                   skip_dates, weekday_hours)
+    results_by_path = {source.filepath: upload_result(username, material_id, processed_data)
+                       for (source, processed_data), material_id in zip(processed, material_ids)}
+    for source, entry in zip(sources, report):
+        if source.filepath in results_by_path:
+            entry.update(results_by_path[source.filepath])
+    batch_ingest.discard_staged(sources, report, app.config['UPLOAD_FOLDER'])
+    return {
+        'processed': sum(entry['status'] == 'processed' for entry in report),
+        'duplicates': sum(entry['status'] == 'duplicate' for entry in report),
+        'failed': sum(entry['status'] == 'failed' for entry in report),
+        'files': report
+    }
+
+def parse_schedule_options(form):
+    """Optional scheduling fields: skip_dates is a comma-separated list of
+    YYYY-MM-DD dates, weekday_hours seven comma-separated hour caps from
+    Monday to Sunday (blank entries use daily_hours)"""
+    skip_dates = set()
+    for value in form.get('skip_dates', '').split(','):
+        if value.strip():
+            skip_dates.add(datetime.strptime(value.strip(), '%Y-%m-%d').date())
+    
+    weekday_hours = {}
+    values = form.get('weekday_hours', '').strip()
+    if values:
+        values = values.split(',')
+        if len(values) != 7:
+            raise ValueError("weekday_hours needs 7 comma-separated values")
+        for weekday, value in enumerate(values):
+            if value.strip():
+                weekday_hours[weekday] = float(value)
+    
+    return skip_dates, weekday_hours
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'username' not in session:
@@ -86,6 +528,13 @@ def upload_file():
         if not start_date or not end_date:
             return jsonify({'error': 'Start and end dates are required'}), 400
         
+        # Reject bad dates now rather than in the background job
+        try:
+            validate_dates(start_date, end_date)
+            skip_dates, weekday_hours = parse_schedule_options(request.form)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Handle file upload
         file = request.files.get('file')
         url = request.form.get('url', '').strip()
@@ -102,41 +551,137 @@ def upload_file():
             
             # Validate file extension
             filename = secure_filename(file.filename)
-            if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in {'pdf', 'docx', 'txt'}:
+            if not batch_ingest.allowed_file(filename):
                 return jsonify({'error': 'Invalid file type'}), 400
             
             # Save file
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}_{filename}")
             file.save(filepath)
         
-        # Process document and create study plan
-        processed_data = process_document(filepath, start_date, end_date, daily_hours)
-        
-        # Store material
-        material_id = str(uuid.uuid4())
-        material_info = {
-            'id': material_id,
-            'filename': url if url else file.filename,
-            'filepath': filepath,
-            'start_date': start_date,
-            'end_date': end_date,
-            'daily_hours': daily_hours,
-            'processed_data': processed_data,
-            'created_at': datetime.now().isoformat()
-        }
+        # Extraction and planning run in the background; the client polls /jobs/<id>
+        username = session['username']
+        filename = url if url else file.filename
+        
+        if url and request.form.get('crawl') == '1':
+            # Follow same-site links; the crawled text is staged as a .txt file
+            if crawler.normalize_url(url) is None:
+                return jsonify({'error': 'Crawls need an http(s) URL'}), 400
+            # Blank or invalid limits use the configured ones
+            max_depth = request.form.get('crawl_depth', type=int)
+            max_pages = request.form.get('crawl_pages', type=int)
+            
+            def on_crawled(result):
+                snapshot_path, processed_data, indexes = result
+                # ingest_site removes the snapshot itself if the crawl fails
+                try:
+                    material_id = store_material(username, url, snapshot_path, start_date,
+                                                 end_date, daily_hours, processed_data, indexes,
+                                                 skip_dates, weekday_hours)
+                except Exception:
+                    discard_upload(snapshot_path)
+                    raise
+                return upload_result(username, material_id, processed_data)
+            
+            job_id = ingest_jobs.submit(crawler.ingest_site, url, app.config['UPLOAD_FOLDER'],
+                                        start_date, end_date, daily_hours, skip_dates,
+                                        weekday_hours, max_depth, max_pages,
+                                        user_fingerprints(username),
+                                        owner=username, on_success=on_crawled)
+            return jsonify({
+                'success': True,
+                'job_id': job_id
+            }), 202
+        
+        def on_success(result):
+            processed_data, indexes = result
+            material_id = store_material(username, filename, filepath, start_date, end_date,
+                                         daily_hours, processed_data, indexes,
+                                         skip_dates, weekday_hours)
+            return upload_result(username, material_id, processed_data)
+        
+        # A failed job leaves no material behind, so its upload goes too
+        job_id = ingest_jobs.submit(ingest_document, filepath, start_date, end_date, daily_hours,
+                                    skip_dates, weekday_hours, user_fingerprints(username),
+                                    owner=username, on_success=on_success,
+                                    on_failure=lambda e: discard_upload(filepath))
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/upload_batch', methods=['POST'])
+def upload_batch():
+    """Queue a batch: any number of files and .zip/.tar archives in 'files',
+    plus newline-separated URLs in 'urls', all on one schedule"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        start_date = request.form.get('start_date')
+        end_date = request.form.get('end_date')
+        daily_hours = float(request.form.get('daily_hours', 2))
+        
+        if not start_date or not end_date:
+            return jsonify({'error': 'Start and end dates are required'}), 400
+        
+        try:
+            validate_dates(start_date, end_date)
+            skip_dates, weekday_hours = parse_schedule_options(request.form)
+            sources = batch_ingest.url_sources(request.form.get('urls', '').splitlines())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        upload_folder = app.config['UPLOAD_FOLDER']
+        for file in request.files.getlist('files'):
+            filename = secure_filename(file.filename or '')
+            if batch_ingest.is_archive(filename):
+                archive_path = os.path.join(upload_folder, f"{uuid.uuid4()}_{filename}")
+                file.save(archive_path)
+                try:
+                    sources.extend(batch_ingest.stage_archive(archive_path, upload_folder))
+                except (ValueError, OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    return jsonify({'error': f"{file.filename}: {e}"}), 400
+                finally:
+                    os.remove(archive_path)
+            elif batch_ingest.allowed_file(filename):
+                filepath = os.path.join(upload_folder, f"{uuid.uuid4()}_{filename}")
+                file.save(filepath)
+                sources.append(batch_ingest.Source(file.filename, filepath))
+            else:
+                return jsonify({'error': f"Invalid file type: {file.filename}"}), 400
+        
+        if not sources:
+            return jsonify({'error': 'No files or URLs to ingest'}), 400
         
         username = session['username']
-        if username not in users:
-            users[username] = {'password': '', 'materials': []}
         
-        users[username]['materials'].append(material_info)
-        study_materials[material_id] = material_info
+        def on_success(result):
+            processed, report = result
+            return finish_batch(username, sources, processed, report, start_date, end_date,
+                                daily_hours, skip_dates, weekday_hours)
+        
+        def on_failure(error):
+            for source in sources:
+                discard_upload(source.filepath)
+        
+        job_id = ingest_jobs.submit(batch_ingest.ingest_batch, sources, start_date, end_date,
+                                    daily_hours, skip_dates, weekday_hours,
+                                    user_content_keys(username),
+                                    owner=username, on_success=on_success,
+                                    on_failure=on_failure)
         
         return jsonify({
             'success': True,
-            'material_id': material_id,
-            'study_plan': processed_data['study_plan']
-        })
+            'job_id': job_id,
+            'files': len(sources)
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -144,8 +689,74 @@ def upload_file():
             'error': str(e)
         }), 500
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = ingest_jobs.status(job_id)
+    if not job or job['owner'] != session['username']:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    result = job['result'] or {}
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job['status'],
+        'stage': job['stage'],
+        'current': job['current'],
+        'total': job['total'],
+        # A single upload reports its material, a batch its per-file report
+        'material_id': result.get('material_id'),
+        'overloaded': result.get('overloaded', False),
+        'duplicate_of': result.get('duplicate_of'),
+        'report': result if 'files' in result else None,
+        'error': job['error']
+    })
+
+def first_line(content):
+    """First sentence of a plan day, cut to PLAN_FIRST_LINE_CHARS"""
+    end = content.find('. ')
+    return content[:end + 1] if end >= 0 else content
+
+def plan_etag(material, *params):
+    """Weak ETag for a view of a material's plan: its plan version and the
+    request parameters, known before any plan day is read"""
+    key = ':'.join(str(part) for part in (material.id, material.plan_version) + params)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def set_cache_headers(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag):
+    """304 response when the client's If-None-Match already holds etag, else None"""
+    if request.if_none_match.contains_weak(etag):
+        return set_cache_headers(app.response_class(status=304), etag)
+    return None
+
+def cached_json(payload, etag):
+    """JSON response with a weak ETag, gzipped when accepted"""
+    with metrics.span('serialize'):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    
+    response = app.response_class(body, mimetype='application/json')
+    if 'gzip' in request.headers.get('Accept-Encoding', '') and len(body) > 1024:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return set_cache_headers(response, etag)
+
 @app.route('/get_study_plan')
 def get_study_plan():
+    """Study plan days for a material, a page at a time.
+
+    Query parameters: start/end (YYYY-MM-DD, inclusive) narrow the date
+    range, cursor is the day number to continue from, limit caps the page
+    size, and summary=1 returns content length and first line instead of
+    the full content (see /get_study_plan_day).
+    """
     if 'username' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
@@ -153,18 +764,209 @@ def get_study_plan():
     if not material_id:
         return jsonify({'error': 'Material ID required'}), 400
     
-    if material_id not in study_materials:
+    material = get_user_material(material_id)
+    if not material:
         return jsonify({'error': 'Material not found'}), 404
     
     try:
+        cursor = max(0, int(request.args.get('cursor', 0)))
+        limit = min(PLAN_PAGE_MAX, max(1, int(request.args.get('limit', PLAN_PAGE_DEFAULT))))
+    except ValueError:
+        return jsonify({'error': 'cursor and limit must be whole numbers'}), 400
+    summary = request.args.get('summary') == '1'
+    start = request.args.get('start')
+    end = request.args.get('end')
+    
+    # Revalidation needs no plan days at all
+    etag = plan_etag(material, cursor, limit, summary, start, end)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    try:
+        columns = [PlanDay.day_number, PlanDay.date, PlanDay.duration_hours, PlanDay.recap,
+                   PlanDay.completed_at]
+        if summary:
+            columns += [db.func.length(PlanDay.content),
+                        db.func.substr(PlanDay.content, 1, PLAN_FIRST_LINE_CHARS)]
+        else:
+            columns.append(PlanDay.content)
+        
+        query = db.session.query(*columns) \
+            .filter(PlanDay.material_id == material_id, PlanDay.day_number >= cursor)
+        if start:
+            query = query.filter(PlanDay.date >= start)
+        if end:
+            query = query.filter(PlanDay.date <= end)
+        
+        # One extra row tells us whether there is another page
+        rows = query.order_by(PlanDay.day_number).limit(limit + 1).all()
+        next_cursor = rows[limit][0] if len(rows) > limit else None
+        
+        study_plan = []
+        for row in rows[:limit]:
+            day = {'day_number': row[0], 'date': row[1], 'duration_hours': row[2],
+                   'recap': row[3], 'completed': row[4] is not None}
+            if summary:
+                day['content_length'] = row[5]
+                day['first_line'] = first_line(row[6])
+            else:
+                day['content'] = row[5]
+            study_plan.append(day)
+        
+        return cached_json({
+            'success': True,
+            'study_plan': study_plan,
+            'next_cursor': next_cursor
+        }, etag)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f"Failed to load study plan: {str(e)}"
+        }), 500
+
+@app.route('/get_study_plan_day')
+def get_study_plan_day():
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    material_id = request.args.get('material_id')
+    day_number = request.args.get('day', type=int)
+    if not material_id or day_number is None:
+        return jsonify({'error': 'Material ID and day are required'}), 400
+    
+    material = get_user_material(material_id)
+    if not material:
+        return jsonify({'error': 'Material not found'}), 404
+    
+    etag = plan_etag(material, 'day', day_number)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    day = PlanDay.query.filter_by(material_id=material_id, day_number=day_number).first()
+    if not day:
+        return jsonify({'error': 'Day not found'}), 404
+    
+    return cached_json({
+        'success': True,
+        'day': {
+            'day_number': day.day_number,
+            'date': day.date,
+            'duration_hours': day.duration_hours,
+            'content': day.content,
+            'recap': day.recap,
+            'completed': day.completed_at is not None
+        }
+    }, etag)
+
+@app.route('/complete_day', methods=['POST'])
+def complete_day():
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    material_id = request.form.get('material_id')
+    day_number = request.form.get('day', type=int)
+    if not material_id or day_number is None:
+        return jsonify({'error': 'Material ID and day are required'}), 400
+    
+    if not get_user_material(material_id):
+        return jsonify({'error': 'Material not found'}), 404
+    
+    completed_at = progress.record_completion(material_id, day_number)
+    if completed_at is None:
+        return jsonify({'error': 'Day not found'}), 404
+    
+    return jsonify({'success': True, 'day': day_number, 'completed_at': completed_at.isoformat()})
+
+@app.route('/replan', methods=['POST'])
+def replan():
+    """Re-schedule a material for new dates/hours without reprocessing it.
+
+    Completed days are kept as they are; only the remaining content is
+    spread over the new range.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        material_id = request.form.get('material_id')
+        if not material_id:
+            return jsonify({'error': 'Material ID required'}), 400
+        
+        material = get_user_material(material_id)
+        if not material:
+            return jsonify({'error': 'Material not found'}), 404
+        
+        start_date = request.form.get('start_date') or material.start_date
+        end_date = request.form.get('end_date') or material.end_date
+        try:
+            daily_hours = float(request.form.get('daily_hours', material.daily_hours))
+            if 'skip_dates' in request.form or 'weekday_hours' in request.form:
+                skip_dates, weekday_hours = parse_schedule_options(request.form)
+            else:
+                skip_dates = {datetime.strptime(d, '%Y-%m-%d').date() for d in material.skip_dates or ()}
+                weekday_hours = {int(k): v for k, v in (material.weekday_hours or {}).items()}
+            validate_dates(start_date, end_date)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        completed = PlanDay.query.filter(PlanDay.material_id == material_id,
+                                         PlanDay.completed_at.isnot(None)) \
+            .order_by(PlanDay.day_number).all()
+        completed_chunks = set()
+        for day in completed:
+            completed_chunks.update(parse_chunk_ranges(day.chunk_ranges))
+        
+        # Bad hours, a range with no study days left or a lost source
+        try:
+            plan = replan_document(material.filepath, start_date, end_date, daily_hours,
+                                   skip_dates, weekday_hours, completed_chunks,
+                                   material.content_key)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        kept_days = [
+            {
+                'date': day.date,
+                'content': day.content,
+                'recap': day.recap,
+                'duration_hours': day.duration_hours,
+                'chunk_ranges': day.chunk_ranges,
+                'completed_at': day.completed_at
+            }
+            for day in completed
+        ]
+        
+        PlanDay.query.filter_by(material_id=material_id).delete()
+        planned_hours = insert_plan_days(material_id, itertools.chain(
+            kept_days, materialize_plan(material.filepath, plan['study_plan'],
+                                        material.content_key)))
+        progress.record_replan(material_id, planned_hours)
+        
+        material.start_date = start_date
+        material.end_date = end_date
+        material.daily_hours = daily_hours
+        material.skip_dates = sorted(d.isoformat() for d in skip_dates)
+        material.weekday_hours = {str(k): v for k, v in weekday_hours.items()}
+        material.available_hours = plan['available_hours']
+        material.overloaded = plan['overloaded']
+        db.session.commit()
+        
         return jsonify({
             'success': True,
-            'study_plan': study_materials[material_id]['processed_data']['study_plan']
+            'material_id': material_id,
+            'days': len(kept_days) + len(plan['study_plan']),
+            'completed_days': len(kept_days),
+            'remaining_hours': plan['estimated_hours'],
+            'available_hours': plan['available_hours'],
+            'overloaded': plan['overloaded']
         })
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
-            'error': f"Failed to load study plan: {str(e)}"
+            'error': str(e)
         }), 500
 
 @app.route('/ask', methods=['POST'])
@@ -181,22 +983,100 @@ def ask_question():
         if not question:
             return jsonify({'error': 'Question cannot be empty'}), 400
         
-        if material_id not in study_materials:
+        material = get_user_material(material_id)
+        if not material:
             return jsonify({'error': 'Material not found'}), 404
         
-        answer = answer_question(study_materials[material_id]['filepath'], question)
+        top_k = min(10, max(1, int(request.form.get('top_k', 3))))
+        window = min(5, max(0, int(request.form.get('window', 0))))
+        
+        indexes = get_material_indexes(material)
+        passages = retrieve_passages(material.filepath, question,
+                                     indexes.index, indexes.search_index,
+                                     top_k=top_k, window=window)
+        
+        if passages is None:
+            answer = "No content available to answer the question."
+        elif not passages:
+            answer = "Answer not found in the material."
+        else:
+            answer = passages[0]['text']
         
+        with metrics.span('serialize'):
+            return jsonify({
+                'success': True,
+                'question': question,
+                'answer': answer,
+                'passages': passages or []
+            })
+    except Exception as e:
         return jsonify({
-            'success': True,
-            'question': question,
-            'answer': answer
-        })
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/ask_all', methods=['POST'])
+def ask_all_materials():
+    """Answer a question from whichever of the user's materials matches best"""
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        question = request.form.get('question', '').strip()
+        if not question:
+            return jsonify({'error': 'Question cannot be empty'}), 400
+        
+        top_k = min(20, max(1, int(request.form.get('top_k', 5))))
+        window = min(5, max(0, int(request.form.get('window', 0))))
+        
+        search_index, materials = get_user_search_index(session['username'])
+        with metrics.span('score'):
+            passages = search_index.search(question, top_k=top_k, window=window)
+        for passage in passages:
+            passage['filename'] = materials[passage['material_id']].filename
+        
+        with metrics.span('serialize'):
+            return jsonify({
+                'success': True,
+                'question': question,
+                'answer': passages[0]['text'] if passages else "Answer not found in your materials.",
+                'passages': passages
+            })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/delete_material', methods=['POST'])
+def delete_material():
+    if 'username' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    material_id = request.form.get('material_id')
+    if not material_id:
+        return jsonify({'error': 'Material ID required'}), 400
+    
+    material = get_user_material(material_id)
+    if not material:
+        return jsonify({'error': 'Material not found'}), 404
+    
+    # Plan days and quiz items go with it (ON DELETE CASCADE)
+    filepath = material.filepath
+    db.session.delete(material)
+    db.session.commit()
+    
+    # Cached indexes and quiz pools are keyed by content, which other
+    # materials may share; they age out of the cache on their own
+    with user_search_lock_for(session['username']):
+        search_index = user_search_indexes.get(session['username'])
+        if search_index is not None:
+            search_index.remove(material_id)
+    
+    remove_unreferenced_upload(filepath)
+    
+    return jsonify({'success': True, 'material_id': material_id})
+
 @app.route('/generate_quiz', methods=['POST'])
 def generate_quiz_route():
     if 'username' not in session:
@@ -209,15 +1089,28 @@ def generate_quiz_route():
         if not material_id:
             return jsonify({'error': 'Material ID required'}), 400
         
-        if material_id not in study_materials:
+        # Pools are stored per difficulty, so only the known ones are accepted
+        if difficulty not in QUESTION_COUNTS:
+            return jsonify({'error': f"Difficulty must be one of: {', '.join(QUESTION_COUNTS)}"}), 400
+        
+        material = get_user_material(material_id)
+        if not material:
             return jsonify({'error': 'Material not found'}), 404
         
-        quiz = generate_quiz(study_materials[material_id]['filepath'], difficulty)
+        try:
+            seed = int(request.form['seed']) if request.form.get('seed') else new_seed()
+        except ValueError:
+            return jsonify({'error': 'Seed must be an integer'}), 400
+        
+        pool = get_quiz_pool(material, difficulty)
+        with metrics.span('quiz_sample'):
+            quiz = sample_quiz(pool, difficulty, seed)
         
         return jsonify({
             'success': True,
             'quiz': quiz,
-            'difficulty': difficulty
+            'difficulty': difficulty,
+            'seed': seed
         })
     except Exception as e:
         return jsonify({
@@ -287,27 +1180,16 @@ def get_feedback():
         if not material_id:
             return jsonify({'error': 'Material ID required'}), 400
         
-        if material_id not in study_materials:
+        material = get_user_material(material_id)
+        if not material:
             return jsonify({'error': 'Material not found'}), 404
         
-        material = study_materials[material_id]
-        start_date = datetime.strptime(material['start_date'], '%Y-%m-%d')
-        end_date = datetime.strptime(material['end_date'], '%Y-%m-%d')
-        total_days = (end_date - start_date).days
-        days_passed = (datetime.now() - start_date).days
-        progress = min(100, max(0, int((days_passed / total_days) * 100)))
-        
-        feedback = {
-            'progress': progress,
-            'days_remaining': max(0, total_days - days_passed),
-            'estimated_completion': material['end_date'],
-            'on_track': progress >= (days_passed / total_days) * 100,
-            'suggestions': [
-                "Review your notes regularly",
-                "Complete all practice quizzes",
-                "Watch recommended videos for difficult topics"
-            ]
-        }
+        # Running totals plus one indexed lookup, however long the plan or history
+        today = datetime.now().date()
+        material_progress = progress.get_progress(material_id)
+        feedback = progress.build_feedback(material, material_progress,
+                                           progress.hours_due(material_id, today), today)
+        db.session.commit()
         
         return jsonify({
             'success': True,
@@ -319,5 +1201,90 @@ def get_feedback():
             'error': str(e)
         }), 500
 
+@app.cli.command('ingest-batch')
+@click.argument('username')
+@click.argument('sources', nargs=-1, required=True)
+@click.option('--start-date', required=True, help='YYYY-MM-DD')
+@click.option('--end-date', required=True, help='YYYY-MM-DD')
+@click.option('--daily-hours', type=float, default=2.0, show_default=True)
+@click.option('--workers', type=int, default=None, help='Defaults to BATCH_WORKERS')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False),
+              help='Write the per-file report to this JSON file')
+def ingest_batch_command(username, sources, start_date, end_date, daily_hours, workers,
+                         report_path):
+    """Bulk-import course material for USERNAME.
+
+    Each SOURCE is a directory (searched recursively), a .zip/.tar archive,
+    a single PDF/DOCX/TXT file, or a .urls file with one URL per line.
+    """
+    validate_dates(start_date, end_date)
+    if User.query.filter_by(username=username).first() is None:
+        raise click.ClickException(f"No such user: {username}")
+    
+    upload_folder = app.config['UPLOAD_FOLDER']
+    staged = []
+    for source in sources:
+        try:
+            staged.extend(batch_ingest.stage_sources(source, upload_folder))
+        except (ValueError, OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            raise click.ClickException(f"{source}: {e}")
+    
+    def report_progress(stage, current=None, total=None):
+        if total:
+            click.echo(f"\r{stage}: {current}/{total}", nl=current == total, err=True)
+    
+    processed, report = batch_ingest.ingest_batch(
+        staged, start_date, end_date, daily_hours, known_keys=user_content_keys(username),
+        max_workers=workers, progress=report_progress)
+    summary = finish_batch(username, staged, processed, report, start_date, end_date,
+                           daily_hours)
+    
+    for entry in summary['files']:
+        if entry['status'] == 'failed':
+            click.echo(f"failed: {entry['filename']}: {entry['error']}", err=True)
+    click.echo(f"{summary['processed']} processed, {summary['duplicates']} duplicates, "
+               f"{summary['failed']} failed")
+    
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, indent=2)
+
+@app.cli.command('dedupe-uploads')
+@click.option('--dry-run', is_flag=True, help='Report what would be merged without changing anything')
+def dedupe_uploads_command(dry_run):
+    """Share one copy of byte-identical uploaded files.
+    
+    Materials whose files have the same content are pointed at the oldest
+    copy, and the other copies are deleted.
+    """
+    copies = {}
+    for material in Material.query.order_by(Material.created_at):
+        if is_url(material.filepath) or not os.path.exists(material.filepath):
+            continue
+        content_key = text_cache.file_cache_key(material.filepath)
+        copies.setdefault(content_key, []).append(material)
+    
+    redundant = set()
+    for content_key, materials in copies.items():
+        kept = materials[0].filepath
+        for material in materials:
+            if material.filepath != kept:
+                redundant.add(material.filepath)
+                material.filepath = kept
+            material.content_key = material.content_key or content_key
+    
+    freed = sum(os.path.getsize(path) for path in redundant)
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        for path in redundant:
+            remove_unreferenced_upload(path)
+    click.echo(f"{len(redundant)} duplicate files, {freed / 1024 / 1024:.1f} MB"
+               f"{' (dry run)' if dry_run else ' removed'}")
+
 if __name__ == '__main__':
+    if '--import-report' in sys.argv:
+        import startup_report
+        sys.exit(startup_report.main([arg for arg in sys.argv[1:] if arg != '--import-report']))
     app.run(debug=True)
\ No newline at end of file
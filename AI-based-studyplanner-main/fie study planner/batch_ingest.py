@@ -0,0 +1,255 @@
+import os
+import sys
+import uuid
+import multiprocessing
+import shutil
+import tarfile
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from werkzeug.utils import secure_filename
+
+import config
+import nlp
+import text_cache
+from document_processor import no_progress, process_document
+
+ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
+
+# filename is what the user sees; filepath is the staged copy or the URL
+Source = namedtuple('Source', ['filename', 'filepath'])
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def _staged_path(upload_folder, filename):
+    return os.path.join(upload_folder, f"{uuid.uuid4()}_{secure_filename(filename)}")
+
+
+def stage_file(path, upload_folder, filename=None):
+    """Copy a local file into the upload folder and return its Source"""
+    filename = filename or os.path.basename(path)
+    filepath = _staged_path(upload_folder, filename)
+    shutil.copyfile(path, filepath)
+    return Source(filename, filepath)
+
+
+def _copy_limited(src, filepath, limit):
+    """Copy src into a new file at filepath and return the bytes written,
+    raising ValueError as soon as they pass limit"""
+    written = 0
+    with open(filepath, 'wb') as dst:
+        for block in iter(lambda: src.read(1024 * 1024), b''):
+            written += len(block)
+            if written > limit:
+                raise ValueError("Archive contents are larger than their listed size")
+            dst.write(block)
+    return written
+
+
+def stage_archive(archive, upload_folder, max_files=None, max_bytes=None):
+    """Extract supported members of a .zip or .tar(.gz) file into the upload folder.
+
+    Members are written under fresh names, so paths inside the archive
+    cannot escape the upload folder. The member count and uncompressed
+    sizes listed in the archive are checked against max_files and
+    max_bytes (BATCH_MAX_FILES and BATCH_MAX_ARCHIVE_BYTES by default)
+    before anything is written, and copying stops once max_bytes is
+    reached whatever the listing said. On error nothing stays staged.
+    """
+    max_files = max_files or config.BATCH_MAX_FILES
+    max_bytes = max_bytes or config.BATCH_MAX_ARCHIVE_BYTES
+
+    if zipfile.is_zipfile(archive):
+        bundle = zipfile.ZipFile(archive)
+        members = [(os.path.basename(member.filename), member.file_size, member)
+                   for member in bundle.infolist() if not member.is_dir()]
+        open_member = bundle.open
+    elif tarfile.is_tarfile(archive):
+        bundle = tarfile.open(archive)
+        members = [(os.path.basename(member.name), member.size, member)
+                   for member in bundle.getmembers() if member.isfile()]
+        open_member = bundle.extractfile
+    else:
+        raise ValueError(f"Unsupported archive: {os.path.basename(archive)}")
+
+    sources = []
+    with bundle:
+        members = [entry for entry in members if allowed_file(entry[0])]
+        if len(members) > max_files:
+            raise ValueError(f"An archive can hold at most {max_files} documents")
+        if sum(size for _, size, _ in members) > max_bytes:
+            raise ValueError(f"Archive documents exceed {max_bytes} bytes uncompressed")
+
+        remaining = max_bytes
+        try:
+            for name, _, member in members:
+                filepath = _staged_path(upload_folder, name)
+                sources.append(Source(name, filepath))
+                with open_member(member) as src:
+                    remaining -= _copy_limited(src, filepath, remaining)
+        except BaseException:
+            for source in sources:
+                if os.path.exists(source.filepath):
+                    os.remove(source.filepath)
+            raise
+    return sources
+
+
+def is_archive(filename):
+    return filename.lower().endswith(('.zip', '.tar', '.tar.gz', '.tgz'))
+
+
+def stage_sources(source, upload_folder):
+    """Sources for a CLI argument: a directory (walked recursively), an
+    archive, a single document, or a text file listing one URL per line"""
+    if os.path.isdir(source):
+        sources = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if allowed_file(name):
+                    sources.append(stage_file(os.path.join(root, name), upload_folder))
+        return sources
+
+    if is_archive(source):
+        return stage_archive(source, upload_folder)
+
+    if source.lower().endswith('.urls') or source == '-':
+        return read_url_list(source)
+
+    if allowed_file(source):
+        return [stage_file(source, upload_folder)]
+
+    raise ValueError(f"Don't know how to ingest {source}")
+
+
+def read_url_list(path):
+    """URL sources from a file with one URL per line ('-' reads stdin)"""
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, 'r', encoding='utf-8') as file:
+            lines = file.read().splitlines()
+    return url_sources(lines)
+
+
+def url_sources(lines):
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            if not line.startswith(('http://', 'https://')):
+                raise ValueError(f"Not a URL: {line}")
+            urls.append(Source(line, line))
+    return urls
+
+
+def _content_key(source):
+    return text_cache.cache_key_for(source.filepath)
+
+
+def _init_worker():
+    # The batch already spreads files over every core; a per-PDF page pool
+    # inside each worker would only oversubscribe them
+    config.PDF_EXTRACT_WORKERS = 1
+    # Workers start clean rather than forked, so each loads the tokenizers
+    # once up front instead of on its first document
+    nlp.warm()
+
+
+def _ingest_one(filepath, content_key, start_date, end_date, daily_hours, skip_dates,
+                weekday_hours):
+    processed_data = process_document(filepath, start_date, end_date, daily_hours,
+                                      skip_dates=skip_dates, weekday_hours=weekday_hours)
+    processed_data['content_key'] = content_key
+    return processed_data
+
+
+def ingest_batch(sources, start_date, end_date, daily_hours, skip_dates=None,
+                 weekday_hours=None, known_keys=None, max_workers=None,
+                 progress=no_progress):
+    """Process many sources with one schedule.
+
+    Sources are hashed first and deduplicated against each other and
+    against known_keys (content key -> existing material id); only the
+    first copy of each document is processed. Extraction and planning fan
+    out over a process pool. Returns (processed, report): processed is a
+    list of (source, processed_data) in input order, report has one entry
+    per source with status 'processed', 'duplicate' or 'failed'.
+    """
+    if len(sources) > config.BATCH_MAX_FILES:
+        raise ValueError(f"A batch can hold at most {config.BATCH_MAX_FILES} files")
+
+    known_keys = dict(known_keys or {})
+    max_workers = max_workers or config.BATCH_WORKERS
+    total = len(sources)
+    report = [{'filename': source.filename, 'status': None, 'error': None}
+              for source in sources]
+
+    # Hashing is I/O (and, for URLs, network) bound, so threads are enough
+    progress('hashing', 0, total)
+    keys = [None] * total
+    with ThreadPoolExecutor(max_workers=max_workers * 2) as pool:
+        futures = {pool.submit(_content_key, source): n for n, source in enumerate(sources)}
+        for done, future in enumerate(as_completed(futures), 1):
+            n = futures[future]
+            try:
+                keys[n] = future.result()
+                if keys[n] is None:
+                    raise ValueError("Could not fetch content")
+            except Exception as e:
+                report[n].update(status='failed', error=str(e))
+            progress('hashing', done, total)
+
+    pending = []
+    batch_keys = {}
+    for n, key in enumerate(keys):
+        if report[n]['status']:
+            continue
+        if key in known_keys:
+            report[n].update(status='duplicate', duplicate_of=known_keys[key])
+        elif key in batch_keys:
+            report[n].update(status='duplicate', duplicate_of=sources[batch_keys[key]].filename)
+        else:
+            batch_keys[key] = n
+            pending.append(n)
+
+    progress('ingesting', 0, len(pending))
+    results = {}
+    # Forking the caller, usually a threaded server, would copy its threads
+    # and locks into the workers
+    context = multiprocessing.get_context(config.WORKER_START_METHOD)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             mp_context=context) as pool:
+        futures = {
+            pool.submit(_ingest_one, sources[n].filepath, keys[n], start_date, end_date,
+                        daily_hours, skip_dates, weekday_hours): n
+            for n in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            n = futures[future]
+            try:
+                results[n] = future.result()
+                report[n]['status'] = 'processed'
+            except Exception as e:
+                report[n].update(status='failed', error=str(e))
+            progress('ingesting', done, len(pending))
+
+    processed = [(sources[n], results[n]) for n in sorted(results)]
+    return processed, report
+
+
+def discard_staged(sources, report, upload_folder):
+    """Remove staged copies of files that were not stored"""
+    folder = os.path.abspath(upload_folder)
+    for source, entry in zip(sources, report):
+        if entry['status'] != 'processed' and \
+                os.path.dirname(os.path.abspath(source.filepath)) == folder:
+            try:
+                os.remove(source.filepath)
+            except OSError:
+                pass
@@ -0,0 +1,249 @@
+"""Benchmarks for the document_processor hot paths.
+
+    python benchmark.py --pages 1,10,100 --output results.json
+    python benchmark.py --pages 1,10,100 --baseline results.json
+
+Times extract_text_from_file, process_document, answer_question and
+generate_quiz on synthetic PDF/DOCX/TXT files and reports p50/p95 latency,
+throughput and peak Python memory (tracemalloc) as JSON. With --baseline,
+cases whose p50 or peak memory grew by more than --threshold are reported
+as regressions and the exit status is 1.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+import text_cache
+import synthetic_corpus
+import document_processor
+
+FUNCTIONS = ('extract_text_from_file', 'process_document', 'answer_question', 'generate_quiz')
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class _ScratchCache:
+    """Points the text cache at an empty directory, so each run extracts cold"""
+
+    def __enter__(self):
+        self.folder = tempfile.mkdtemp(prefix='bench-cache-')
+        self.saved = text_cache.default_cache
+        text_cache.default_cache = text_cache.TextCache(self.folder)
+        return self
+
+    def __exit__(self, *exc):
+        text_cache.default_cache = self.saved
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def _plan_dates(num_pages):
+    # Long enough that big documents are not all crammed into a few days
+    start = date(2030, 1, 1)
+    days = min(365, max(7, num_pages // 2))
+    return start.isoformat(), (start + timedelta(days=days)).isoformat()
+
+
+def _questions(filepath, count, rng):
+    """Questions made of a few words from random sentences of the document"""
+    sentences = list(document_processor.iter_sentences(
+        document_processor.iter_document_text(filepath)))
+    questions = []
+    for _ in range(count):
+        words = [word.strip('.') for word in rng.choice(sentences).split()]
+        questions.append('What is ' + ' '.join(rng.sample(words, min(3, len(words)))) + '?')
+    return questions
+
+
+def _cold(fn):
+    def run(*args):
+        with _ScratchCache():
+            return fn(*args)
+    return run
+
+
+def measure(fn, args_list, units):
+    """Time fn over args_list after one warm-up call, then re-run the first
+    call under tracemalloc.
+
+    Memory is measured separately because tracing slows every allocation
+    down and would distort the timings.
+    """
+    fn(*args_list[0])
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn(*args_list[0])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(timings)
+    return {
+        'runs': len(timings),
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'mean_ms': round(total / len(timings) * 1000, 3),
+        'throughput': round(units * len(timings) / total, 3) if total else None,
+        'peak_mb': round(peak / (1024 * 1024), 3)
+    }
+
+
+def bench_document(filepath, num_pages, repeat, queries, functions, rng):
+    """Results for one corpus file, keyed by function name"""
+    start_date, end_date = _plan_dates(num_pages)
+    results = {}
+
+    if 'extract_text_from_file' in functions:
+        results['extract_text_from_file'] = dict(
+            measure(document_processor.extract_text_from_file, [(filepath,)] * repeat, num_pages),
+            throughput_unit='pages/s')
+
+    if 'process_document' in functions:
+        results['process_document'] = dict(
+            measure(_cold(document_processor.process_document),
+                    [(filepath, start_date, end_date, 2)] * repeat, num_pages),
+            throughput_unit='pages/s')
+
+    if not {'answer_question', 'generate_quiz'} & set(functions):
+        return results
+
+    # Q&A and quizzes run against an ingested material, as in the app
+    with _ScratchCache():
+        document_processor.process_document(filepath, start_date, end_date, 2)
+        indexes = document_processor.load_material_indexes(filepath)
+
+        if 'answer_question' in functions:
+            results['answer_question'] = dict(
+                measure(document_processor.answer_question,
+                        [(filepath, question, indexes.index, indexes.search_index)
+                         for question in _questions(filepath, queries, rng)], 1),
+                throughput_unit='queries/s')
+
+        if 'generate_quiz' in functions:
+            results['generate_quiz'] = dict(
+                measure(document_processor.generate_quiz,
+                        [(filepath, 'medium', indexes.index, indexes.distractors, seed)
+                         for seed in range(repeat)], 1),
+                throughput_unit='quizzes/s')
+
+    return results
+
+
+def run(pages, formats, repeat, queries, functions, corpus_dir, seed=0):
+    """Benchmark report dict"""
+    rng = random.Random(seed)
+    results = {}
+    for fmt in formats:
+        for num_pages in pages:
+            filepath = synthetic_corpus.generate(corpus_dir, fmt, num_pages, seed)
+            for name, result in bench_document(filepath, num_pages, repeat, queries,
+                                               functions, rng).items():
+                results[f"{name}/{fmt}/{num_pages}"] = result
+                print(f"{name:24} {fmt:4} {num_pages:5}p  p50 {result['p50_ms']:10.2f} ms  "
+                      f"p95 {result['p95_ms']:10.2f} ms  peak {result['peak_mb']:8.2f} MB",
+                      file=sys.stderr)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+            'queries': queries,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compare(report, baseline, threshold):
+    """Per-case ratios against a baseline report; a ratio above 1 + threshold
+    on p50 latency or peak memory is a regression"""
+    comparison = {}
+    for key, result in report['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if not base:
+            continue
+        entry = {}
+        for metric in ('p50_ms', 'peak_mb'):
+            if base.get(metric):
+                entry[metric + '_ratio'] = round(result[metric] / base[metric], 3)
+        entry['regression'] = any(ratio > 1 + threshold for ratio in entry.values())
+        comparison[key] = entry
+    return comparison
+
+
+def _csv(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=lambda v: _csv(v, int), default=[1, 10, 100],
+                        help="comma-separated page counts (1-1000)")
+    parser.add_argument('--formats', type=_csv, default=['pdf', 'docx', 'txt'])
+    parser.add_argument('--functions', type=_csv, default=list(FUNCTIONS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=50,
+                        help="questions per document for answer_question")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir', help="keep generated files here (default: a temp dir)")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    for num_pages in args.pages:
+        if not 1 <= num_pages <= 1000:
+            parser.error("page counts must be between 1 and 1000")
+    for name in args.functions:
+        if name not in FUNCTIONS:
+            parser.error(f"unknown function: {name}")
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix='bench-corpus-')
+    try:
+        report = run(args.pages, args.formats, args.repeat, args.queries, args.functions,
+                     corpus_dir, args.seed)
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            report['comparison'] = compare(report, json.load(file), args.threshold)
+        regressions = [key for key, entry in report['comparison'].items() if entry['regression']]
+        for key in regressions:
+            print(f"REGRESSION {key}: {report['comparison'][key]}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import multiprocessing
 
 # Generate a secret key
 SECRET_KEY = os.urandom(24).hex()
@@ -7,4 +8,110 @@ SECRET_KEY = os.urandom(24).hex()
 UPLOAD_FOLDER = 'static/uploads'
 
 # OpenAI API Key (replace with your actual key)
-OPENAI_API_KEY = 'your-openai-api-key-here'
\ No newline at end of file
+OPENAI_API_KEY = 'your-openai-api-key-here'
+
+# Extracted text cache (content-addressed, shared by upload, Q&A and quizzes)
+TEXT_CACHE_FOLDER = os.environ.get('TEXT_CACHE_FOLDER', 'cache/text')
+# Sentence text is read through mmap of the cache files; at most this many
+# documents are kept mapped per process
+TEXT_MMAP_MAX_OPEN = int(os.environ.get('TEXT_MMAP_MAX_OPEN', 256))
+# Upload digests (content keys) remembered per process
+TEXT_DIGEST_MAX_ENTRIES = int(os.environ.get('TEXT_DIGEST_MAX_ENTRIES', 4096))
+
+# Background ingestion workers for /upload ('thread' or 'process')
+INGEST_EXECUTOR = os.environ.get('INGEST_EXECUTOR', 'thread')
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+JOB_RETENTION_SECONDS = 60 * 60
+# How worker processes (ingest, batch and PDF pools) start. Forking the
+# server would copy its threads, locks and database connections into each
+# worker; a fork server starts them clean. spawn where forkserver is missing
+WORKER_START_METHOD = os.environ.get(
+    'WORKER_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Parallel PDF extraction: shard page ranges across processes for large PDFs
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 64))
+
+# Streaming pipeline: read size and sentence segmentation window (characters)
+STREAM_BLOCK_CHARS = int(os.environ.get('STREAM_BLOCK_CHARS', 16 * 1024))
+STREAM_WINDOW_CHARS = int(os.environ.get('STREAM_WINDOW_CHARS', 64 * 1024))
+
+# Persistent storage (SQLite in WAL mode by default)
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///study_planner.db')
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+
+# Study plan scheduling: reading pace used for effort estimates and chunk size
+STUDY_WORDS_PER_HOUR = int(os.environ.get('STUDY_WORDS_PER_HOUR', 1800))
+STUDY_CHUNK_HOURS = float(os.environ.get('STUDY_CHUNK_HOURS', 0.5))
+
+# Near-duplicate detection. An upload whose word shingles overlap one of the
+# user's materials at least this much (estimated Jaccard similarity) reuses
+# that material's processed text and file
+DEDUPE_DOCUMENT_SIMILARITY = float(os.environ.get('DEDUPE_DOCUMENT_SIMILARITY', 0.9))
+# Chunks within this many SimHash bits of an earlier chunk are not scheduled
+# (negative to schedule every chunk)
+DEDUPE_CHUNK_BITS = int(os.environ.get('DEDUPE_CHUNK_BITS', 3))
+
+# Quiz pools: candidate questions kept per material and difficulty, as a
+# multiple of the quiz length
+QUIZ_POOL_MULTIPLIER = int(os.environ.get('QUIZ_POOL_MULTIPLIER', 4))
+
+# Extractive summaries: sentences in a material's summary and in each plan
+# day's recap
+SUMMARY_SENTENCES = int(os.environ.get('SUMMARY_SENTENCES', 5))
+DAY_SUMMARY_SENTENCES = int(os.environ.get('DAY_SUMMARY_SENTENCES', 2))
+
+# /feedback: hours behind the plan that still count as on track
+PROGRESS_BACKLOG_SLACK_HOURS = float(os.environ.get('PROGRESS_BACKLOG_SLACK_HOURS', 0.5))
+
+# Objects shared by all server workers (material indexes, quiz pools, ingest
+# job status): 'sqlite' (a file at SHARED_CACHE_PATH), a redis:// URL, or
+# 'memory' for per-process caching only. Each process also keeps up to
+# CACHE_LOCAL_MAX_BYTES (serialized size) of them live.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH', 'cache/shared.sqlite3')
+SHARED_CACHE_MAX_BYTES = int(os.environ.get('SHARED_CACHE_MAX_BYTES', 2 * 1024 ** 3))  # 2GB
+CACHE_LOCAL_MAX_BYTES = int(os.environ.get('CACHE_LOCAL_MAX_BYTES', 256 * 1024 * 1024))  # 256MB
+
+# Cross-material search (/ask_all): terms are hashed into this many columns,
+# and each process keeps up to USER_SEARCH_MAX_BYTES of users' indexes
+SEARCH_HASH_FEATURES = int(os.environ.get('SEARCH_HASH_FEATURES', 2 ** 18))
+USER_SEARCH_MAX_BYTES = int(os.environ.get('USER_SEARCH_MAX_BYTES', 128 * 1024 * 1024))  # 128MB
+
+# Shared HTTP fetch layer for URL materials
+HTTP_CACHE_FOLDER = os.environ.get('HTTP_CACHE_FOLDER', 'cache/http')
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 10))
+HTTP_MAX_BODY_BYTES = int(os.environ.get('HTTP_MAX_BODY_BYTES', 10 * 1024 * 1024))  # 10MB
+# Entries revalidated this recently are reused without another request, so
+# one upload does not revalidate the same page several times; only for
+# responses without Cache-Control max-age, no-cache or must-revalidate
+HTTP_REVALIDATE_SECONDS = int(os.environ.get('HTTP_REVALIDATE_SECONDS', 60))
+
+# Site crawls (/upload with crawl=1): link depth and page count, used as the
+# defaults and as the caps on what a request may ask for
+CRAWL_MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', 2))
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 50))
+# Fetches in flight across all crawls in the process, and per crawled host
+# (shared by every crawl of that host)
+CRAWL_CONCURRENCY = int(os.environ.get('CRAWL_CONCURRENCY', 16))
+CRAWL_PER_HOST = int(os.environ.get('CRAWL_PER_HOST', 4))
+CRAWL_PARSE_WORKERS = int(os.environ.get('CRAWL_PARSE_WORKERS', 4))
+
+# Batch ingestion (flask ingest-batch and /upload_batch)
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+BATCH_COMMIT_SIZE = int(os.environ.get('BATCH_COMMIT_SIZE', 50))  # materials per transaction
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 2000))
+# Total uncompressed size of the documents extracted from one archive
+BATCH_MAX_ARCHIVE_BYTES = int(os.environ.get('BATCH_MAX_ARCHIVE_BYTES', 512 * 1024 * 1024))
+
+# NLTK data is installed at build time (python nlp.py --download), never at runtime
+NLTK_DATA_DIR = os.environ.get('NLTK_DATA_DIR', 'nltk_data')
+NLTK_PRELOAD = os.environ.get('NLTK_PRELOAD', '0') == '1'
+
+# Sampling profiler: requests slower than this many seconds get their stacks
+# written to PROFILE_FOLDER in folded (flamegraph) format; 0 turns it off
+PROFILE_SLOW_REQUEST_SECONDS = float(os.environ.get('PROFILE_SLOW_REQUEST_SECONDS', 0))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get('PROFILE_INTERVAL_SECONDS', 0.005))
+PROFILE_FOLDER = os.environ.get('PROFILE_FOLDER', 'profiles')
@@ -0,0 +1,151 @@
+import os
+import pickle
+import tempfile
+from array import array
+from datetime import date
+
+import text_cache
+
+# Bump when the stored fields change so old pickles are rebuilt
+MODEL_VERSION = 4
+
+
+class ContentModel:
+    """Date-independent result of ingesting a document.
+
+    Everything a study plan needs except the dates: sentence character
+    spans into the normalized text, token counts, TextRank sentence scores
+    (for the summary and per-day recaps), effort-sized chunks, the chunks
+    that repeat earlier ones, a MinHash fingerprint of the whole text and a
+    summary. Re-planning only needs this plus the cached text.
+    """
+
+    __slots__ = ('version', 'sentence_starts', 'sentence_ends', 'token_counts',
+                 'sentence_scores', 'chunk_boundaries', 'chunk_efforts', 'duplicate_chunks',
+                 'fingerprint', 'content_summary')
+
+    def __init__(self):
+        self.version = MODEL_VERSION
+        self.sentence_starts = array('I')
+        self.sentence_ends = array('I')
+        self.token_counts = array('I')
+        self.sentence_scores = array('f')
+        self.chunk_boundaries = array('I', [0])
+        self.chunk_efforts = array('f')
+        self.duplicate_chunks = array('I')  # near-duplicates of earlier chunks, ascending
+        self.fingerprint = b''
+        self.content_summary = ''
+
+    @property
+    def sentence_count(self):
+        return len(self.sentence_starts)
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_efforts)
+
+    @property
+    def word_count(self):
+        return sum(self.token_counts)
+
+    @property
+    def required_hours(self):
+        return float(sum(self.chunk_efforts))
+
+    def study_chunks(self):
+        """Ids of the chunks to schedule: all but the near-duplicates"""
+        duplicates = set(self.duplicate_chunks)
+        return [c for c in range(self.chunk_count) if c not in duplicates]
+
+    def chunk_sentences(self, chunk_id):
+        """Sentence ids in a chunk"""
+        return range(self.chunk_boundaries[chunk_id], self.chunk_boundaries[chunk_id + 1])
+
+    def chunk_span(self, chunk_id):
+        """(start, end) character offsets of a chunk in the normalized text"""
+        first = self.chunk_boundaries[chunk_id]
+        last = self.chunk_boundaries[chunk_id + 1] - 1
+        return self.sentence_starts[first], self.sentence_ends[last]
+
+
+class StudyPlan:
+    """Columnar study plan: parallel arrays instead of a dict per day.
+
+    Day i is on date ordinal day_ordinals[i], lasts durations[i] hours and
+    covers chunk_ids[day_starts[i]:day_starts[i + 1]]. Day text is not kept;
+    it is sliced out of the cached normalized text by chunk span when the
+    plan is stored or returned (document_processor.materialize_plan).
+    """
+
+    __slots__ = ('day_ordinals', 'durations', 'day_starts', 'chunk_ids')
+
+    def __init__(self):
+        self.day_ordinals = array('i')
+        self.durations = array('f')
+        self.day_starts = array('I', [0])
+        self.chunk_ids = array('I')
+
+    def __len__(self):
+        return len(self.day_ordinals)
+
+    def add_day(self, day, hours, chunk_ids):
+        self.day_ordinals.append(day.toordinal())
+        self.durations.append(hours)
+        self.chunk_ids.extend(chunk_ids)
+        self.day_starts.append(len(self.chunk_ids))
+
+    def day_chunks(self, i):
+        return self.chunk_ids[self.day_starts[i]:self.day_starts[i + 1]]
+
+    def day_date(self, i):
+        """YYYY-MM-DD date of day i"""
+        return date.fromordinal(self.day_ordinals[i]).isoformat()
+
+
+def _model_path(key):
+    return text_cache.default_cache.path_for(key)[:-len('.txt')] + '.model'
+
+
+def load(key):
+    """Cached ContentModel for a text cache key, or None"""
+    try:
+        with open(_model_path(key), 'rb') as file:
+            model = pickle.load(file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, TypeError):
+        # Missing, truncated, or written by an older layout of the class
+        return None
+    return model if getattr(model, 'version', None) == MODEL_VERSION else None
+
+
+def save(key, model):
+    path = _model_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def format_chunk_ranges(chunk_ids):
+    """Compact '0-4,7-9' form (end-exclusive runs) of ascending chunk ids"""
+    runs = []
+    for chunk_id in chunk_ids:
+        if runs and runs[-1][1] == chunk_id:
+            runs[-1][1] = chunk_id + 1
+        else:
+            runs.append([chunk_id, chunk_id + 1])
+    return ','.join(f"{start}-{end}" for start, end in runs)
+
+
+def parse_chunk_ranges(value):
+    """Chunk ids listed by format_chunk_ranges"""
+    chunk_ids = []
+    for run in filter(None, (value or '').split(',')):
+        start, end = run.split('-')
+        chunk_ids.extend(range(int(start), int(end)))
+    return chunk_ids
@@ -0,0 +1,310 @@
+"""Same-site crawls for URL materials that span many pages.
+
+From a start page, links to the same host are followed breadth-first up to
+a depth and page limit. Every crawl in the process runs on one asyncio
+event loop, so limits per host hold however many users crawl the same
+site: at most CRAWL_PER_HOST fetches are in flight to a host, spaced by its
+Crawl-delay. Fetches go through the pooled and cached http_fetch session on
+a thread pool (CRAWL_CONCURRENCY threads) and are bounded by HTTP_TIMEOUT;
+robots.txt rules are honoured, and pages are parsed on a second pool so
+parsing never holds up fetching.
+
+Page text is written to a staged .txt file in discovery order as pages
+arrive, and that file then goes through process_document like any upload.
+"""
+import os
+import uuid
+import asyncio
+import threading
+import weakref
+from urllib import robotparser
+from urllib.parse import urljoin, urldefrag, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+import config
+import http_fetch
+from document_processor import html_text, ingest_document, no_progress
+
+# Links to these are never pages; skipping them saves downloading the body
+SKIPPED_EXTENSIONS = ('.pdf', '.zip', '.gz', '.tar', '.doc', '.docx', '.ppt', '.pptx',
+                      '.xls', '.xlsx', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp',
+                      '.mp3', '.mp4', '.webm', '.css', '.js')
+
+_pools = {}
+_pools_lock = threading.Lock()
+_loop = None
+_loop_lock = threading.Lock()
+# Event loop -> {host: HostLimiter}; asyncio primitives belong to one loop
+_limiters = weakref.WeakKeyDictionary()
+
+
+def _pool(name, max_workers):
+    """Thread pool shared by all crawls in this process"""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(max_workers=max_workers,
+                                              thread_name_prefix=f'crawl-{name}')
+        return _pools[name]
+
+
+def _crawl_loop():
+    """Event loop, on its own thread, that runs every crawl in this process"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='crawl-loop', daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+class HostLimiter:
+    """Fetch slots and Crawl-delay spacing for one host, shared by all crawls
+    of it on an event loop"""
+
+    def __init__(self):
+        self.slots = asyncio.Semaphore(config.CRAWL_PER_HOST)
+        self.delay_lock = asyncio.Lock()
+        self.next_request = 0.0
+
+    async def wait_turn(self, delay):
+        """Space requests to the host out by delay seconds"""
+        if not delay:
+            return
+        loop = asyncio.get_running_loop()
+        async with self.delay_lock:
+            wait = self.next_request - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.next_request = loop.time() + delay
+
+
+def host_limiter(host):
+    """The running loop's HostLimiter for host"""
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    if host not in limiters:
+        limiters[host] = HostLimiter()
+    return limiters[host]
+
+
+def crawl_limits(max_depth=None, max_pages=None):
+    """Depth and page limits for a request, defaulting to and capped by config"""
+    max_depth = config.CRAWL_MAX_DEPTH if max_depth is None \
+        else min(max(0, max_depth), config.CRAWL_MAX_DEPTH)
+    max_pages = config.CRAWL_MAX_PAGES if max_pages is None \
+        else min(max(1, max_pages), config.CRAWL_MAX_PAGES)
+    return max_depth, max_pages
+
+
+def normalize_url(url):
+    """url without its fragment, or None if it is not http(s)"""
+    parts = urlsplit(urldefrag(url)[0])
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        return None
+    return parts._replace(path=parts.path or '/').geturl()
+
+
+def load_robots(site_url, timeout):
+    """RobotFileParser for the site. A missing robots.txt (4xx) allows
+    everything, except 401/403 which disallow everything, as
+    RobotFileParser.read does. A server error or no answer leaves the rules
+    unknown, so everything is disallowed."""
+    robots_url = urljoin(site_url, '/robots.txt')
+    parser = robotparser.RobotFileParser(robots_url)
+    try:
+        result = http_fetch.fetch(robots_url, timeout=timeout)
+    except Exception as e:
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        if status is not None and 400 <= status < 500 and status not in (401, 403):
+            parser.allow_all = True
+        else:
+            parser.disallow_all = True
+        return parser
+    parser.parse(result.body.decode(result.charset or 'utf-8', errors='replace').splitlines())
+    return parser
+
+
+def parse_page(result):
+    """(text, links) of a fetched HTML page; links are absolute, resolved
+    against the URL the page was served from"""
+    soup = http_fetch.parse_html(result)
+    # Links first: html_text drops the nav and footer they often live in
+    links = [urljoin(result.url, anchor['href']) for anchor in soup.find_all('a', href=True)]
+    return html_text(soup), links
+
+
+class SiteCrawler:
+    """One crawl from start_url. run(write) calls write(text) for every page
+    with text, in the order the pages were discovered."""
+
+    def __init__(self, start_url, max_depth, max_pages, progress=no_progress):
+        start_url = normalize_url(start_url)
+        if start_url is None:
+            raise ValueError("Crawls need an http(s) URL")
+        self.start_url = start_url
+        self.host = urlsplit(start_url).netloc
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.progress = progress
+        self.user_agent = http_fetch.get_session().headers['User-Agent']
+
+        self.seen = set()
+        self.discovered = 0
+        self.fetched = 0
+        self.written = 0
+        self.pages = {}  # discovery index -> text, or None for pages without text
+        self.next_page = 0
+        self.written_hashes = set()
+        self.error = None  # a failed write, raised once the crawl stops
+
+    async def run(self, write):
+        """Crawl and return the number of pages written"""
+        loop = asyncio.get_running_loop()
+        self.write = write
+        self.queue = asyncio.Queue()
+        self.robots = await loop.run_in_executor(
+            _pool('fetch', config.CRAWL_CONCURRENCY), load_robots, self.start_url,
+            config.HTTP_TIMEOUT)
+        self.delay = self.robots.crawl_delay(self.user_agent) or 0
+        self.limiter = host_limiter(self.host)
+
+        if not self.enqueue(self.start_url, 0):
+            raise ValueError("robots.txt does not allow crawling this URL, or could not be read")
+
+        self.progress('crawling', 0, self.max_pages)
+        workers = [asyncio.create_task(self.worker()) for _ in range(config.CRAWL_PER_HOST)]
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        if self.error is not None:
+            raise self.error
+        return self.written
+
+    def allowed(self, url):
+        """Whether a normalized URL is on the crawled host, looks like a page
+        and is not disallowed by robots.txt"""
+        parts = urlsplit(url)
+        return parts.netloc == self.host \
+            and not parts.path.lower().endswith(SKIPPED_EXTENSIONS) \
+            and self.robots.can_fetch(self.user_agent, url)
+
+    def enqueue(self, url, depth):
+        url = normalize_url(url)
+        if url is None or url in self.seen or self.discovered >= self.max_pages:
+            return False
+        self.seen.add(url)
+        if not self.allowed(url):
+            return False
+        self.queue.put_nowait((self.discovered, url, depth))
+        self.discovered += 1
+        return True
+
+    async def worker(self):
+        while True:
+            index, url, depth = await self.queue.get()
+            try:
+                try:
+                    text = await self.visit(url, depth)
+                except Exception:
+                    # Unreachable, timed out or unparsable: skip the page
+                    text = None
+                self.pages[index] = text
+                self.flush()
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    async def visit(self, url, depth):
+        """Fetch and parse one page, queue its links and return its text"""
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.limiter.slots:
+                await self.limiter.wait_turn(self.delay)
+                # The request timeout bounds the fetch; cancelling the await
+                # would leave the thread running anyway
+                result = await loop.run_in_executor(_pool('fetch', config.CRAWL_CONCURRENCY),
+                                                    http_fetch.fetch, url, None,
+                                                    config.HTTP_TIMEOUT)
+        finally:
+            self.fetched += 1
+            self.progress('crawling', self.fetched, self.discovered)
+
+        # A redirect target has to pass the same checks as a link, and a page
+        # reached both directly and through a redirect is parsed once
+        final_url = normalize_url(result.url)
+        if final_url != url:
+            if final_url is None or final_url in self.seen or not self.allowed(final_url):
+                return None
+            self.seen.add(final_url)
+
+        content_type = result.headers.get('Content-Type', '').lower()
+        if content_type and 'html' not in content_type:
+            return None
+
+        text, links = await loop.run_in_executor(
+            _pool('parse', config.CRAWL_PARSE_WORKERS), parse_page, result)
+        if depth < self.max_depth:
+            for link in links:
+                self.enqueue(link, depth + 1)
+        return text
+
+    def flush(self):
+        """Write finished pages that are next in discovery order"""
+        while self.next_page in self.pages:
+            text = self.pages.pop(self.next_page)
+            # The same page under two URLs (/ and /index.html) is written once
+            if text and hash(text) not in self.written_hashes:
+                self.written_hashes.add(hash(text))
+                self.write(text)
+                self.written += 1
+            self.next_page += 1
+
+
+def stage_site(start_url, upload_folder, max_depth=None, max_pages=None,
+               progress=no_progress):
+    """Crawl a site into a .txt file in the upload folder and return its path"""
+    max_depth, max_pages = crawl_limits(max_depth, max_pages)
+    crawler = SiteCrawler(start_url, max_depth, max_pages, progress)
+
+    parts = urlsplit(crawler.start_url)
+    name = secure_filename(f"{parts.netloc}{parts.path}".rstrip('/')) or 'site'
+    path = os.path.join(upload_folder, f"{uuid.uuid4()}_{name}.txt")
+    partial_path = path + '.partial'
+    try:
+        with open(partial_path, 'w', encoding='utf-8') as file:
+            written = asyncio.run_coroutine_threadsafe(
+                crawler.run(lambda text: file.write(text + '\n\n')), _crawl_loop()).result()
+        if not written:
+            raise ValueError("No text found on the crawled pages")
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return path
+
+
+def ingest_site(start_url, upload_folder, start_date, end_date, daily_hours, skip_dates=None,
+                weekday_hours=None, max_depth=None, max_pages=None, known_documents=None,
+                progress=no_progress):
+    """Crawl a site and run the snapshot through the upload pipeline.
+
+    Returns (path, processed_data, indexes); path is the staged snapshot,
+    which is stored as the material's file so replans and cache keys work
+    as they do for uploads. known_documents is passed to ingest_document.
+    """
+    path = stage_site(start_url, upload_folder, max_depth, max_pages, progress)
+    try:
+        processed_data, indexes = ingest_document(path, start_date, end_date, daily_hours,
+                                                  skip_dates, weekday_hours, known_documents,
+                                                  progress=progress)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, processed_data, indexes
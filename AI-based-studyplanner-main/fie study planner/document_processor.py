@@ -1,72 +1,294 @@
 import os
 import re
+import multiprocessing
 import random
 from datetime import datetime, timedelta
-import PyPDF2
-from docx import Document
-import requests
-from bs4 import BeautifulSoup
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
-
-# Ensure NLTK data is downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-
-def extract_text_from_file(filepath):
-    """Extract text from PDF, DOCX, or TXT files with error handling"""
+import tempfile
+from array import array
+from collections import deque, namedtuple
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ProcessPoolExecutor
+import config
+import metrics
+import text_cache
+import text_store
+import http_fetch
+from nlp import sent_tokenize, word_tokenize
+import scheduler
+import content_model
+from content_model import ContentModel, StudyPlan
+from text_index import DocumentIndex, build_document_index
+from retrieval import BM25Index
+from quiz import DistractorIndex, QUESTION_COUNTS, generate_questions, pool_seed
+
+# PyPDF2 and python-docx are imported inside the functions that need them,
+# so workers only pay for the parsers of the file types they actually see;
+# likewise summarizer and fingerprints, which pull in NumPy and SciPy
+
+def no_progress(stage, current=None, total=None):
+    """Default progress callback: report nothing"""
+    pass
+
+def _extract_pdf_pages(filepath, start, stop):
+    """Extract text from pages [start, stop) of a PDF; runs in a worker process"""
+    import PyPDF2
+    with open(filepath, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+_pdf_pool = None
+
+def _get_pdf_pool():
+    """Process pool shared by all parallel PDF extractions in this process.
+    
+    Its workers come from WORKER_START_METHOD rather than a fork of this
+    process, which is usually a threaded server.
+    """
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=config.PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context(config.WORKER_START_METHOD))
+    return _pdf_pool
+
+def iter_pdf_pages(filepath, progress=no_progress):
+    """Yield PDF page text in order, sharding page ranges across processes for large files"""
+    import PyPDF2
+    with open(filepath, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        total_pages = len(reader.pages)
+        if not total_pages:
+            raise ValueError("PDF contains no readable pages")
+        metrics.DOCUMENT_PAGES.observe(total_pages, format='pdf')
+        
+        if config.PDF_EXTRACT_WORKERS <= 1 or total_pages < config.PDF_PARALLEL_MIN_PAGES:
+            for page_number, page in enumerate(reader.pages, 1):
+                progress('extracting', page_number, total_pages)
+                yield page.extract_text() or ""
+            return
+    
+    # Several shards per worker keeps the pool busy when pages vary in cost,
+    # and a bounded number in flight keeps finished-but-unread shards small
+    shard_size = max(1, -(-total_pages // (config.PDF_EXTRACT_WORKERS * 4)))
+    max_in_flight = config.PDF_EXTRACT_WORKERS * 2
+    pool = _get_pdf_pool()
+    starts = iter(range(0, total_pages, shard_size))
+    in_flight = deque()
+    pages_done = 0
+    
+    while True:
+        while len(in_flight) < max_in_flight:
+            start = next(starts, None)
+            if start is None:
+                break
+            in_flight.append(pool.submit(_extract_pdf_pages, filepath, start,
+                                         min(start + shard_size, total_pages)))
+        if not in_flight:
+            break
+        
+        shard = in_flight.popleft().result()
+        pages_done += len(shard)
+        progress('extracting', pages_done, total_pages)
+        yield from shard
+
+def iter_document_chunks(filepath, progress=no_progress):
+    """Yield raw text in document order: PDF pages, DOCX paragraphs, TXT blocks or a web page"""
+    if filepath.startswith(('http://', 'https://')):
+        yield extract_text_from_url(filepath)
+        return
+    
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
     
-    text = ""
     try:
         if filepath.lower().endswith('.pdf'):
-            with open(filepath, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                if not reader.pages:
-                    raise ValueError("PDF contains no readable pages")
-                for page in reader.pages:
-                    text += page.extract_text() or ""
+            yield from iter_pdf_pages(filepath, progress)
         elif filepath.lower().endswith('.docx'):
+            from docx import Document
             doc = Document(filepath)
             if not doc.paragraphs:
                 raise ValueError("DOCX contains no readable text")
             for para in doc.paragraphs:
-                text += para.text + "\n"
+                yield para.text + "\n"
         elif filepath.lower().endswith('.txt'):
             with open(filepath, 'r', encoding='utf-8') as file:
-                text = file.read()
+                yield from iter(lambda: file.read(config.STREAM_BLOCK_CHARS), '')
         else:
             raise ValueError("Unsupported file format")
     except Exception as e:
         raise ValueError(f"Error reading file: {str(e)}")
+
+def extract_text_from_file(filepath, progress=no_progress):
+    """Extract text from PDF, DOCX, or TXT files with error handling"""
+    return "".join(iter_document_chunks(filepath, progress)).strip()
+
+def html_text(soup):
+    """Readable text of a parsed page: paragraphs and headings, without
+    scripts, styles, navigation, footers and iframes"""
+    # Remove unwanted elements
+    for element in soup(['script', 'style', 'nav', 'footer', 'iframe']):
+        element.decompose()
+        
+    # Get text from paragraphs and headers
+    text = ' '.join([p.get_text(' ', strip=True) 
+                    for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4'])])
     
-    return text.strip()
+    return re.sub(r'\s+', ' ', text).strip()
 
 def extract_text_from_url(url):
     """Extract text content from a URL with error handling"""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        return html_text(http_fetch.parse_html(http_fetch.fetch(url)))
+    except Exception as e:
+        raise ValueError(f"Error extracting URL content: {str(e)}")
+
+def normalize_stream(chunks):
+    """Collapse whitespace runs to single spaces and trim both ends, so cached
+    text is identical for every caller. Works incrementally: the yielded
+    blocks concatenate to the normalized ''.join(chunks)."""
+    pending_space = False
+    started = False
+    for chunk in chunks:
+        chunk = re.sub(r'\s+', ' ', chunk)
+        if not chunk:
+            continue
+        if chunk == ' ':
+            pending_space = True
+            continue
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        leading = chunk[0] == ' '
+        trailing = chunk[-1] == ' '
+        chunk = chunk.strip(' ')
+        if started and (pending_space or leading):
+            chunk = ' ' + chunk
         
-        # Remove unwanted elements
-        for element in soup(['script', 'style', 'nav', 'footer', 'iframe']):
-            element.decompose()
-            
-        # Get text from paragraphs and headers
-        text = ' '.join([p.get_text(' ', strip=True) 
-                        for p in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4'])])
+        yield chunk
+        started = True
+        pending_space = trailing
+
+def _iter_file_blocks(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        yield from iter(lambda: file.read(config.STREAM_BLOCK_CHARS), '')
+
+def _iter_text(filepath, key, progress):
+    """Stream normalized text, from the disk cache or from extraction while
+    writing it to the cache"""
+    cache = text_cache.default_cache
+    if not key:
+        yield from normalize_stream(iter_document_chunks(filepath, progress))
+        return
+    
+    path = cache.disk_path(key)
+    metrics.cache_result('text_disk', path is not None)
+    if path:
+        yield from _iter_file_blocks(path)
+        return
+    
+    with cache.writer(key) as out:
+        for block in normalize_stream(iter_document_chunks(filepath, progress)):
+            out.write(block)
+            yield block
+
+def iter_document_text(filepath, progress=no_progress):
+    """Yield normalized document text in blocks without holding the whole document"""
+    return _iter_text(filepath, text_cache.cache_key_for(filepath), progress)
+
+@contextmanager
+def _spooled_text(filepath, progress=no_progress):
+    """Path to a file holding the normalized text, so it can be streamed more
+    than once: the cache entry, or a temp file for uncacheable URLs"""
+    key = text_cache.cache_key_for(filepath)
+    if key:
+        if not text_cache.default_cache.disk_path(key):
+            for _ in _iter_text(filepath, key, progress):
+                pass
+        yield text_cache.default_cache.disk_path(key)
+        return
+    
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.txt', delete=False) as spool:
+        for block in _iter_text(filepath, None, progress):
+            spool.write(block)
+    try:
+        yield spool.name
+    finally:
+        os.remove(spool.name)
+
+def iter_sentence_spans(blocks, window=None):
+    """Incremental sent_tokenize over text blocks, yielding (start, end, sentence)
+    with character offsets into the concatenated blocks.
+
+    Text is buffered until it reaches `window` characters; every sentence but
+    the last (which may continue in the next block) is then emitted.
+    """
+    window = window or config.STREAM_WINDOW_CHARS
+    buffer = ""
+    buffer_start = 0
+    
+    def spans(sentences):
+        cursor = 0
+        for sentence in sentences:
+            sentence = sentence.strip()
+            position = buffer.find(sentence, cursor)
+            if position < 0:
+                position = cursor
+            cursor = position + len(sentence)
+            if sentence:
+                yield position, sentence
+    
+    for block in blocks:
+        buffer += block
+        if len(buffer) < window:
+            continue
         
-        return re.sub(r'\s+', ' ', text).strip()
-    except Exception as e:
-        raise ValueError(f"Error extracting URL content: {str(e)}")
+        sentences = sent_tokenize(buffer)
+        if len(sentences) > 1:
+            found = list(spans(sentences))
+            for position, sentence in found[:-1]:
+                yield buffer_start + position, buffer_start + position + len(sentence), sentence
+            
+            # Carry the unfinished tail over verbatim, including trailing whitespace
+            tail = found[-1][0] if found else len(buffer)
+            buffer_start += tail
+            buffer = buffer[tail:]
+        elif len(buffer) > window * 8:
+            # A single run-on "sentence"; emit it rather than grow without bound
+            for position, sentence in spans([buffer]):
+                yield buffer_start + position, buffer_start + position + len(sentence), sentence
+            buffer_start += len(buffer)
+            buffer = ""
+    
+    for position, sentence in spans(sent_tokenize(buffer)):
+        yield buffer_start + position, buffer_start + position + len(sentence), sentence
+
+def iter_sentences(blocks, window=None):
+    """Incremental sent_tokenize over text blocks"""
+    for _, _, sentence in iter_sentence_spans(blocks, window):
+        yield sentence
+
+def iter_text_spans(blocks, spans):
+    """Yield the text of each (start, end) character span from a block stream.
+
+    Spans must be ascending and non-overlapping; only the current block and
+    the span being assembled are held in memory.
+    """
+    blocks = iter(blocks)
+    block = ""
+    block_start = 0
+    
+    for start, end in spans:
+        parts = []
+        position = start
+        while position < end:
+            while position >= block_start + len(block):
+                block_start += len(block)
+                block = next(blocks, None)
+                if block is None:
+                    raise ValueError("Text span beyond end of document")
+            
+            take = min(end, block_start + len(block))
+            parts.append(block[position - block_start:take - block_start])
+            position = take
+        yield "".join(parts)
 
 def validate_dates(start_date, end_date):
     """Validate date range and format"""
@@ -83,196 +305,421 @@ def validate_dates(start_date, end_date):
     except ValueError as e:
         raise ValueError(f"Invalid dates: {str(e)}")
 
-def process_document(filepath, start_date, end_date, daily_hours):
-    """Main document processing function with comprehensive error handling"""
+def build_content_model(filepath, progress=no_progress, on_sentence=None, fingerprint=None):
+    """Date-independent content model (sentence spans, token counts, sentence
+    scores, effort-sized chunks, duplicate chunks, fingerprint and summary)
+    for a document, cached next to its extracted text.
+
+    on_sentence(sentence, tokens), if given, sees every sentence and its
+    word tokens; the cached model is then bypassed so the caller gets a
+    full pass. fingerprint is the text's
+    MinHash signature when the caller has already computed it.
+    """
+    import summarizer
+    import fingerprints
+    
+    with metrics.span('hash'):
+        key = text_cache.cache_key_for(filepath)
+    if key and on_sentence is None:
+        model = content_model.load(key)
+        metrics.cache_result('content_model', model is not None)
+        if model is not None:
+            return model
+    
+    if not filepath.startswith(('http://', 'https://')) and os.path.exists(filepath):
+        metrics.DOCUMENT_BYTES.observe(os.path.getsize(filepath),
+                                       format=os.path.splitext(filepath)[1].lstrip('.').lower())
+    
+    model = ContentModel()
+    progress('extracting')
+    with ExitStack() as stack:
+        with metrics.span('extract'):
+            text_path = stack.enter_context(_spooled_text(filepath, progress))
+        if not os.path.getsize(text_path):
+            raise ValueError("Document contains no readable text")
+        
+        progress('tokenizing')
+        terms = summarizer.TermMatrixBuilder()
+        sentence_hashes = array('I')
+        with metrics.span('tokenize'):
+            for start, end, sentence in iter_sentence_spans(_iter_file_blocks(text_path)):
+                tokens = word_tokenize(sentence)
+                model.sentence_starts.append(start)
+                model.sentence_ends.append(end)
+                model.token_counts.append(len(tokens))
+                terms.add(tokens)
+                sentence_hashes.append(fingerprints.sentence_hash(sentence))
+                if on_sentence:
+                    on_sentence(sentence, tokens)
+        
+        sentence_count = model.sentence_count
+        if not sentence_count:
+            raise ValueError("Could not extract meaningful sentences")
+        
+        with metrics.span('chunk'):
+            model.chunk_boundaries, model.chunk_efforts = scheduler.build_chunks(
+                model.token_counts, config.STUDY_CHUNK_HOURS, config.STUDY_WORDS_PER_HOUR)
+        
+        with metrics.span('dedupe'):
+            model.duplicate_chunks = fingerprints.duplicate_chunks(
+                sentence_hashes, model.token_counts, model.chunk_boundaries,
+                config.DEDUPE_CHUNK_BITS)
+            model.fingerprint = fingerprint or fingerprints.minhash(_iter_file_blocks(text_path))
+        
+        with metrics.span('summarize'):
+            scores = summarizer.sentence_scores(terms)
+            model.sentence_scores.frombytes(scores.astype('float32').tobytes())
+            
+            # Most central sentences, read back by offset
+            positions = summarizer.top_sentences(scores, config.SUMMARY_SENTENCES)
+            summary_sentences = list(iter_text_spans(
+                _iter_file_blocks(text_path),
+                [(model.sentence_starts[i], model.sentence_ends[i]) for i in positions]))
+    
+    metrics.DOCUMENT_WORDS.observe(model.word_count)
+    model.content_summary = '\n'.join(summary_sentences)
+    
+    if key:
+        with metrics.span('sentence_index'):
+            text_path = text_cache.default_cache.path_for(key)
+            text_store.write_sentence_index(key, _iter_file_blocks(text_path),
+                                            model.sentence_starts, model.sentence_ends)
+        content_model.save(key, model)
+    return model
+
+def plan_study_days(model, start, end, daily_hours, skip_dates=None, weekday_hours=None,
+                    chunk_ids=None):
+    """Schedule a content model's chunks over a date range.
+
+    This is the cheap, date-dependent stage: no extraction, tokenization or
+    text at all, just the scheduler. chunk_ids restricts planning to those
+    chunks (ascending), e.g. the ones not yet completed; by default every
+    chunk that is not a near-duplicate of an earlier one is planned.
+    Returns (StudyPlan, available_hours, required_hours).
+    """
+    if chunk_ids is None:
+        chunk_ids = model.study_chunks()
+    chunk_ids = list(chunk_ids)
+    
+    total_days = max(1, (end - start).days)
+    capacities = scheduler.day_capacities(start, total_days, daily_hours, skip_dates, weekday_hours)
+    available_hours = float(sum(capacities))
+    if available_hours <= 0:
+        raise ValueError("No study days available in the selected range")
+    
+    efforts = array('f', (model.chunk_efforts[c] for c in chunk_ids))
+    days, _ = scheduler.schedule(efforts, capacities)
+    
+    study_plan = StudyPlan()
+    first_day = start.date()
+    for day_offset, first, last, hours in days:
+        study_plan.add_day(first_day + timedelta(days=day_offset), hours, chunk_ids[first:last])
+    
+    return study_plan, available_hours, float(sum(efforts))
+
+def day_recap(model, day_chunks, chunk_texts):
+    """The DAY_SUMMARY_SENTENCES best-scoring sentences of a plan day, in
+    order, sliced out of the day's chunk texts"""
+    import summarizer
+    
+    sentence_ids = [s for chunk_id in day_chunks for s in model.chunk_sentences(chunk_id)]
+    picked = set(summarizer.top_sentences(model.sentence_scores, config.DAY_SUMMARY_SENTENCES,
+                                          sentence_ids))
+    parts = []
+    for chunk_id, text in zip(day_chunks, chunk_texts):
+        chunk_start = model.chunk_span(chunk_id)[0]
+        for s in model.chunk_sentences(chunk_id):
+            if s in picked:
+                parts.append(text[model.sentence_starts[s] - chunk_start:
+                                  model.sentence_ends[s] - chunk_start])
+    return ' '.join(parts)
+
+def iter_plan_days(model, study_plan, text_blocks):
+    """Day dicts (date, content, recap, duration_hours, chunk_ranges) for a
+    StudyPlan, slicing each day's text out of text_blocks by chunk span"""
+    texts = iter_text_spans(text_blocks, [model.chunk_span(c) for c in study_plan.chunk_ids])
+    for i in range(len(study_plan)):
+        day_chunks = study_plan.day_chunks(i)
+        chunk_texts = [next(texts) for _ in day_chunks]
+        yield {
+            'date': study_plan.day_date(i),
+            'content': ' '.join(chunk_texts),
+            'recap': day_recap(model, day_chunks, chunk_texts),
+            'duration_hours': round(study_plan.durations[i], 2),
+            'chunk_ranges': content_model.format_chunk_ranges(day_chunks)
+        }
+
+def load_content(filepath, content_key=None):
+    """(ContentModel, cached text path) of an ingested document.
+    
+    With the content key recorded at upload, the model and text are read
+    from the cache by key, so a URL material is not fetched again. They are
+    rebuilt from filepath only when the cache has lost them and the source
+    still has that content; otherwise the chunk ids stored with its plan
+    would point into different text.
+    """
+    cache = text_cache.default_cache
+    if content_key:
+        model = content_model.load(content_key)
+        text_path = cache.disk_path(content_key)
+        if model is not None and text_path is not None:
+            return model, text_path
+    
+    key = text_cache.cache_key_for(filepath)
+    if key is None or (content_key and key != content_key):
+        raise ValueError("The material's source is unavailable or has changed since it was "
+                         "uploaded; upload it again")
+    model = build_content_model(filepath)
+    if not cache.disk_path(key):
+        for _ in _iter_text(filepath, key, no_progress):
+            pass
+    return model, cache.path_for(key)
+
+def materialize_plan(filepath, study_plan, content_key=None):
+    """iter_plan_days for a processed document, from its cached model and text"""
+    model, text_path = load_content(filepath, content_key)
+    return iter_plan_days(model, study_plan, _iter_file_blocks(text_path))
+
+def process_document(filepath, start_date, end_date, daily_hours, progress=no_progress,
+                     on_sentence=None, skip_dates=None, weekday_hours=None, fingerprint=None):
+    """Main document processing function with comprehensive error handling.
+
+    Builds (or loads) the content model, then schedules it. The text is
+    streamed from its cached copy, so memory stays bounded by
+    STREAM_WINDOW_CHARS rather than document size. on_sentence is passed to
+    build_content_model. skip_dates and weekday_hours are passed to
+    scheduler.day_capacities. 'study_plan' is a compact StudyPlan; day text
+    comes from materialize_plan when the plan is stored. fingerprint is
+    passed to build_content_model.
+    """
     try:
         # Validate inputs
         if not filepath:
             raise ValueError("No filepath or URL provided")
         
         start, end = validate_dates(start_date, end_date)
-        total_days = (end - start).days
         
         if daily_hours <= 0 or daily_hours > 12:
             raise ValueError("Daily study hours must be between 0.5 and 12")
         
-        # Extract text content
-        if filepath.startswith(('http://', 'https://')):
-            text = extract_text_from_url(filepath)
-        else:
-            text = extract_text_from_file(filepath)
-        
-        if not text:
-            raise ValueError("Document contains no readable text")
-        
-        # Basic text cleaning
-        text = re.sub(r'\s+', ' ', text).strip()
-        sentences = [s.strip() for s in sent_tokenize(text) if s.strip()]
-        
-        if not sentences:
-            raise ValueError("Could not extract meaningful sentences")
-        
-        # Calculate study chunks
-        available_hours = total_days * daily_hours
-        target_chunks = max(1, min(len(sentences), int(available_hours * 2)))  # 30-min chunks
-        
-        # Distribute sentences to chunks
-        chunks = []
-        sentences_per_chunk = max(1, len(sentences) // target_chunks)
-        
-        for i in range(0, len(sentences), sentences_per_chunk):
-            chunk_sentences = sentences[i:i+sentences_per_chunk]
-            chunks.append({
-                'content': ' '.join(chunk_sentences),
-                'duration': 0.5  # 30 minutes per chunk
-            })
+        model = build_content_model(filepath, progress, on_sentence, fingerprint)
         
-        # Generate study plan
-        study_plan = []
-        current_date = start
-        for chunk in chunks:
-            study_plan.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'content': chunk['content'],
-                'duration_hours': chunk['duration']
-            })
-            current_date += timedelta(days=1)
+        progress('planning')
+        with metrics.span('plan'):
+            study_plan, available_hours, required_hours = plan_study_days(
+                model, start, end, daily_hours, skip_dates, weekday_hours)
         
         return {
-            'word_count': len(word_tokenize(text)),
-            'estimated_hours': len(sentences) / 120,  # Approx 2 sentences per minute
+            'word_count': model.word_count,
+            'estimated_hours': required_hours,
             'available_hours': available_hours,
+            'overloaded': required_hours > available_hours,
             'study_plan': study_plan,
-            'content_summary': summarize_content(sentences)
+            'fingerprint': model.fingerprint,
+            'content_summary': model.content_summary
         }
         
     except Exception as e:
         raise ValueError(f"Document processing failed: {str(e)}")
 
-def summarize_content(sentences):
-    """Generate a simple summary from sentences"""
-    try:
-        if len(sentences) <= 3:
-            return ' '.join(sentences)
-        
-        # Simple summary: first, last, and a middle sentence
-        return '\n'.join([
-            sentences[0],
-            sentences[len(sentences)//2],
-            sentences[-1]
-        ])
-    except:
-        return "Could not generate summary"
-
-def answer_question(filepath, question):
-    """Basic question answering using keyword matching"""
+def replan_document(filepath, start_date, end_date, daily_hours, skip_dates=None,
+                    weekday_hours=None, completed_chunks=(), content_key=None):
+    """Re-schedule an ingested document for new dates or hours.
+
+    Uses the cached content model and text (looked up by content_key, see
+    load_content), so nothing is re-extracted or re-tokenized. Chunks in
+    completed_chunks, and near-duplicate chunks, are left out of the new
+    plan.
+    """
+    start, end = validate_dates(start_date, end_date)
+    
+    if daily_hours <= 0 or daily_hours > 12:
+        raise ValueError("Daily study hours must be between 0.5 and 12")
+    
+    model, _ = load_content(filepath, content_key)
+    completed_chunks = set(completed_chunks)
+    remaining = [c for c in model.study_chunks() if c not in completed_chunks]
+    
+    study_plan, available_hours, required_hours = plan_study_days(
+        model, start, end, daily_hours, skip_dates, weekday_hours, remaining)
+    
+    return {
+        'estimated_hours': required_hours,
+        'available_hours': available_hours,
+        'overloaded': required_hours > available_hours,
+        'study_plan': study_plan
+    }
+
+def map_sentences(index, key, spans=None):
+    """Give an index built from tokens alone the sentences of cached text
+    key, read through mmap. The sentence index is rewritten when it is
+    missing or stale, from spans ((starts, ends) character offsets) or else
+    the content model."""
+    mapped = text_store.open_text(key)
+    if mapped is None or len(mapped) != len(index):
+        if spans is None:
+            model = content_model.load(key)
+            if model is None or model.sentence_count != len(index):
+                raise ValueError("No sentence offsets for the cached text")
+            spans = model.sentence_starts, model.sentence_ends
+        text_path = text_cache.default_cache.path_for(key)
+        text_store.write_sentence_index(key, _iter_file_blocks(text_path), *spans)
+        mapped = text_store.open_text(key)
+    
+    index.sentences = mapped
+    return index
+
+def load_document_index(filepath, content_key=None):
+    """Build the per-material sentence/token index from the cached text,
+    found by content_key when it is still cached.
+    
+    Only tokens and sentence offsets are held while reading; sentences are
+    then read through the mmapped text cache. Text that cannot be cached
+    keeps its sentences in memory.
+    """
+    if content_key and text_cache.default_cache.disk_path(content_key):
+        key = content_key
+    else:
+        key = text_cache.cache_key_for(filepath)
+    if not key:
+        return build_document_index(iter_sentences(_iter_text(filepath, key, no_progress)))
+    
+    index = DocumentIndex()
+    starts, ends = array('I'), array('I')
+    for start, end, sentence in iter_sentence_spans(_iter_text(filepath, key, no_progress)):
+        index.add_tokens(word_tokenize(sentence))
+        starts.append(start)
+        ends.append(end)
+    return map_sentences(index, key, (starts, ends))
+
+MaterialIndexes = namedtuple('MaterialIndexes', ['index', 'search_index', 'distractors'])
+
+def build_material_indexes(index):
+    """Search and distractor indexes derived from a material's token index"""
+    return MaterialIndexes(index, BM25Index(index), DistractorIndex(index))
+
+def load_material_indexes(filepath, content_key=None):
+    return build_material_indexes(load_document_index(filepath, content_key))
+
+def find_near_duplicate(filepath, key, known_documents, progress=no_progress):
+    """(content key of the matching known document or None, MinHash
+    signature) for a document. known_documents maps content keys to
+    (signature, filepath)."""
+    import fingerprints
+    
+    with _spooled_text(filepath, progress) as text_path:
+        with metrics.span('fingerprint'):
+            signature = fingerprints.minhash(_iter_file_blocks(text_path))
+    match = fingerprints.best_match(
+        signature, {k: v[0] for k, v in known_documents.items() if k != key},
+        config.DEDUPE_DOCUMENT_SIMILARITY)
+    return match, signature
+
+def ingest_document(filepath, start_date, end_date, daily_hours, skip_dates=None,
+                    weekday_hours=None, known_documents=None, progress=no_progress):
+    """Run the full upload pipeline: study plan plus token, search and distractor indexes.
+    
+    Content seen before is only planned, not processed again: a document
+    whose content model is cached, or a near-duplicate of one of
+    known_documents (content key -> (MinHash signature, filepath)). The
+    near-duplicate's own extracted text is dropped, processed_data's
+    'filepath' names the document planned instead and 'duplicate_of' its
+    content key, so the caller can tell the user. In both cases the
+    indexes returned are None; they are loaded when first needed.
+    """
+    key = text_cache.cache_key_for(filepath)
+    cached = bool(key) and content_model.load(key) is not None
+    fingerprint = None
+    duplicate_of = None
+    if key and not cached and known_documents:
+        progress('extracting')
+        duplicate_of, fingerprint = find_near_duplicate(filepath, key, known_documents, progress)
+        if duplicate_of:
+            text_cache.default_cache.discard(key)
+            filepath = known_documents[duplicate_of][1]
+            key, fingerprint = text_cache.cache_key_for(filepath), None
+            cached = bool(key) and content_model.load(key) is not None
+    
+    if cached:
+        processed_data = process_document(filepath, start_date, end_date, daily_hours, progress,
+                                          skip_dates=skip_dates, weekday_hours=weekday_hours)
+        processed_data['content_key'] = key
+        processed_data['filepath'] = filepath
+        processed_data['duplicate_of'] = duplicate_of
+        return processed_data, None
+    
+    # The token index is filled from process_document's sentence pass. Its
+    # sentences are read from the text cache, so none are held in memory,
+    # unless the text cannot be cached
+    index = DocumentIndex()
+    
+    def on_sentence(sentence, tokens):
+        index.add_tokens(tokens, None if key else sentence)
+    
+    processed_data = process_document(filepath, start_date, end_date, daily_hours, progress,
+                                      on_sentence=on_sentence, skip_dates=skip_dates,
+                                      weekday_hours=weekday_hours, fingerprint=fingerprint)
+    
+    progress('indexing')
+    processed_data['content_key'] = key
+    processed_data['filepath'] = filepath
+    processed_data['duplicate_of'] = duplicate_of
+    if key:
+        map_sentences(index, key)
+    return processed_data, build_material_indexes(index)
+
+def answer_question(filepath, question, index=None, search_index=None):
+    """Answer a question with the best-scoring passage from the material"""
     try:
-        # Extract text
-        if filepath.startswith(('http://', 'https://')):
-            text = extract_text_from_url(filepath)
-        else:
-            text = extract_text_from_file(filepath)
+        passages = retrieve_passages(filepath, question, index, search_index, top_k=1)
         
-        if not text:
+        if passages is None:
             return "No content available to answer the question."
         
-        # Simple keyword matching
-        sentences = sent_tokenize(text)
-        question_words = set(word.lower() for word in word_tokenize(question) 
-                           if word.isalpha() and len(word) > 2)
-        
-        best_match = ""
-        best_score = 0
-        
-        for sentence in sentences:
-            sentence_words = set(word.lower() for word in word_tokenize(sentence)
-                               if word.isalpha() and len(word) > 2)
-            common_words = question_words.intersection(sentence_words)
-            score = len(common_words)
-            
-            if score > best_score:
-                best_score = score
-                best_match = sentence
-        
-        return best_match if best_match else "Answer not found in the material."
+        return passages[0]['text'] if passages else "Answer not found in the material."
     
     except Exception as e:
         return f"Error answering question: {str(e)}"
 
-def generate_quiz(filepath, difficulty='medium'):
-    """Generate quiz questions from document content"""
+def retrieve_passages(filepath, question, index=None, search_index=None, top_k=3, window=0):
+    """BM25-ranked passages for a question, or None if the material is empty"""
+    if search_index is None:
+        with metrics.span('index'):
+            if index is None:
+                index = load_document_index(filepath)
+            search_index = BM25Index(index)
+    
+    if not len(search_index.doc_index):
+        return None
+    
+    with metrics.span('score'):
+        return search_index.passages(question, top_k=top_k, window=window)
+
+def generate_quiz(filepath, difficulty='medium', index=None, distractors=None, seed=None):
+    """Generate quiz questions from document content; a seed makes it repeatable"""
     try:
-        # Extract text
-        if filepath.startswith(('http://', 'https://')):
-            text = extract_text_from_url(filepath)
-        else:
-            text = extract_text_from_file(filepath)
+        with metrics.span('index'):
+            if index is None:
+                index = load_document_index(filepath)
+            if distractors is None:
+                distractors = DistractorIndex(index)
         
-        if not text:
+        if not len(index):
             return []
         
-        sentences = [s for s in sent_tokenize(text) if len(word_tokenize(s)) > 6]
-        
-        # Determine question count based on difficulty
-        question_counts = {'easy': 5, 'medium': 10, 'hard': 15, 'pro': 20}
-        num_questions = min(question_counts.get(difficulty, 10), len(sentences))
-        
-        questions = []
-        used_sentences = set()
-        
-        while len(questions) < num_questions and len(used_sentences) < len(sentences):
-            # Find an unused sentence
-            sentence = None
-            for s in sentences:
-                if s not in used_sentences and len(word_tokenize(s)) > 8:
-                    sentence = s
-                    used_sentences.add(s)
-                    break
-            
-            if not sentence:
-                break
-            
-            # Create fill-in-the-blank question
-            words = word_tokenize(sentence)
-            blank_pos = random.randint(1, len(words)-2)
-            correct = words[blank_pos]
-            
-            # Skip if blank word is too short or not alphabetic
-            if len(correct) <= 2 or not correct.isalpha():
-                continue
-            
-            # Generate question and options
-            question_text = ' '.join(words[:blank_pos] + ['______'] + words[blank_pos+1:])
-            options = [correct]
-            
-            # Add similar words as distractors
-            for word in word_tokenize(text):
-                if (word[0].lower() == correct[0].lower() and 
-                    word.lower() != correct.lower() and 
-                    word.isalpha() and
-                    len(word) > 2 and
-                    word not in options):
-                    options.append(word)
-                    if len(options) >= 4:
-                        break
-            
-            # Fill with random words if needed
-            while len(options) < 4:
-                random_word = random.choice(word_tokenize(text))
-                if random_word.isalpha() and random_word not in options:
-                    options.append(random_word)
-            
-            random.shuffle(options)
-            correct_index = options.index(correct)
-            
-            questions.append({
-                'question': f"Fill in the blank: {question_text}",
-                'options': options,
-                'correct_answer': chr(65 + correct_index)  # A, B, C, or D
-            })
-        
-        return questions
+        num_questions = QUESTION_COUNTS.get(difficulty, 10)
+        with metrics.span('quiz_generate'):
+            return generate_questions(index, distractors, num_questions, random.Random(seed),
+                                      word_tokenize)
     
     except Exception as e:
         print(f"Error generating quiz: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+def build_quiz_pool(content_key, difficulty, index, distractors):
+    """Candidate questions for a material and difficulty, several times the
+    quiz length, generated reproducibly from the content key"""
+    pool_size = QUESTION_COUNTS.get(difficulty, 10) * config.QUIZ_POOL_MULTIPLIER
+    rng = random.Random(pool_seed(content_key, difficulty))
+    with metrics.span('quiz_generate'):
+        return generate_questions(index, distractors, pool_size, rng, word_tokenize)
@@ -0,0 +1,174 @@
+"""Near-duplicate detection: MinHash for documents, SimHash for chunks.
+
+A document's MinHash signature holds, for each of NUM_PERMUTATIONS hash
+functions, the smallest hash of any of its word shingles. The share of
+positions where two signatures agree estimates the Jaccard similarity of
+the two shingle sets, so a re-exported or lightly edited copy of a file
+matches its original even though the bytes, and so the content key, differ.
+
+A chunk's SimHash is a 64-bit sketch of its sentences in which similar
+chunks differ in few bits. Chunks within a few bits of an earlier chunk
+(repeated slides, boilerplate pages) are left out of the study plan.
+"""
+import re
+import zlib
+from array import array
+
+import numpy as np
+
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 128
+SIMHASH_BITS = 64
+
+# Letters only, so page numbers and dates do not tell copies apart
+_WORD = re.compile(r'[^\W\d_]+')
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHINGLE_PRIME = np.uint64(1099511628211)
+_BLOCK_SHINGLES = 8192
+
+
+def _splitmix64(seed, count):
+    """Fixed pseudo-random 64-bit values; signatures are stored, so the hash
+    functions must never change"""
+    values = []
+    for _ in range(count):
+        seed = (seed + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = seed
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        values.append(z ^ (z >> 31))
+    return np.array(values, dtype=np.uint64)
+
+
+# Multiply-add-shift hashes of 32-bit shingle hashes to 32 bits
+_MULTIPLIERS = _splitmix64(1, NUM_PERMUTATIONS)[:, None]
+_ADDENDS = _splitmix64(2, NUM_PERMUTATIONS)[:, None]
+
+
+def _shingle_hashes(word_hashes):
+    """32-bit hashes of every run of SHINGLE_WORDS consecutive words"""
+    words = np.array(word_hashes, dtype=np.uint64)
+    count = len(words) - SHINGLE_WORDS + 1
+    shingles = words[:count].copy()
+    for offset in range(1, SHINGLE_WORDS):
+        shingles = shingles * _SHINGLE_PRIME + words[offset:offset + count]
+    return np.unique((shingles ^ (shingles >> np.uint64(32))) & _MASK32)
+
+
+def _update_signature(signature, shingles):
+    for first in range(0, len(shingles), _BLOCK_SHINGLES):
+        block = shingles[first:first + _BLOCK_SHINGLES][None, :]
+        hashes = (_MULTIPLIERS * block + _ADDENDS) >> np.uint64(32)
+        np.minimum(signature, hashes.min(axis=1), out=signature)
+
+
+def minhash(blocks):
+    """MinHash signature (bytes) of the word shingles of normalized text
+    blocks, as produced by document_processor's text stream"""
+    signature = np.full(NUM_PERMUTATIONS, 0xFFFFFFFF, dtype=np.uint64)
+    word_hashes = {}
+    window = []  # hashes of words whose shingles are not all hashed yet
+    shingled = False
+    tail = ''
+
+    def add_words(text):
+        nonlocal window, shingled
+        for word in _WORD.findall(text.lower()):
+            word_hash = word_hashes.get(word)
+            if word_hash is None:
+                word_hash = word_hashes[word] = zlib.crc32(word.encode('utf-8'))
+            window.append(word_hash)
+        if len(window) >= SHINGLE_WORDS:
+            _update_signature(signature, _shingle_hashes(window))
+            shingled = True
+            window = window[-(SHINGLE_WORDS - 1):]
+
+    for block in blocks:
+        text = tail + block
+        # The last word may continue in the next block
+        cut = text.rfind(' ')
+        if cut < 0:
+            tail = text
+            continue
+        tail = text[cut:]
+        add_words(text[:cut])
+    add_words(tail)
+
+    if not shingled and window:
+        # Too short for a single shingle: the words are the shingles
+        _update_signature(signature, np.unique(np.array(window, dtype=np.uint64)))
+    return signature.astype('<u4').tobytes()
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return float(np.mean(np.frombuffer(first, dtype='<u4') == np.frombuffer(second, dtype='<u4')))
+
+
+def best_match(signature, candidates, threshold):
+    """Key of the candidate (a dict of key -> signature) most similar to
+    signature, if it reaches threshold; else None"""
+    candidates = {key: value for key, value in candidates.items()
+                  if value and len(value) == len(signature)}
+    if not candidates:
+        return None
+    keys = list(candidates)
+    stacked = np.frombuffer(b''.join(candidates[key] for key in keys), dtype='<u4') \
+        .reshape(len(keys), -1)
+    scores = (stacked == np.frombuffer(signature, dtype='<u4')).mean(axis=1)
+    best = int(np.argmax(scores))
+    return keys[best] if scores[best] >= threshold else None
+
+
+def sentence_hash(sentence):
+    """32-bit hash of a sentence, the unit chunk SimHashes are built from"""
+    return zlib.crc32(sentence.encode('utf-8'))
+
+
+def _mix64(values):
+    """splitmix64 finalizer: spreads 32-bit hashes over 64 bits"""
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def chunk_simhashes(sentence_hashes, token_counts, boundaries):
+    """SimHash of every chunk: its sentences' hashes, weighted by their
+    token counts. Sentences, rather than terms, are the features so that
+    formulaic text (numbered steps, tables) does not look repeated."""
+    features = _mix64(np.frombuffer(sentence_hashes, dtype=np.uint32))
+    weights = np.frombuffer(token_counts, dtype=np.uint32).astype(np.float64)
+    starts = np.frombuffer(boundaries, dtype=np.uint32)[:-1].astype(np.int64)
+
+    hashes = np.zeros(len(starts), dtype=np.uint64)
+    for bit in range(SIMHASH_BITS):
+        bit_set = (features >> np.uint64(bit)) & np.uint64(1)
+        totals = np.add.reduceat(np.where(bit_set, weights, -weights), starts)
+        hashes |= (totals > 0).astype(np.uint64) << np.uint64(bit)
+    return hashes
+
+
+def duplicate_chunks(sentence_hashes, token_counts, boundaries, max_distance):
+    """Ids of chunks within max_distance bits of an earlier chunk that is
+    kept. A negative max_distance turns collapsing off."""
+    duplicates = array('I')
+    if max_distance < 0 or len(boundaries) < 3:
+        return duplicates
+
+    # Hashes within max_distance bits agree exactly on at least one of
+    # max_distance + 1 bands, so only chunks sharing a band are compared
+    num_bands = max_distance + 1
+    width = SIMHASH_BITS // num_bands
+    band_mask = (1 << width) - 1
+    buckets = [{} for _ in range(num_bands)]
+    hashes = chunk_simhashes(sentence_hashes, token_counts, boundaries)
+    for chunk_id, value in enumerate(hashes.tolist()):
+        keys = [(value >> (band * width)) & band_mask for band in range(num_bands)]
+        if any((value ^ kept).bit_count() <= max_distance
+               for band, key in enumerate(keys) for kept in buckets[band].get(key, ())):
+            duplicates.append(chunk_id)
+            continue
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(value)
+    return duplicates
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+import config
+import metrics
+
+# requests, bs4 and lxml are imported on first use to keep startup cheap
+_html_parser = None
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide requests.Session with pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=config.HTTP_POOL_SIZE,
+                                      pool_maxsize=config.HTTP_POOL_SIZE,
+                                      max_retries=1)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'AI-Study-Planner/1.0'
+                _session = session
+    return _session
+
+
+class FetchResult:
+    """A fetched body; url is where it was served from, after redirects"""
+
+    def __init__(self, url, body, headers, from_cache):
+        self.url = url
+        self.body = body
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def charset(self):
+        """Charset declared in Content-Type, if any"""
+        match = re.search(r'charset=([\w-]+)', self.headers.get('Content-Type', ''), re.I)
+        return match.group(1) if match else None
+
+    @property
+    def content_hash(self):
+        return hashlib.sha256(self.body).hexdigest()
+
+
+class HttpCache:
+    """On-disk HTTP cache: a JSON metadata file and a body file per URL"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def _paths(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.folder, digest[:2], digest)
+        return base + '.json', base + '.body'
+
+    def get(self, url):
+        """(metadata, body) for url, or None"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            with open(body_path, 'rb') as file:
+                body = file.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        return meta, body
+
+    def put(self, url, meta, body=None):
+        """Store metadata, and the body when given (None keeps the stored one)"""
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        if body is not None:
+            _atomic_write(body_path, body)
+        _atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def delete(self, url):
+        """Drop the entry for url, if any"""
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _atomic_write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Response headers kept with a cached body; a 304 may update all but Content-Type
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+
+def _cache_directives(headers):
+    directives = {}
+    for part in headers.get('Cache-Control', '').lower().split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name] = value.strip('"')
+    return directives
+
+
+def _read_capped(response, limit):
+    declared = response.headers.get('Content-Length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise ValueError(f"Response exceeds {limit} bytes")
+
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(64 * 1024):
+        size += len(chunk)
+        if size > limit:
+            raise ValueError(f"Response exceeds {limit} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def fetch(url, cache=None, timeout=None, max_bytes=None):
+    """GET url through the pooled session and the HTTP cache.
+
+    A cached entry is served without a request while it is fresh (see
+    _fresh_until); otherwise it is revalidated with If-None-Match/
+    If-Modified-Since and reused on 304, taking the validators and
+    Cache-Control the 304 carries. no-store responses are never cached and
+    drop any entry already stored. Redirects are followed; the result's url
+    is the final one.
+    """
+    cache = cache or default_cache
+    timeout = timeout or config.HTTP_TIMEOUT
+    max_bytes = max_bytes or config.HTTP_MAX_BODY_BYTES
+    now = time.time()
+
+    cached = cache.get(url)
+    headers = {}
+    if cached:
+        meta, body = cached
+        if now < meta.get('fresh_until', 0):
+            metrics.CACHE_REQUESTS.inc(cache='http', result='hit')
+            return FetchResult(meta.get('url', url), body, meta['headers'], from_cache=True)
+        if meta['headers'].get('ETag'):
+            headers['If-None-Match'] = meta['headers']['ETag']
+        if meta['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if cached and response.status_code == 304:
+            meta, body = cached
+            meta['headers'].update({name: response.headers[name] for name in KEPT_HEADERS[1:]
+                                    if name in response.headers})
+            if 'no-store' in _cache_directives(response.headers):
+                cache.delete(url)
+            else:
+                meta['fresh_until'] = _fresh_until(meta['headers'], now)
+                cache.put(url, meta)
+            metrics.CACHE_REQUESTS.inc(cache='http', result='revalidated')
+            return FetchResult(meta.get('url', url), body, meta['headers'], from_cache=True)
+
+        metrics.CACHE_REQUESTS.inc(cache='http', result='miss')
+        response.raise_for_status()
+        body = _read_capped(response, max_bytes)
+        kept_headers = {name: response.headers[name] for name in KEPT_HEADERS
+                        if name in response.headers}
+        final_url = response.url or url
+
+    if 'no-store' in _cache_directives(response.headers):
+        cache.delete(url)
+    else:
+        cache.put(url, {'url': final_url, 'headers': kept_headers,
+                        'fresh_until': _fresh_until(response.headers, now)}, body)
+    return FetchResult(final_url, body, kept_headers, from_cache=False)
+
+
+def _fresh_until(headers, now):
+    """Time until which a response may be reused without revalidating: the
+    server's max-age, or HTTP_REVALIDATE_SECONDS when it sets none.
+    no-cache and must-revalidate responses are revalidated on every use."""
+    directives = _cache_directives(headers)
+    if 'no-cache' in directives or 'must-revalidate' in directives:
+        return 0
+    max_age = directives.get('max-age', '')
+    if max_age.isdigit():
+        return now + int(max_age)
+    return now + config.HTTP_REVALIDATE_SECONDS
+
+
+def html_parser():
+    """'lxml' when it is installed, else the stdlib 'html.parser'"""
+    global _html_parser
+    if _html_parser is None:
+        try:
+            import lxml  # noqa: F401
+            _html_parser = 'lxml'
+        except ImportError:
+            _html_parser = 'html.parser'
+    return _html_parser
+
+
+def parse_html(result):
+    """BeautifulSoup tree for a fetched page, using lxml when it is installed"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(result.body, html_parser(), from_encoding=result.charset)
+
+
+default_cache = HttpCache(config.HTTP_CACHE_FOLDER)
@@ -0,0 +1,161 @@
+import json
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import config
+
+
+class DictStore:
+    """Job store over a dict, or a multiprocessing.Manager dict proxy that
+    process pool workers can write to. Jobs in it are visible to this
+    process only."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def _job_key(job_id, part):
+    return f"job:{job_id}:{part}"
+
+
+def _read(store, job_id, part):
+    data = store.get(_job_key(job_id, part))
+    return json.loads(data) if data is not None else None
+
+
+def _write(store, job_id, part, value):
+    store.set(_job_key(job_id, part), json.dumps(value).encode('utf-8'))
+
+
+class JobProgress:
+    """Picklable progress callback that records a job's current stage in
+    the job store, from whichever process runs the job"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def __call__(self, stage, current=None, total=None):
+        _write(self.store, self.job_id, 'progress',
+               {'stage': stage, 'current': current, 'total': total})
+
+
+class JobQueue:
+    """Runs ingestion work on a thread or process pool and tracks its status.
+
+    Job state and progress are kept in store, anything with get/set/delete
+    of bytes. A shared_cache store (SQLiteStore, RedisStore) makes every job
+    visible to all server processes using it, so any worker can answer a
+    status poll; by default jobs are seen by this process only.
+    """
+
+    def __init__(self, max_workers=2, mode='thread', retention_seconds=3600, store=None):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self.mode = mode
+        self.retention_seconds = retention_seconds
+        self._finished = {}  # job id -> finish time, for jobs submitted here
+        self._lock = threading.Lock()
+
+        if mode == 'process':
+            # Workers must not be forked from a server that is running threads
+            context = multiprocessing.get_context(config.WORKER_START_METHOD)
+            if store is None:
+                self._manager = context.Manager()
+                store = DictStore(self._manager.dict())
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        else:
+            if store is None:
+                store = DictStore({})
+            self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                thread_name_prefix='ingest')
+        self.store = store
+
+    def submit(self, fn, *args, owner=None, on_success=None, on_failure=None):
+        """Queue fn(*args, progress=...) and return a job id.
+
+        on_success(result) runs in this process once fn returns; its return
+        value, which must be JSON-serializable, is reported as the job's
+        result. on_failure(exception) runs in this process if fn or
+        on_success raises, e.g. to remove files the job was given.
+        """
+        self._prune()
+
+        job_id = str(uuid.uuid4())
+        _write(self.store, job_id, 'state', {
+            'id': job_id,
+            'owner': owner,
+            'status': 'queued',
+            'result': None,
+            'error': None,
+            'finished_at': None
+        })
+        _write(self.store, job_id, 'progress', {'stage': 'queued', 'current': None, 'total': None})
+
+        future = self._executor.submit(fn, *args, progress=JobProgress(self.store, job_id))
+        future.add_done_callback(lambda f: self._finish(job_id, f, on_success, on_failure))
+        return job_id
+
+    def _finish(self, job_id, future, on_success, on_failure):
+        status, result, error = 'done', None, None
+        try:
+            result = future.result()
+            if on_success:
+                result = on_success(result)
+        except Exception as e:
+            status, error = 'failed', str(e)
+            if on_failure:
+                try:
+                    on_failure(e)
+                except Exception:
+                    # Cleanup problems must not hide the job's own error
+                    pass
+
+        job = _read(self.store, job_id, 'state')
+        if job is None:
+            return
+        finished_at = time.time()
+        job.update(status=status, result=result, error=error, finished_at=finished_at)
+        _write(self.store, job_id, 'state', job)
+        _write(self.store, job_id, 'progress', {'stage': status, 'current': None, 'total': None})
+        with self._lock:
+            self._finished[job_id] = finished_at
+
+    def status(self, job_id):
+        """Snapshot of a job's state, or None if unknown or expired"""
+        job = _read(self.store, job_id, 'state')
+        if job is None:
+            return None
+        if job['finished_at'] and job['finished_at'] < time.time() - self.retention_seconds:
+            return None
+
+        progress = _read(self.store, job_id, 'progress') or {}
+        if job['status'] == 'queued' and progress.get('stage') not in (None, 'queued'):
+            job['status'] = 'running'
+        job.update(progress)
+        return job
+
+    def _prune(self):
+        """Drop the stored state of expired jobs submitted here"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, finished_at in self._finished.items()
+                       if finished_at < cutoff]
+            for job_id in expired:
+                del self._finished[job_id]
+        for job_id in expired:
+            self.store.delete(_job_key(job_id, 'state'))
+            self.store.delete(_job_key(job_id, 'progress'))
@@ -0,0 +1,168 @@
+"""In-process counters, histograms and per-request stage timings.
+
+Rendered in the Prometheus text exposition format by /metrics. Values are
+per process: with several server workers, scrape each one (or aggregate
+in Prometheus). Work done in process-pool workers is not counted.
+"""
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    'study_planner_request_seconds', 'Request latency by route.',
+    ('route', 'method', 'status')))
+STAGE_SECONDS = registry.register(Histogram(
+    'study_planner_stage_seconds', 'Time spent in each processing stage.', ('stage',)))
+CACHE_REQUESTS = registry.register(Counter(
+    'study_planner_cache_requests_total', 'Cache lookups by cache and result.',
+    ('cache', 'result')))
+CACHE_REJECTED = registry.register(Counter(
+    'study_planner_cache_rejected_total', 'Entries too large for their cache.', ('cache',)))
+DOCUMENT_PAGES = registry.register(Histogram(
+    'study_planner_document_pages', 'Pages per extracted PDF.', ('format',),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)))
+DOCUMENT_BYTES = registry.register(Histogram(
+    'study_planner_document_bytes', 'Size of ingested files.', ('format',),
+    buckets=tuple(1024 * 4 ** n for n in range(10))))
+DOCUMENT_WORDS = registry.register(Histogram(
+    'study_planner_document_words', 'Words per ingested document.',
+    buckets=(100, 1000, 10000, 50000, 100000, 250000, 500000, 1000000)))
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+_request = threading.local()
+
+
+def start_request():
+    """Collect this thread's stage timings until finish_request"""
+    _request.stages = {}
+
+
+def finish_request():
+    """{stage: seconds} recorded on this thread since start_request"""
+    stages = getattr(_request, 'stages', None) or {}
+    _request.stages = None
+    return stages
+
+
+@contextmanager
+def span(stage):
+    """Time a block as one stage, for the stage histogram and the current
+    request's Server-Timing header"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        stages = getattr(_request, 'stages', None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+
+
+def server_timing(stages):
+    """Server-Timing header value for finish_request() output"""
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in stages.items())
@@ -1,6 +1,116 @@
 # models.py
+import sqlite3
 from datetime import datetime
-from app import db
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+db = SQLAlchemy()
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """WAL lets readers in other workers proceed while one worker writes"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Material(db.Model):
+    """One uploaded file or URL and its plan summary; plan text lives in PlanDay"""
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    filename = db.Column(db.String(500), nullable=False)
+    filepath = db.Column(db.String(1000), nullable=False)
+    start_date = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD
+    end_date = db.Column(db.String(10), nullable=False)
+    daily_hours = db.Column(db.Float, nullable=False)
+    content_key = db.Column(db.String(64))  # text cache key; changes when the content does
+    fingerprint = db.Column(db.LargeBinary)  # MinHash signature, for near-duplicate uploads
+    skip_dates = db.Column(db.JSON)  # ['YYYY-MM-DD', ...]
+    weekday_hours = db.Column(db.JSON)  # {'0': hours, ...}, Monday = 0
+    word_count = db.Column(db.Integer)
+    estimated_hours = db.Column(db.Float)
+    available_hours = db.Column(db.Float)
+    overloaded = db.Column(db.Boolean, default=False)  # plan needs more than available_hours
+    content_summary = db.Column(db.Text)
+    # Bumped whenever its plan days change (replan, completed days); part of
+    # the plan endpoints' ETags
+    plan_version = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_material_user_created', 'user_id', 'created_at'),
+    )
+
+class PlanDay(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.String(36), db.ForeignKey('material.id', ondelete='CASCADE'),
+                            nullable=False)
+    day_number = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.String(10), nullable=False)
+    duration_hours = db.Column(db.Float, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    chunk_ranges = db.Column(db.String(1000))  # content model chunks, e.g. '0-4,7-9'
+    recap = db.Column(db.Text)  # top sentences of the day's content
+    hours_through = db.Column(db.Float)  # planned hours on this date and all earlier ones
+    completed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('material_id', 'day_number', name='uq_plan_day_material_day'),
+        db.Index('ix_plan_day_material_date', 'material_id', 'date'),
+    )
+
+class ProgressEvent(db.Model):
+    """Append-only log of study progress; MaterialProgress keeps the running totals"""
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.String(36), db.ForeignKey('material.id', ondelete='CASCADE'),
+                            nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'completed' or 'replanned'
+    day_number = db.Column(db.Integer)
+    hours = db.Column(db.Float, nullable=False, default=0)
+    study_date = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD of the check-in
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_progress_event_material', 'material_id', 'id'),
+    )
+
+class MaterialProgress(db.Model):
+    """Per-material progress totals, updated with every ProgressEvent so
+    feedback never has to scan the log or the plan"""
+    material_id = db.Column(db.String(36), db.ForeignKey('material.id', ondelete='CASCADE'),
+                            primary_key=True)
+    planned_hours = db.Column(db.Float, nullable=False, default=0)
+    completed_hours = db.Column(db.Float, nullable=False, default=0)
+    completed_days = db.Column(db.Integer, nullable=False, default=0)
+    streak_days = db.Column(db.Integer, nullable=False, default=0)
+    last_study_date = db.Column(db.String(10))  # YYYY-MM-DD
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+class QuizItem(db.Model):
+    """One question in a material's pool for a difficulty; quizzes are sampled from the pool"""
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.String(36), db.ForeignKey('material.id', ondelete='CASCADE'),
+                            nullable=False, index=True)
+    difficulty = db.Column(db.String(20), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    content_key = db.Column(db.String(64))  # Material.content_key the pool was built from
+    question = db.Column(db.Text, nullable=False)
+    options = db.Column(db.JSON, nullable=False)
+    correct_answer = db.Column(db.String(1), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_quiz_item_material_difficulty', 'material_id', 'difficulty', 'position'),
+    )
 
 class FinancialTransaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,4 +132,4 @@ class FinancialTransaction(db.Model):
                 [(cls.transaction_type == 'expense', cls.amount)],
                 else_=0
             )).label('expense')
-        ).group_by('month').all()
\ No newline at end of file
+        ).group_by('month').all()
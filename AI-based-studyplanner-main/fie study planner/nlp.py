@@ -0,0 +1,137 @@
+"""Lazily loaded NLTK tokenizers and stopwords.
+
+NLTK is imported on first use and its models are loaded once per process.
+Data is never downloaded at runtime: install it at build time with
+`python nlp.py --download` and check it with `python nlp.py --check`.
+"""
+import os
+import sys
+import argparse
+import threading
+
+import config
+
+RESOURCES = {
+    'punkt': 'tokenizers/punkt/english.pickle',
+    'stopwords': 'corpora/stopwords/english'
+}
+
+_lock = threading.Lock()
+_sentence_tokenizer = None
+_word_tokenizer = None
+_stopwords = None
+
+
+def _nltk_data():
+    import nltk.data
+    data_dir = os.path.abspath(config.NLTK_DATA_DIR)
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    return nltk.data
+
+
+def _missing(name):
+    return RuntimeError(f"NLTK '{name}' data is not installed; run `python nlp.py --download`")
+
+
+def missing_resources():
+    """Names of required NLTK resources that cannot be found"""
+    data = _nltk_data()
+    missing = []
+    for name, path in RESOURCES.items():
+        try:
+            data.find(path)
+        except LookupError:
+            missing.append(name)
+    return missing
+
+
+def _load_punkt():
+    try:
+        return _nltk_data().load(RESOURCES['punkt'])
+    except LookupError:
+        raise _missing('punkt')
+
+
+def _load_word_tokenizer():
+    from nltk.tokenize.destructive import NLTKWordTokenizer
+    return NLTKWordTokenizer()
+
+
+def _load_stopwords():
+    try:
+        words = _nltk_data().load(RESOURCES['stopwords'], format='text', cache=False)
+        return frozenset(word.strip() for word in words.splitlines() if word.strip())
+    except LookupError:
+        raise _missing('stopwords')
+
+
+def sentence_tokenizer():
+    """The punkt sentence tokenizer, loaded once and shared by all threads"""
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        with _lock:
+            if _sentence_tokenizer is None:
+                _sentence_tokenizer = _load_punkt()
+    return _sentence_tokenizer
+
+
+def word_tokenizer():
+    global _word_tokenizer
+    if _word_tokenizer is None:
+        with _lock:
+            if _word_tokenizer is None:
+                _word_tokenizer = _load_word_tokenizer()
+    return _word_tokenizer
+
+
+def stopwords():
+    """English stopwords as a frozenset"""
+    global _stopwords
+    if _stopwords is None:
+        with _lock:
+            if _stopwords is None:
+                _stopwords = _load_stopwords()
+    return _stopwords
+
+
+def sent_tokenize(text):
+    """Same result as nltk.sent_tokenize(text) without reloading punkt per call"""
+    return sentence_tokenizer().tokenize(text)
+
+
+def word_tokenize(text):
+    """Same result as nltk.word_tokenize(text)"""
+    tokenizer = word_tokenizer()
+    return [token for sentence in sent_tokenize(text) for token in tokenizer.tokenize(sentence)]
+
+
+def warm():
+    """Load every model now, so forked workers inherit them"""
+    sentence_tokenizer()
+    word_tokenizer()
+    stopwords()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Install or check NLTK data")
+    parser.add_argument('--download', action='store_true',
+                        help=f"download missing data into {config.NLTK_DATA_DIR}")
+    parser.add_argument('--check', action='store_true',
+                        help="exit non-zero if any data is missing")
+    args = parser.parse_args(argv)
+
+    missing = missing_resources()
+    if args.download and missing:
+        import nltk
+        for name in missing:
+            nltk.download(name, download_dir=os.path.abspath(config.NLTK_DATA_DIR))
+        missing = missing_resources()
+
+    for name in RESOURCES:
+        print(f"{name}: {'missing' if name in missing else 'ok'}")
+    return 1 if missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
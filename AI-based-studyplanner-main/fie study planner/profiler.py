@@ -0,0 +1,75 @@
+"""Sampling profiler for slow requests.
+
+A single background thread samples the stacks of the request threads it is
+tracking. When a request turns out slower than the threshold its samples
+are written in the folded format ("frame;frame;frame count" per line),
+which flamegraph.pl and speedscope read directly.
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+
+def fold(frame):
+    """Folded stack for a frame, outermost call first"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def track(self, thread_id):
+        """Start sampling a thread"""
+        with self._lock:
+            self._tracked[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler',
+                                                 daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def untrack(self, thread_id):
+        """Stop sampling a thread and return its folded-stack counts"""
+        with self._lock:
+            return self._tracked.pop(thread_id, None) or Counter()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._tracked
+            if idle:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, counts in self._tracked.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_id:
+                        counts[fold(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+def write_folded(counts, folder, name):
+    """Write folded stacks to folder/<timestamp>_<name>.folded and return the path"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}.folded")
+    with open(path, 'w', encoding='utf-8') as file:
+        for stack, count in counts.most_common():
+            file.write(f"{stack} {count}\n")
+    return path
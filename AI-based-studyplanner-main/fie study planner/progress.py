@@ -0,0 +1,195 @@
+"""Study progress: an append-only event log plus running per-material totals.
+
+A check-in claims the plan day with a conditional UPDATE, appends a
+ProgressEvent and adjusts MaterialProgress with relative UPDATEs in the
+same transaction, so concurrent check-ins never lose or double-count an
+update. Feedback reads the totals row plus one indexed PlanDay lookup,
+whatever the length of the plan or of the history.
+"""
+import math
+from datetime import datetime, date, timedelta
+
+import config
+from models import db, Material, PlanDay, ProgressEvent, MaterialProgress
+
+
+def add_hours_through(rows):
+    """Set 'hours_through' on PlanDay row dicts: planned hours up to and
+    including each day, in date order (of days sharing a date, the last
+    one counts them all). Returns the total planned hours."""
+    total = 0.0
+    for row in sorted(rows, key=lambda row: (row['date'], row['day_number'])):
+        total += row['duration_hours']
+        row['hours_through'] = round(total, 4)
+    return total
+
+
+def progress_row(material_id, planned_hours, completed_hours=0.0, completed_days=0):
+    """MaterialProgress column values for a newly stored material"""
+    return {
+        'material_id': material_id,
+        'planned_hours': planned_hours,
+        'completed_hours': completed_hours,
+        'completed_days': completed_days,
+        'streak_days': 0,
+        'updated_at': datetime.now()
+    }
+
+
+def get_progress(material_id):
+    """MaterialProgress for a material. Materials stored before progress was
+    tracked get one built from their plan; the caller commits."""
+    progress = db.session.get(MaterialProgress, material_id)
+    if progress is not None:
+        return progress
+
+    planned, completed, days = db.session.query(
+        db.func.coalesce(db.func.sum(PlanDay.duration_hours), 0.0),
+        db.func.coalesce(db.func.sum(db.case((PlanDay.completed_at.isnot(None),
+                                              PlanDay.duration_hours), else_=0.0)), 0.0),
+        db.func.count(PlanDay.completed_at)
+    ).filter(PlanDay.material_id == material_id).one()
+    progress = MaterialProgress(**progress_row(material_id, planned, completed, days))
+    db.session.add(progress)
+    db.session.flush()
+    return progress
+
+
+def bump_plan_version(material_id):
+    """Mark a material's plan days as changed, so cached copies of them are
+    not revalidated; the caller commits"""
+    db.session.execute(
+        db.update(Material)
+        .where(Material.id == material_id)
+        .values(plan_version=Material.plan_version + 1)
+    )
+
+
+def record_completion(material_id, day_number, now=None):
+    """Mark a plan day completed and return its completed_at, or None if the
+    day does not exist. Completing a day twice changes nothing."""
+    now = now or datetime.now()
+    day = db.session.query(PlanDay.duration_hours, PlanDay.completed_at) \
+        .filter_by(material_id=material_id, day_number=day_number).first()
+    if day is None:
+        return None
+    if day.completed_at is not None:
+        return day.completed_at
+
+    get_progress(material_id)
+    claimed = db.session.execute(
+        db.update(PlanDay)
+        .where(PlanDay.material_id == material_id, PlanDay.day_number == day_number,
+               PlanDay.completed_at.is_(None))
+        .values(completed_at=now)
+    ).rowcount
+    if not claimed:
+        # Another request got there first
+        db.session.rollback()
+        return db.session.query(PlanDay.completed_at) \
+            .filter_by(material_id=material_id, day_number=day_number).scalar()
+
+    today = now.date().isoformat()
+    yesterday = (now.date() - timedelta(days=1)).isoformat()
+    db.session.add(ProgressEvent(material_id=material_id, kind='completed',
+                                 day_number=day_number, hours=day.duration_hours,
+                                 study_date=today, created_at=now))
+    db.session.execute(
+        db.update(MaterialProgress)
+        .where(MaterialProgress.material_id == material_id)
+        .values(completed_hours=MaterialProgress.completed_hours + day.duration_hours,
+                completed_days=MaterialProgress.completed_days + 1,
+                streak_days=db.case(
+                    (MaterialProgress.last_study_date == today, MaterialProgress.streak_days),
+                    (MaterialProgress.last_study_date == yesterday,
+                     MaterialProgress.streak_days + 1),
+                    else_=1),
+                last_study_date=today,
+                updated_at=now)
+    )
+    bump_plan_version(material_id)
+    db.session.commit()
+    return now
+
+
+def record_replan(material_id, planned_hours, now=None):
+    """Log a replan and reset the planned total; the caller commits. Completed
+    days are kept by a replan, so the completed totals stand."""
+    now = now or datetime.now()
+    get_progress(material_id)
+    db.session.add(ProgressEvent(material_id=material_id, kind='replanned', hours=planned_hours,
+                                 study_date=now.date().isoformat(), created_at=now))
+    db.session.execute(
+        db.update(MaterialProgress)
+        .where(MaterialProgress.material_id == material_id)
+        .values(planned_hours=planned_hours, updated_at=now)
+    )
+    bump_plan_version(material_id)
+
+
+def hours_due(material_id, today):
+    """Planned hours on or before today"""
+    due = db.session.query(PlanDay.hours_through) \
+        .filter(PlanDay.material_id == material_id, PlanDay.date <= today.isoformat()) \
+        .order_by(PlanDay.date.desc(), PlanDay.hours_through.desc()) \
+        .limit(1).scalar()
+    return due or 0.0
+
+
+def build_feedback(material, progress, due_hours, today):
+    """/feedback payload from the running totals"""
+    start = date.fromisoformat(material.start_date)
+    end = date.fromisoformat(material.end_date)
+    planned = progress.planned_hours or 0.0
+    completed = progress.completed_hours or 0.0
+    remaining = max(0.0, planned - completed)
+    backlog = max(0.0, due_hours - completed)
+
+    # A streak survives until the end of the day after the last check-in
+    streak = progress.streak_days or 0
+    if progress.last_study_date is None \
+            or date.fromisoformat(progress.last_study_date) < today - timedelta(days=1):
+        streak = 0
+
+    if remaining <= 0:
+        estimated = date.fromisoformat(progress.last_study_date) if progress.last_study_date \
+            else today
+    elif completed > 0:
+        pace = completed / max(1, (today - start).days + 1)
+        estimated = today + timedelta(days=math.ceil(remaining / pace))
+    else:
+        estimated = end
+
+    suggestions = []
+    if remaining <= 0:
+        suggestions.append("All study days are done. Take a quiz to check what stuck.")
+    elif backlog > config.PROGRESS_BACKLOG_SLACK_HOURS:
+        suggestions.append(f"You are {backlog:.1f} hours behind the plan. "
+                           f"Catch up on the oldest open days first.")
+        if estimated > end:
+            suggestions.append("At your current pace you will finish after the end date; "
+                               "consider replanning with more daily hours or a later end date.")
+    elif completed - due_hours > config.PROGRESS_BACKLOG_SLACK_HOURS:
+        suggestions.append(f"You are {completed - due_hours:.1f} hours ahead of the plan. "
+                           f"Use the time to review with a quiz.")
+    if remaining > 0:
+        if streak >= 2:
+            suggestions.append(f"Keep your {streak}-day study streak going.")
+        elif streak == 0 and due_hours > 0:
+            suggestions.append("Complete today's session to start a study streak.")
+        if not suggestions:
+            suggestions.append("Your first study day is coming up; skim the plan to get started.")
+
+    return {
+        'progress': 100 if planned <= 0 else min(100, int(completed / planned * 100)),
+        'days_remaining': max(0, (end - today).days),
+        'end_date': material.end_date,
+        'estimated_completion': estimated.isoformat(),
+        'on_track': backlog <= config.PROGRESS_BACKLOG_SLACK_HOURS,
+        'planned_hours': round(planned, 2),
+        'completed_hours': round(completed, 2),
+        'completed_days': progress.completed_days or 0,
+        'backlog_hours': round(backlog, 2),
+        'streak_days': streak,
+        'suggestions': suggestions
+    }
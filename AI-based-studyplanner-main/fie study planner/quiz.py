@@ -0,0 +1,186 @@
+import math
+import random
+import hashlib
+from array import array
+
+from text_index import is_content_word
+
+# Questions per quiz for each difficulty
+QUESTION_COUNTS = {'easy': 5, 'medium': 10, 'hard': 15, 'pro': 20}
+
+# Suffix rules for a cheap part-of-speech guess on isolated vocabulary words;
+# tagging words out of context with a real tagger is not much better and
+# needs extra NLTK data
+_SUFFIX_CLASSES = [
+    ('ly', 'ADV'),
+    ('ing', 'VERB'), ('ed', 'VERB'), ('ize', 'VERB'), ('ise', 'VERB'), ('ate', 'VERB'),
+    ('tion', 'NOUN'), ('sion', 'NOUN'), ('ness', 'NOUN'), ('ment', 'NOUN'), ('ity', 'NOUN'),
+    ('ism', 'NOUN'), ('ist', 'NOUN'), ('er', 'NOUN'), ('or', 'NOUN'), ('ance', 'NOUN'),
+    ('ence', 'NOUN'),
+    ('ous', 'ADJ'), ('ful', 'ADJ'), ('ive', 'ADJ'), ('able', 'ADJ'), ('ible', 'ADJ'),
+    ('al', 'ADJ'), ('ic', 'ADJ'), ('less', 'ADJ'),
+]
+
+
+def word_class(word):
+    """Rough part of speech from the word's suffix"""
+    for suffix, word_class_name in _SUFFIX_CLASSES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word_class_name
+    return 'OTHER'
+
+
+class DistractorIndex:
+    """Candidate distractor terms of one material, bucketed for O(1) sampling.
+
+    Every content term (alphabetic, longer than 2 chars, not a stopword) goes
+    into buckets keyed by (part of speech, length band, frequency band) and
+    coarser fallbacks, stored as arrays of vocabulary ids.
+    """
+
+    def __init__(self, doc_index):
+        self.doc_index = doc_index
+        self.buckets = {}
+        self.term_keys = {}
+
+        for term_id, word in enumerate(doc_index.vocab):
+            if not is_content_word(word):
+                continue
+            keys = self._keys(word, doc_index.term_counts[term_id])
+            self.term_keys[term_id] = keys
+            for key in keys:
+                if key not in self.buckets:
+                    self.buckets[key] = array('I')
+                self.buckets[key].append(term_id)
+
+    @staticmethod
+    def _keys(word, count):
+        """Bucket keys from most to least specific"""
+        pos = word_class(word)
+        length_band = min(len(word), 14) // 3
+        frequency_band = int(math.log2(count))
+        return [
+            (pos, length_band, frequency_band),
+            (pos, length_band),
+            (pos,),
+            ()
+        ]
+
+    def sample(self, term_id, rng, count=3):
+        """Up to count distinct terms similar to term_id, most similar buckets first"""
+        keys = self.term_keys.get(term_id)
+        if keys is None:
+            word = self.doc_index.vocab[term_id]
+            keys = self._keys(word, max(1, self.doc_index.term_counts[term_id]))
+
+        chosen = []
+        for key in keys:
+            bucket = self.buckets.get(key)
+            if not bucket:
+                continue
+            # A few random probes per bucket keeps sampling O(1) per option
+            for _ in range(count * 4):
+                candidate = bucket[rng.randrange(len(bucket))]
+                if candidate != term_id and candidate not in chosen:
+                    chosen.append(candidate)
+                    if len(chosen) == count:
+                        return chosen
+        return chosen
+
+
+def _blankable_positions(doc_index, i, term_keys):
+    """Positions of content terms in sentence i, away from the edges"""
+    ids = doc_index.sentence_term_ids(i)
+    return [p for p in range(1, len(ids) - 1) if ids[p] in term_keys]
+
+
+def select_sentences(doc_index, distractors, num_questions):
+    """Evenly spaced sentences (with a word worth blanking) across the material.
+
+    Returns (sentence id, blankable positions) pairs. Only sentences at the
+    chosen spots, or just after them when a spot has nothing to blank, are
+    inspected.
+    """
+    offsets = doc_index.offsets
+    candidates = [i for i in range(len(doc_index)) if offsets[i + 1] - offsets[i] > 8]
+    if not candidates or num_questions <= 0:
+        return []
+
+    num_questions = min(num_questions, len(candidates))
+    step = len(candidates) / num_questions
+    selected = []
+    position = 0
+    for n in range(num_questions):
+        position = max(position, int(n * step))
+        while position < len(candidates):
+            i = candidates[position]
+            position += 1
+            positions = _blankable_positions(doc_index, i, distractors.term_keys)
+            if positions:
+                selected.append((i, positions))
+                break
+    return selected
+
+
+def generate_questions(doc_index, distractors, num_questions, rng, tokenize):
+    """Fill-in-the-blank questions for a batch of evenly spaced sentences.
+
+    Only the selected sentences are re-tokenized, to keep their original
+    casing; blanks and distractors come from the index arrays.
+    """
+    questions = []
+    for i, positions in select_sentences(doc_index, distractors, num_questions):
+        words = tokenize(doc_index.sentences[i])
+        ids = doc_index.sentence_term_ids(i)
+        if len(words) != len(ids):
+            continue
+
+        blank_pos = rng.choice(positions)
+        correct = words[blank_pos]
+        question_text = ' '.join(words[:blank_pos] + ['______'] + words[blank_pos + 1:])
+
+        options = [correct]
+        for term_id in distractors.sample(ids[blank_pos], rng):
+            word = doc_index.display[term_id]
+            if word.lower() != correct.lower() and word not in options:
+                options.append(word)
+
+        rng.shuffle(options)
+        questions.append({
+            'question': f"Fill in the blank: {question_text}",
+            'options': options,
+            'correct_answer': chr(65 + options.index(correct))  # A, B, C, or D
+        })
+
+    return questions
+
+
+def pool_seed(content_key, difficulty):
+    """Seed for a material's question pool, so rebuilding it gives the same pool"""
+    digest = hashlib.sha256(f"{content_key}:{difficulty}".encode('utf-8')).hexdigest()
+    return int(digest[:8], 16)
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(31)
+
+
+def sample_quiz(pool, difficulty, seed):
+    """The quiz for a seed: a fixed subset of the pool, in document order, with
+    options shuffled. The same pool and seed always give the same quiz."""
+    rng = random.Random(seed)
+    count = min(QUESTION_COUNTS.get(difficulty, 10), len(pool))
+    picked = sorted(rng.sample(range(len(pool)), count))
+
+    quiz = []
+    for i in picked:
+        item = pool[i]
+        correct = item['options'][ord(item['correct_answer']) - 65]
+        options = list(item['options'])
+        rng.shuffle(options)
+        quiz.append({
+            'question': item['question'],
+            'options': options,
+            'correct_answer': chr(65 + options.index(correct))
+        })
+    return quiz
@@ -0,0 +1,101 @@
+import math
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from text_index import is_content_word
+
+
+class BM25Index:
+    """Inverted index over the sentences of a DocumentIndex with BM25 scoring.
+
+    postings[term_id] is a pair of parallel arrays: ascending sentence ids and
+    the term frequency in each. Only content terms (alphabetic, longer than
+    2 chars, not stopwords) are indexed.
+    """
+
+    def __init__(self, doc_index, k1=1.5, b=0.75):
+        self.doc_index = doc_index
+        self.k1 = k1
+        self.b = b
+
+        indexed = [is_content_word(w) for w in doc_index.vocab]
+
+        self.postings = {}
+        self.lengths = array('I')
+        for i in range(len(doc_index)):
+            counts = Counter(t for t in doc_index.sentence_term_ids(i) if indexed[t])
+            self.lengths.append(sum(counts.values()))
+            for term_id, tf in counts.items():
+                if term_id not in self.postings:
+                    self.postings[term_id] = (array('I'), array('I'))
+                ids, tfs = self.postings[term_id]
+                ids.append(i)
+                tfs.append(tf)
+
+        n = len(doc_index)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+
+        # Per-term idf and the best score any single sentence can get from the
+        # term, which bounds what the remaining query terms can still add
+        self.idf = {}
+        self.max_score = {}
+        for term_id, (ids, tfs) in self.postings.items():
+            df = len(ids)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            self.idf[term_id] = idf
+            self.max_score[term_id] = max(self._term_score(idf, tf, self.lengths[i])
+                                          for i, tf in zip(ids, tfs))
+
+    def _term_score(self, idf, tf, length):
+        norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, term_ids, top_k=3):
+        """Return up to top_k (sentence_id, score) pairs, best first"""
+        terms = sorted((t for t in set(term_ids) if t in self.postings),
+                       key=self.max_score.get, reverse=True)
+        if not terms or top_k <= 0:
+            return []
+
+        remaining = [0.0] * (len(terms) + 1)
+        for j in range(len(terms) - 1, -1, -1):
+            remaining[j] = remaining[j + 1] + self.max_score[terms[j]]
+
+        scores = {}
+        for j, term_id in enumerate(terms):
+            ids, tfs = self.postings[term_id]
+            idf = self.idf[term_id]
+
+            # Once the unseen terms together cannot lift a new sentence past
+            # the current k-th best, only existing candidates need updating
+            threshold = 0.0
+            if len(scores) >= top_k:
+                threshold = heapq.nlargest(top_k, scores.values())[-1]
+
+            if remaining[j] < threshold:
+                for i in scores:
+                    pos = bisect_left(ids, i)
+                    if pos < len(ids) and ids[pos] == i:
+                        scores[i] += self._term_score(idf, tfs[pos], self.lengths[i])
+            else:
+                for i, tf in zip(ids, tfs):
+                    scores[i] = scores.get(i, 0.0) + self._term_score(idf, tf, self.lengths[i])
+
+        # Ties go to the earlier sentence
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def passages(self, question, top_k=3, window=0):
+        """Scored passages for a question, each spanning `window` neighbouring
+        sentences on either side of the matching one"""
+        sentences = self.doc_index.sentences
+        results = []
+        for i, score in self.search(self.doc_index.query_terms(question), top_k):
+            start, stop = max(0, i - window), min(len(sentences), i + window + 1)
+            results.append({
+                'sentence_id': i,
+                'score': round(score, 4),
+                'text': ' '.join(sentences[start:stop])
+            })
+        return results
@@ -0,0 +1,103 @@
+from array import array
+from datetime import timedelta
+
+
+def build_chunks(token_counts, chunk_hours, words_per_hour):
+    """Group consecutive sentences into chunks of about chunk_hours of reading.
+
+    token_counts holds the token count of each sentence. Returns
+    (boundaries, efforts): chunk i covers sentences
+    boundaries[i]:boundaries[i + 1] and takes efforts[i] hours. A short
+    ragged tail is folded into the previous chunk.
+    """
+    target_tokens = max(1, chunk_hours * words_per_hour)
+    boundaries = array('I', [0])
+    chunk_tokens = array('I')
+    tokens = 0
+
+    for i, count in enumerate(token_counts):
+        tokens += count
+        if tokens >= target_tokens:
+            boundaries.append(i + 1)
+            chunk_tokens.append(tokens)
+            tokens = 0
+
+    if len(boundaries) - 1 < len(token_counts):
+        if chunk_tokens and tokens < target_tokens / 2:
+            boundaries[-1] = len(token_counts)
+            chunk_tokens[-1] += tokens
+        else:
+            boundaries.append(len(token_counts))
+            chunk_tokens.append(tokens)
+
+    efforts = array('f', (t / words_per_hour for t in chunk_tokens))
+    return boundaries, efforts
+
+
+def day_capacities(start, num_days, daily_hours, skip_dates=None, weekday_hours=None):
+    """Study hours available on each of num_days days from start.
+
+    skip_dates is a set of dates with no study; weekday_hours maps a weekday
+    (0 = Monday) to its own cap, which never exceeds daily_hours.
+    """
+    skip_dates = skip_dates or set()
+    weekday_hours = weekday_hours or {}
+    start_date = start.date() if hasattr(start, 'date') else start
+    first_weekday = start_date.weekday()
+
+    capacities = array('f')
+    for d in range(num_days):
+        if skip_dates and start_date + timedelta(days=d) in skip_dates:
+            capacities.append(0.0)
+        else:
+            cap = weekday_hours.get((first_weekday + d) % 7, daily_hours)
+            capacities.append(max(0.0, min(cap, daily_hours)))
+    return capacities
+
+
+def schedule(efforts, capacities):
+    """Assign chunks, in order, to days in one linear pass.
+
+    Each day receives the chunks whose midpoint falls inside its share of the
+    total effort, where a day's share is proportional to its capacity. The
+    load therefore tracks capacity across the range and never runs past the
+    last day. If the material needs more hours than the range offers, the
+    chunks are still spread in proportion to capacity, so every day runs
+    over its cap by about the same factor; hours are always the real effort.
+
+    Returns (days, scale). Each entry in days is
+    (day_offset, first_chunk, end_chunk, hours); scale is the share of the
+    effort the range has room for, below 1.0 when it is overloaded.
+    """
+    total_capacity = sum(capacities)
+    total_effort = sum(efforts)
+    if not efforts or total_capacity <= 0:
+        return [], 1.0
+
+    scale = min(1.0, total_capacity / total_effort) if total_effort else 1.0
+    active_days = [d for d, cap in enumerate(capacities) if cap > 0]
+    last_day = active_days[-1]
+
+    days = []
+    i = 0
+    n = len(efforts)
+    effort_done = 0.0
+    capacity_done = 0.0
+
+    for d in active_days:
+        capacity_done += capacities[d]
+        boundary = total_effort * capacity_done / total_capacity
+        first = i
+        hours = 0.0
+
+        while i < n and (d == last_day or effort_done + efforts[i] / 2 <= boundary):
+            effort_done += efforts[i]
+            hours += efforts[i]
+            i += 1
+
+        if i > first:
+            days.append((d, first, i, hours))
+        if i == n:
+            break
+
+    return days, scale
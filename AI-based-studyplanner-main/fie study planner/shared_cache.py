@@ -0,0 +1,295 @@
+"""Two-tier object cache shared by all server workers.
+
+Values live in an in-process LRU (bounded by their serialized size) in front
+of a shared store that every worker process can read: a SQLite file by
+default, or a Redis-protocol server. Anything built in one worker, such as
+a material's search indexes or a quiz pool, is then a single read away in
+the others instead of being rebuilt N times.
+
+Values are pickled with protocol 5. Large arrays (array.array, and anything
+else that exports a PickleBuffer, e.g. NumPy arrays) travel out-of-band:
+they are appended to the blob raw and reconstructed with one copy each
+instead of going through the pickle stream.
+"""
+import io
+import os
+import time
+import pickle
+import sqlite3
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+
+import config
+import metrics
+
+# Bump when a cached class changes shape so old blobs are ignored
+CACHE_VERSION = '1'
+
+# Arrays smaller than this are pickled in-band; a buffer per tiny array
+# (e.g. BM25 postings of rare terms) would cost more than it saves
+OUT_OF_BAND_MIN_BYTES = 4096
+
+_HEADER = struct.Struct('<4sII')  # magic, buffer count, pickle length
+_MAGIC = b'SPC5'
+
+
+def _rebuild_array(typecode, buffer):
+    rebuilt = array(typecode)
+    rebuilt.frombytes(buffer)
+    return rebuilt
+
+
+class _Pickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if type(obj) is array and obj.itemsize * len(obj) >= OUT_OF_BAND_MIN_BYTES:
+            return _rebuild_array, (obj.typecode, pickle.PickleBuffer(obj))
+        return NotImplemented
+
+
+def dumps(value):
+    """Serialize to bytes: header, buffer lengths, pickle stream, raw buffers"""
+    buffers = []
+    stream = io.BytesIO()
+    _Pickler(stream, protocol=5, buffer_callback=buffers.append).dump(value)
+    payload = stream.getbuffer()
+    raws = [buffer.raw() for buffer in buffers]
+
+    out = io.BytesIO()
+    out.write(_HEADER.pack(_MAGIC, len(raws), len(payload)))
+    out.write(array('Q', [raw.nbytes for raw in raws]).tobytes())
+    out.write(payload)
+    for raw in raws:
+        out.write(raw)
+    return out.getvalue()
+
+
+def loads(data):
+    """Inverse of dumps; buffers are zero-copy views of data until rebuilt"""
+    view = memoryview(data)
+    magic, count, payload_length = _HEADER.unpack_from(view)
+    if magic != _MAGIC:
+        raise ValueError("Not a cache blob")
+
+    position = _HEADER.size
+    lengths = array('Q')
+    lengths.frombytes(view[position:position + 8 * count])
+    position += 8 * count
+    payload = view[position:position + payload_length]
+    position += payload_length
+
+    buffers = []
+    for length in lengths:
+        buffers.append(view[position:position + length])
+        position += length
+    return pickle.loads(payload, buffers=buffers)
+
+
+class LocalTier:
+    """In-process LRU of live objects, bounded by the size of their blobs"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Store value; returns False, storing nothing, when size alone is
+        over max_bytes"""
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+
+class SQLiteStore:
+    """Shared tier in a SQLite file (WAL), safe across processes.
+
+    Past max_bytes the least recently written entries are dropped.
+    Connections are per thread and per process, so the store survives
+    being created before a server forks its workers.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                               'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                               'size INTEGER NOT NULL, written REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_entries_written '
+                               'ON entries (written)')
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def __getstate__(self):
+        # Connections are per process; an unpickled store opens its own
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def get(self, key):
+        row = self._connection().execute('SELECT value FROM entries WHERE key = ?',
+                                         (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, data):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO entries (key, value, size, written) VALUES (?, ?, ?, ?)',
+            (key, data, len(data), time.time()))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def prune(self):
+        """Drop the oldest entries until the store fits in max_bytes"""
+        connection = self._connection()
+        total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        doomed = []
+        for key, size in connection.execute('SELECT key, size FROM entries ORDER BY written'):
+            doomed.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        connection.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+
+class RedisStore:
+    """Shared tier on a Redis-protocol server (Redis, Valkey, KeyDB, ...)"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("CACHE_BACKEND is a redis:// URL but the redis package "
+                             "is not installed")
+        # Size limits belong to the server (maxmemory / allkeys-lru)
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    def __getstate__(self):
+        # Clients hold sockets; an unpickled store connects again
+        return {'url': self.url}
+
+    def __setstate__(self, state):
+        self.__init__(state['url'])
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, data):
+        self._client.set(key, data)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+
+class TieredCache:
+    def __init__(self, shared, local_max_bytes):
+        self.shared = shared
+        self.local = LocalTier(local_max_bytes)
+
+    def _key(self, namespace, key):
+        return f"{CACHE_VERSION}:{namespace}:{key}"
+
+    def get(self, namespace, key):
+        """Cached value, or None"""
+        full_key = self._key(namespace, key)
+        value = self.local.get(full_key)
+        metrics.cache_result(f'{namespace}_local', value is not None)
+        if value is not None or self.shared is None:
+            return value
+
+        data = self.shared.get(full_key)
+        value = None
+        if data is not None:
+            try:
+                value = loads(data)
+            except Exception:
+                # Written by an incompatible version of a cached class
+                self.shared.delete(full_key)
+        metrics.cache_result(f'{namespace}_shared', value is not None)
+        if value is not None:
+            self.local.put(full_key, value, len(data))
+        return value
+
+    def set(self, namespace, key, value):
+        full_key = self._key(namespace, key)
+        data = dumps(value)
+        self.local.put(full_key, value, len(data))
+        if self.shared is not None:
+            self.shared.set(full_key, data)
+
+    def delete(self, namespace, key):
+        full_key = self._key(namespace, key)
+        self.local.delete(full_key)
+        if self.shared is not None:
+            self.shared.delete(full_key)
+
+
+def create_cache(backend=None):
+    """TieredCache for a CACHE_BACKEND setting: 'sqlite' (SHARED_CACHE_PATH),
+    a redis:// URL, or 'memory' for the in-process tier only"""
+    backend = backend or config.CACHE_BACKEND
+    if backend == 'memory':
+        shared = None
+    elif backend == 'sqlite':
+        shared = SQLiteStore(config.SHARED_CACHE_PATH, config.SHARED_CACHE_MAX_BYTES)
+    elif backend.startswith(('redis://', 'rediss://', 'unix://')):
+        shared = RedisStore(backend)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+    return TieredCache(shared, config.CACHE_LOCAL_MAX_BYTES)
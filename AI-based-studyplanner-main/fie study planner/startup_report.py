@@ -0,0 +1,84 @@
+"""Import-time breakdown of app startup.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and
+summarises the slowest imports. Used by `python app.py --import-report`.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def import_times(module='app'):
+    """Per-module (name, self_us, cumulative_us, depth) in import order, and
+    the wall-clock seconds the child interpreter took"""
+    started = time.perf_counter()
+    child = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                           cwd=os.path.dirname(os.path.abspath(__file__)),
+                           capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if child.returncode:
+        raise RuntimeError(f"import {module} failed:\n{child.stderr[-2000:]}")
+
+    return parse_import_times(child.stderr), elapsed
+
+
+def parse_import_times(output):
+    """(name, self_us, cumulative_us, depth) rows of -X importtime output"""
+    rows = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def summarize(rows, elapsed, top=15):
+    """Report dict: totals, the slowest top-level packages and the modules
+    with the most self time"""
+    top_level = {}
+    for name, _, cumulative_us, _ in rows:
+        package = name.split('.')[0]
+        # Submodules are listed before the package that imports them, and the
+        # package's own line carries the cumulative time of its whole subtree
+        top_level[package] = max(top_level.get(package, 0), cumulative_us)
+    return {
+        'wall_seconds': round(elapsed, 3),
+        'import_seconds': round(sum(row[1] for row in rows) / 1e6, 3),
+        'modules': len(rows),
+        'slowest_packages': sorted(top_level.items(), key=lambda item: -item[1])[:top],
+        'slowest_self': sorted(((row[0], row[1]) for row in rows), key=lambda item: -item[1])[:top]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report where app startup time goes")
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = summarize(*import_times(args.module), top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"import {args.module}: {report['wall_seconds']}s wall, "
+          f"{report['import_seconds']}s in {report['modules']} imports")
+    print("\nslowest packages (cumulative ms):")
+    for name, us in report['slowest_packages']:
+        print(f"  {us / 1000:9.1f}  {name}")
+    print("\nslowest modules (self ms):")
+    for name, us in report['slowest_self']:
+        print(f"  {us / 1000:9.1f}  {name}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,6 +13,7 @@ document.addEventListener('DOMContentLoaded', function() {
         fileInput.value = '';
         fileInput.classList.add('hidden');
         this.classList.remove('hidden');
+        document.getElementById('crawlOption').classList.remove('hidden');
     });
 
     // Handle material selection
@@ -62,8 +63,8 @@ document.addEventListener('DOMContentLoaded', function() {
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                // Reload the page to show the new material
-                window.location.reload();
+                // Processing continues in the background
+                pollUploadJob(data.job_id);
             } else {
                 alert('Error: ' + data.error);
             }
@@ -74,6 +75,52 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Poll an ingestion job until it finishes
+    const uploadStatus = document.getElementById('uploadStatus');
+    
+    function pollUploadJob(jobId) {
+        uploadStatus.classList.remove('hidden');
+        
+        fetch(`/jobs/${jobId}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.error || 'Failed to load upload status');
+                }
+                
+                if (data.status === 'done') {
+                    if (data.duplicate_of) {
+                        const original = document.querySelector(`.material-item[data-id="${data.duplicate_of}"] h3`);
+                        const name = original ? `"${original.textContent}"` : 'one of your materials';
+                        alert(`This file is nearly identical to ${name}, so its study plan reuses that material's content.`);
+                    }
+                    if (data.overloaded) {
+                        alert('This material needs more hours than your dates allow, so study days run over your daily hours. Extend the end date or add hours to even them out.');
+                    }
+                    // Reload the page to show the new material
+                    window.location.reload();
+                    return;
+                }
+                if (data.status === 'failed') {
+                    uploadStatus.classList.add('hidden');
+                    alert('Error: ' + data.error);
+                    return;
+                }
+                
+                let text = `Processing: ${data.stage}`;
+                if (data.current && data.total) {
+                    text += ` page ${data.current}/${data.total}`;
+                }
+                uploadStatus.textContent = text + '...';
+                setTimeout(() => pollUploadJob(jobId), 1000);
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                uploadStatus.classList.add('hidden');
+                alert('An error occurred while processing the upload');
+            });
+    }
+
     // Ask question form
     const askForm = document.getElementById('askForm');
     const answerContainer = document.getElementById('answerContainer');
@@ -83,21 +130,23 @@ document.addEventListener('DOMContentLoaded', function() {
         e.preventDefault();
         
         const materialId = document.getElementById('materialId').value;
-        if (!materialId) {
+        const askAll = document.getElementById('askAllMaterials').checked;
+        if (!materialId && !askAll) {
             alert('Please select a material first');
             return;
         }
         
         const formData = new FormData(this);
         
-        fetch('/ask', {
+        fetch(askAll ? '/ask_all' : '/ask', {
             method: 'POST',
             body: formData
         })
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                answerText.textContent = data.answer;
+                const source = askAll && data.passages.length ? ` (${data.passages[0].filename})` : '';
+                answerText.textContent = data.answer + source;
                 answerContainer.classList.remove('hidden');
             } else {
                 alert('Error: ' + data.error);
@@ -205,9 +254,12 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Helper function to load study plan
-    function loadStudyPlan(materialId) {
-        fetch(`/get_study_plan?material_id=${materialId}`)
+    // Helper function to load study plan, one page of day summaries at a time
+    const PLAN_PAGE_SIZE = 30;
+    const DAY_DONE_BADGE = '<span class="bg-green-100 text-green-800 text-xs font-medium px-2.5 py-0.5 rounded plan-day-done">Done</span>';
+    
+    function loadStudyPlan(materialId, cursor = 0) {
+        fetch(`/get_study_plan?material_id=${materialId}&summary=1&limit=${PLAN_PAGE_SIZE}&cursor=${cursor}`)
             .then(response => {
                 if (!response.ok) {
                     throw new Error('Network response was not ok');
@@ -216,7 +268,7 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(data => {
                 if (data.success) {
-                    displayStudyPlan(data.study_plan);
+                    displayStudyPlan(materialId, data.study_plan, data.next_cursor, cursor > 0);
                 } else {
                     throw new Error(data.error || 'Failed to load study plan');
                 }
@@ -237,45 +289,102 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
-    function displayStudyPlan(studyPlan) {
+    function displayStudyPlan(materialId, studyPlan, nextCursor, append) {
         const container = document.getElementById('studyPlanContainer');
         
         try {
-            if (!studyPlan || !Array.isArray(studyPlan) || studyPlan.length === 0) {
+            if (!studyPlan || !Array.isArray(studyPlan) || (!append && studyPlan.length === 0)) {
                 throw new Error('No valid study plan data received');
             }
-    
-            let html = `
-                <div class="mb-4">
-                    <h3 class="font-semibold text-lg mb-2">Your Personalized Study Plan</h3>
-                    <div class="bg-blue-50 p-4 rounded-md mb-4">
-                        <p class="text-blue-800"><strong>Start Date:</strong> ${studyPlan[0].date}</p>
-                        <p class="text-blue-800"><strong>End Date:</strong> ${studyPlan[studyPlan.length - 1].date}</p>
+            
+            if (!append) {
+                container.innerHTML = `
+                    <div class="mb-4">
+                        <h3 class="font-semibold text-lg mb-2">Your Personalized Study Plan</h3>
+                        <div class="bg-blue-50 p-4 rounded-md mb-4">
+                            <p class="text-blue-800"><strong>Start Date:</strong> ${studyPlan[0].date}</p>
+                        </div>
                     </div>
-                </div>
-                <div class="space-y-4">
-            `;
+                    <div id="studyPlanDays" class="space-y-4"></div>
+                `;
+            }
             
-            studyPlan.forEach((day, index) => {
-                if (!day.date || !day.content) {
+            const daysContainer = document.getElementById('studyPlanDays');
+            const existingMore = document.getElementById('studyPlanMore');
+            if (existingMore) {
+                existingMore.remove();
+            }
+            
+            let html = '';
+            studyPlan.forEach(day => {
+                if (!day.date) {
                     throw new Error('Invalid study plan day format');
                 }
                 
                 html += `
-                    <div class="border border-gray-200 rounded-md p-4">
+                    <div class="border border-gray-200 rounded-md p-4 plan-day" data-day="${day.day_number}">
                         <div class="flex justify-between items-center mb-2">
-                            <h4 class="font-medium">Day ${index + 1}: ${day.date}</h4>
-                            <span class="bg-blue-100 text-blue-800 text-xs font-medium px-2.5 py-0.5 rounded">
-                                ${day.duration_hours || 0.5} hrs
-                            </span>
+                            <h4 class="font-medium">Day ${day.day_number + 1}: ${day.date}</h4>
+                            <div class="flex items-center space-x-2">
+                                <span class="bg-blue-100 text-blue-800 text-xs font-medium px-2.5 py-0.5 rounded">
+                                    ${day.duration_hours || 0.5} hrs
+                                </span>
+                                ${day.completed ? DAY_DONE_BADGE : '<button class="text-green-600 hover:underline text-sm plan-day-complete">Mark done</button>'}
+                            </div>
                         </div>
-                        <p class="text-gray-700">${day.content || 'No content for this day'}</p>
+                        ${day.recap ? `<p class="text-sm text-gray-500 italic mb-1 plan-day-recap">Recap: ${day.recap}</p>` : ''}
+                        <p class="text-gray-700 plan-day-content">${day.first_line || 'No content for this day'}</p>
+                        ${day.content_length > (day.first_line || '').length ? '<button class="text-blue-600 hover:underline text-sm plan-day-expand">Show full content</button>' : ''}
                     </div>
                 `;
             });
+            daysContainer.insertAdjacentHTML('beforeend', html);
             
-            html += '</div>';
-            container.innerHTML = html;
+            if (nextCursor !== null && nextCursor !== undefined) {
+                daysContainer.insertAdjacentHTML('afterend', `
+                    <button id="studyPlanMore" class="mt-4 text-blue-600 hover:underline">Load more days</button>
+                `);
+                document.getElementById('studyPlanMore').addEventListener('click', () => loadStudyPlan(materialId, nextCursor));
+            }
+            
+            // Full day content is only fetched when a day is expanded
+            daysContainer.querySelectorAll('.plan-day-expand').forEach(button => {
+                button.onclick = function() {
+                    const dayElement = this.closest('.plan-day');
+                    fetch(`/get_study_plan_day?material_id=${materialId}&day=${dayElement.dataset.day}`)
+                        .then(response => response.json())
+                        .then(data => {
+                            if (!data.success) {
+                                throw new Error(data.error || 'Failed to load day');
+                            }
+                            dayElement.querySelector('.plan-day-content').textContent = data.day.content;
+                            this.remove();
+                        })
+                        .catch(error => alert('Error loading day: ' + error.message));
+                };
+            });
+            
+            // Checked-off days are what /feedback counts as progress
+            daysContainer.querySelectorAll('.plan-day-complete').forEach(button => {
+                button.onclick = function() {
+                    const formData = new FormData();
+                    formData.append('material_id', materialId);
+                    formData.append('day', this.closest('.plan-day').dataset.day);
+                    
+                    fetch('/complete_day', {
+                        method: 'POST',
+                        body: formData
+                    })
+                        .then(response => response.json())
+                        .then(data => {
+                            if (!data.success) {
+                                throw new Error(data.error || 'Failed to mark the day done');
+                            }
+                            this.outerHTML = DAY_DONE_BADGE;
+                        })
+                        .catch(error => alert('Error marking day done: ' + error.message));
+                };
+            });
             
         } catch (error) {
             console.error('Error displaying study plan:', error);
@@ -391,7 +500,8 @@ document.addEventListener('DOMContentLoaded', function() {
                     <p class="font-medium text-${feedback.on_track ? 'green' : 'yellow'}-800">
                         ${feedback.on_track ? 'You are on track!' : 'You need to catch up!'}
                     </p>
-                    <p class="text-sm mt-1">${feedback.days_remaining} days remaining until ${feedback.estimated_completion}</p>
+                    <p class="text-sm mt-1">${feedback.days_remaining} days remaining until ${feedback.end_date || feedback.estimated_completion}</p>
+                    ${feedback.completed_hours !== undefined ? `<p class="text-sm mt-1">${feedback.completed_hours} of ${feedback.planned_hours} hours done, ${feedback.backlog_hours} hours behind, ${feedback.streak_days}-day streak. Estimated finish: ${feedback.estimated_completion}</p>` : ''}
                 </div>
                 
                 <div>
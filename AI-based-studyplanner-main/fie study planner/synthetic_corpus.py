@@ -0,0 +1,147 @@
+"""Deterministic synthetic study material for benchmarks.
+
+Text is built from a seeded Zipf-distributed vocabulary of made-up words,
+so runs are reproducible and sizes are controlled by page count rather
+than by whatever real files happen to be in static/uploads.
+"""
+import os
+import random
+
+WORDS_PER_PAGE = 450
+
+_SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ra', 'to', 'su', 'vi', 'den', 'par', 'ston', 'gri',
+              'mol', 'tec', 'phy', 'bra', 'ul', 'en', 'is', 'or']
+
+
+def make_vocabulary(size=5000, seed=0):
+    """size distinct lowercase pseudo-words"""
+    rng = random.Random(seed)
+    vocabulary = []
+    seen = set()
+    while len(vocabulary) < size:
+        word = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4)))
+        if len(word) > 1 and word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+
+class TextGenerator:
+    """Sentences of 8-24 words drawn with Zipf-like word frequencies"""
+
+    def __init__(self, seed=0, vocabulary_size=5000):
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(vocabulary_size, seed)
+        self.weights = [1.0 / rank for rank in range(1, vocabulary_size + 1)]
+
+    def sentence(self):
+        words = self.rng.choices(self.vocabulary, self.weights, k=self.rng.randint(8, 24))
+        return words[0].capitalize() + ' ' + ' '.join(words[1:]) + '.'
+
+    def page(self, words=WORDS_PER_PAGE):
+        """List of sentences totalling at least `words` words"""
+        sentences = []
+        count = 0
+        while count < words:
+            sentence = self.sentence()
+            sentences.append(sentence)
+            count += sentence.count(' ') + 1
+        return sentences
+
+
+def _wrap(sentences, width=90):
+    lines = []
+    line = ''
+    for word in ' '.join(sentences).split(' '):
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def write_txt(path, pages):
+    with open(path, 'w', encoding='utf-8') as file:
+        for sentences in pages:
+            file.write('\n'.join(_wrap(sentences)) + '\n\n')
+
+
+def write_docx(path, pages):
+    from docx import Document
+    document = Document()
+    for sentences in pages:
+        # A few paragraphs per page, like real course notes
+        for start in range(0, len(sentences), 5):
+            document.add_paragraph(' '.join(sentences[start:start + 5]))
+    document.save(path)
+
+
+def write_pdf(path, pages):
+    """Minimal PDF with one Helvetica text stream per page.
+
+    Written by hand so generating a corpus needs no PDF library; PyPDF2
+    reads the text back through the normal extraction path.
+    """
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    font = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    page_ids = []
+    for sentences in pages:
+        ops = ['BT', '/F1 9 Tf', '11 TL', '40 800 Td']
+        for line in _wrap(sentences):
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            ops.append(f'({escaped}) Tj T*')
+        ops.append('ET')
+        stream = '\n'.join(ops).encode('latin-1', 'replace')
+        content = add(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        page_ids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>'
+            % (page_tree, font, content)))
+
+    objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % page_tree
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    objects[page_tree - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids))
+
+    with open(path, 'wb') as file:
+        file.write(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(file.tell())
+            file.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+        xref = file.tell()
+        file.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b'%010d 00000 n \n' % offset)
+        file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (len(objects) + 1, catalog, xref))
+
+
+WRITERS = {'txt': write_txt, 'docx': write_docx, 'pdf': write_pdf}
+
+
+def generate(folder, fmt, num_pages, seed=0):
+    """Write a num_pages document in fmt ('pdf', 'docx' or 'txt') and return its path.
+
+    The same (fmt, num_pages, seed) always produces the same text.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown format: {fmt}")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"synthetic_{num_pages}p_{seed}.{fmt}")
+    if not os.path.exists(path):
+        generator = TextGenerator(seed)
+        partial = path + '.partial'
+        WRITERS[fmt](partial, [generator.page() for _ in range(num_pages)])
+        os.replace(partial, path)
+    return path
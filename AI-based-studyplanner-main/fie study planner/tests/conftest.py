@@ -0,0 +1,176 @@
+"""Shared fixtures: a scratch app instance, logged-in clients, uploads and a
+local HTTP server.
+
+Caches, the database and uploads live in a temporary folder; config reads
+its environment at import, so it is set here before any app module loads.
+Tests that tokenize text need the NLTK data (`python nlp.py --download`)
+and are skipped without it.
+"""
+import io
+import os
+import sys
+import time
+import uuid
+import shutil
+import atexit
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+_scratch = tempfile.mkdtemp(prefix='study-planner-tests-')
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_scratch, 'study_planner.db'),
+    'TEXT_CACHE_FOLDER': os.path.join(_scratch, 'text'),
+    'SHARED_CACHE_PATH': os.path.join(_scratch, 'shared.sqlite3'),
+    'HTTP_CACHE_FOLDER': os.path.join(_scratch, 'http'),
+    'INGEST_EXECUTOR': 'thread'
+})
+os.environ.setdefault('NLTK_DATA_DIR', os.path.join(APP_DIR, 'nltk_data'))
+
+
+@pytest.fixture
+def nltk_data():
+    """Skip the test when the NLTK data is not installed"""
+    import nlp
+    missing = nlp.missing_resources()
+    if missing:
+        pytest.skip(f"NLTK data not installed: {', '.join(missing)}")
+
+
+@pytest.fixture
+def http_cache(tmp_path, monkeypatch):
+    """An empty HTTP cache, used as the default for the test"""
+    import http_fetch
+    cache = http_fetch.HttpCache(str(tmp_path / 'http'))
+    monkeypatch.setattr(http_fetch, 'default_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def app_module(tmp_path, nltk_data):
+    """The app module, uploading into the test's own folder"""
+    import app
+    upload_folder = tmp_path / 'uploads'
+    upload_folder.mkdir()
+    app.app.config['UPLOAD_FOLDER'] = str(upload_folder)
+    return app
+
+
+def new_client(app_module):
+    """Test client logged in as a new user"""
+    client = app_module.app.test_client()
+    client.post('/register', data={'username': f"user-{uuid.uuid4().hex[:8]}",
+                                   'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def client(app_module):
+    return new_client(app_module)
+
+
+def study_text(pages=4, seed=0):
+    """Deterministic study material; see synthetic_corpus"""
+    from synthetic_corpus import TextGenerator
+    generator = TextGenerator(seed=seed, vocabulary_size=800)
+    return '\n\n'.join(' '.join(generator.page()) for _ in range(pages))
+
+
+def finished_job(client, job_id):
+    """Poll /jobs/<id> until the job is done or failed and return its status"""
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        job = client.get(f'/jobs/{job_id}').json
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def upload_job(client, text, filename='notes.txt', **form):
+    """Upload text as a file and return the finished job's status"""
+    data = {'start_date': '2026-01-05', 'end_date': '2026-02-05', 'daily_hours': '1'}
+    data.update(form)
+    data['file'] = (io.BytesIO(text.encode('utf-8')), filename)
+    response = client.post('/upload', data=data, content_type='multipart/form-data')
+    assert response.status_code == 202, response.json
+    return finished_job(client, response.json['job_id'])
+
+
+@pytest.fixture
+def upload(client):
+    """upload(text, filename='notes.txt', client=None, **form) -> material
+    id, once the ingest job is done; uploads as the client fixture's user
+    unless another client is given"""
+    default_client = client
+
+    def upload(text, filename='notes.txt', client=None, **form):
+        job = upload_job(client or default_client, text, filename, **form)
+        assert job['status'] == 'done', job
+        return job['material_id']
+
+    return upload
+
+
+class LocalServer:
+    """Routes path -> (status, headers, body), or a callable taking the
+    request handler and returning that tuple. Content-Length is added unless
+    the headers give it (None to leave it out). requests records the (path,
+    headers) of every GET."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                route = server.routes.get(self.path, (404, {}, b'Not found'))
+                status, headers, body = route(self) if callable(route) else route
+                self.send_response(status)
+                for name, value in headers.items():
+                    if value is not None:
+                        self.send_header(name, value)
+                if 'Content-Length' not in headers:
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.host = f'127.0.0.1:{self.httpd.server_port}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path='/', host=None):
+        return f'http://{host or self.host}{path}'
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = LocalServer()
+    yield server
+    server.close()
+
+
+def html_page(*paragraphs, links=()):
+    """An HTML page body with the given paragraphs and links"""
+    body = ''.join(f'<p>{text}</p>' for text in paragraphs)
+    body += ''.join(f'<a href="{href}">link</a>' for href in links)
+    return (200, {'Content-Type': 'text/html; charset=utf-8'},
+            f'<html><body>{body}</body></html>'.encode('utf-8'))
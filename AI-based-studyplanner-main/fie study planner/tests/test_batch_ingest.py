@@ -0,0 +1,60 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+import batch_ingest
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+        for name, data in members.items():
+            bundle.writestr(name, data)
+    return str(path)
+
+
+def make_tar(path, members):
+    with tarfile.open(path, 'w:gz') as bundle:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            bundle.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+@pytest.fixture
+def staging(tmp_path):
+    folder = tmp_path / 'staged'
+    folder.mkdir()
+    return folder
+
+
+@pytest.mark.parametrize('make', [make_zip, make_tar])
+def test_supported_members_are_staged_under_fresh_names(make, tmp_path, staging):
+    archive = make(tmp_path / 'bundle', {'../../escape.txt': b'notes', 'docs/a.txt': b'more',
+                                         'image.png': b'png'})
+
+    sources = batch_ingest.stage_archive(archive, str(staging))
+
+    assert sorted(source.filename for source in sources) == ['a.txt', 'escape.txt']
+    assert sorted(path.read_bytes() for path in staging.iterdir()) == [b'more', b'notes']
+
+
+@pytest.mark.parametrize('make', [make_zip, make_tar])
+def test_too_many_documents_are_rejected_before_extracting(make, tmp_path, staging):
+    archive = make(tmp_path / 'bundle', {f'{n}.txt': b'notes' for n in range(4)})
+
+    with pytest.raises(ValueError, match='at most 3 documents'):
+        batch_ingest.stage_archive(archive, str(staging), max_files=3)
+    assert not list(staging.iterdir())
+
+
+@pytest.mark.parametrize('make', [make_zip, make_tar])
+def test_oversized_contents_are_rejected_before_extracting(make, tmp_path, staging):
+    # Compresses to almost nothing, but its listed size is over the cap
+    archive = make(tmp_path / 'bundle', {'a.txt': b'0' * 600, 'b.txt': b'0' * 600})
+
+    with pytest.raises(ValueError, match='exceed 1000 bytes'):
+        batch_ingest.stage_archive(archive, str(staging), max_bytes=1000)
+    assert not list(staging.iterdir())
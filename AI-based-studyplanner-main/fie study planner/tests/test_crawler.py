@@ -0,0 +1,55 @@
+import pytest
+
+import crawler
+from conftest import html_page
+
+
+def crawl(server, tmp_path, max_depth=2):
+    path = crawler.stage_site(server.url('/'), str(tmp_path), max_depth=max_depth, max_pages=10)
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+
+def test_links_resolve_against_the_redirect_target(server, tmp_path, http_cache):
+    server.routes.update({
+        '/': html_page('Course home.', links=['/docs']),
+        '/docs': (301, {'Location': '/docs/'}, b''),
+        '/docs/': html_page('Docs index.', links=['intro.html']),
+        '/docs/intro.html': html_page('Intro to the course.')
+    })
+
+    text = crawl(server, tmp_path)
+
+    assert 'Docs index.' in text
+    assert 'Intro to the course.' in text
+    assert '/intro.html' not in server.paths()
+
+
+def test_pages_off_the_host_are_not_crawled(server, tmp_path, http_cache):
+    # localhost reaches the same server under a different host name
+    other_host = f'localhost:{server.httpd.server_port}'
+    server.routes.update({
+        '/': html_page('Course home.', links=['/moved', server.url('/other', other_host)]),
+        '/moved': (302, {'Location': server.url('/elsewhere', other_host)}, b''),
+        '/elsewhere': html_page('Redirected off the host.'),
+        '/other': html_page('Linked off the host.')
+    })
+
+    text = crawl(server, tmp_path)
+
+    assert 'Course home.' in text
+    assert 'Redirected off the host.' not in text
+    assert 'Linked off the host.' not in text
+    assert '/other' not in server.paths()
+
+
+def test_unreadable_robots_txt_stops_the_crawl(server, tmp_path, http_cache):
+    server.routes.update({
+        '/robots.txt': (503, {}, b''),
+        '/': html_page('Course home.')
+    })
+
+    with pytest.raises(ValueError, match='robots.txt'):
+        crawl(server, tmp_path)
+    assert server.paths() == ['/robots.txt']
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,118 @@
+import pytest
+
+import http_fetch
+
+
+def versioned(cache_control, body=b'Lesson one.'):
+    """Route serving body with ETag "v1" and answering 304 to it"""
+    headers = {'Content-Type': 'text/plain', 'ETag': '"v1"'}
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+
+    def route(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, headers, b''
+        return 200, headers, body
+
+    return route
+
+
+def test_fresh_responses_are_served_from_the_cache(server, http_cache):
+    server.routes['/page'] = versioned('max-age=600')
+
+    first = http_fetch.fetch(server.url('/page'))
+    second = http_fetch.fetch(server.url('/page'))
+
+    assert (first.from_cache, second.from_cache) == (False, True)
+    assert second.body == b'Lesson one.'
+    assert server.paths() == ['/page']
+
+
+@pytest.mark.parametrize('cache_control', ['max-age=0', 'no-cache',
+                                           'max-age=600, must-revalidate'])
+def test_stale_or_revalidated_responses_send_a_conditional_get(server, http_cache,
+                                                              cache_control):
+    server.routes['/page'] = versioned(cache_control)
+
+    http_fetch.fetch(server.url('/page'))
+    second = http_fetch.fetch(server.url('/page'))
+
+    assert second.from_cache
+    assert second.body == b'Lesson one.'
+    assert len(server.requests) == 2
+    assert server.requests[1][1].get('If-None-Match') == '"v1"'
+
+
+def test_no_store_responses_are_not_cached(server, http_cache):
+    server.routes['/page'] = versioned('no-store')
+
+    http_fetch.fetch(server.url('/page'))
+    second = http_fetch.fetch(server.url('/page'))
+
+    assert not second.from_cache
+    assert 'If-None-Match' not in server.requests[1][1]
+
+
+def test_304_updates_the_stored_validators_and_freshness(server, http_cache):
+    def route(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v2"', 'Cache-Control': 'max-age=600'}, b''
+        return 200, {'Content-Type': 'text/plain', 'ETag': '"v1"',
+                     'Cache-Control': 'max-age=0'}, b'Lesson one.'
+
+    server.routes['/page'] = route
+
+    http_fetch.fetch(server.url('/page'))
+    revalidated = http_fetch.fetch(server.url('/page'))
+    fresh = http_fetch.fetch(server.url('/page'))
+
+    assert revalidated.headers['ETag'] == '"v2"'
+    assert fresh.from_cache and fresh.body == b'Lesson one.'
+    assert len(server.requests) == 2
+    meta, _ = http_cache.get(server.url('/page'))
+    assert meta['headers'] == {'Content-Type': 'text/plain', 'ETag': '"v2"',
+                               'Cache-Control': 'max-age=600'}
+
+
+def test_no_store_drops_an_entry_already_cached(server, http_cache):
+    server.routes['/page'] = versioned('max-age=0')
+    http_fetch.fetch(server.url('/page'))
+    assert http_cache.get(server.url('/page')) is not None
+
+    server.routes['/page'] = (200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'},
+                              b'Lesson two.')
+    result = http_fetch.fetch(server.url('/page'))
+
+    assert result.body == b'Lesson two.'
+    assert http_cache.get(server.url('/page')) is None
+
+
+def test_result_url_is_the_redirect_target(server, http_cache):
+    server.routes.update({
+        '/old': (301, {'Location': '/new'}, b''),
+        '/new': versioned('max-age=600')
+    })
+
+    assert http_fetch.fetch(server.url('/old')).url == server.url('/new')
+    # Cache hits keep the final URL too
+    assert http_fetch.fetch(server.url('/old')).url == server.url('/new')
+
+
+def test_declared_length_over_the_cap_is_rejected(server, http_cache):
+    server.routes['/big'] = (200, {'Content-Type': 'text/plain'}, b'x' * 2048)
+
+    with pytest.raises(ValueError, match='exceeds 1024 bytes'):
+        http_fetch.fetch(server.url('/big'), max_bytes=1024)
+
+
+def test_undeclared_length_over_the_cap_is_rejected(server, http_cache):
+    def route(request):
+        # Without Content-Length the body runs until the connection closes
+        request.close_connection = True
+        return 200, {'Content-Type': 'text/plain', 'Content-Length': None}, b'x' * 2048
+
+    server.routes['/big'] = route
+
+    with pytest.raises(ValueError, match='exceeds 1024 bytes'):
+        http_fetch.fetch(server.url('/big'), max_bytes=1024)
+    assert http_cache.get(server.url('/big')) is None
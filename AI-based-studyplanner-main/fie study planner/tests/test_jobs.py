@@ -0,0 +1,101 @@
+import io
+import time
+import pickle
+import threading
+
+import pytest
+
+from jobs import JobQueue
+from shared_cache import SQLiteStore
+from conftest import finished_job, new_client, study_text
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'shared.sqlite3')
+
+
+def queue(store_path, **options):
+    """A JobQueue on the shared store, as another server worker would open it"""
+    return JobQueue(store=SQLiteStore(store_path, 1 << 20), **options)
+
+
+def wait_until_finished(jobs, job_id):
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = jobs.status(job_id)
+        if job and job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_another_queue_reads_progress_and_result(store_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def work(name, progress):
+        progress('extracting', 1, 2)
+        started.set()
+        release.wait(10)
+        return name
+
+    accepting, polling = queue(store_path), queue(store_path)
+    job_id = accepting.submit(work, 'notes.txt', owner='alice',
+                              on_success=lambda name: f"material for {name}")
+
+    assert started.wait(10)
+    running = polling.status(job_id)
+    assert (running['status'], running['stage'], running['current'], running['total']) == \
+        ('running', 'extracting', 1, 2)
+    assert running['owner'] == 'alice'
+
+    release.set()
+    done = wait_until_finished(polling, job_id)
+    assert (done['status'], done['result'], done['error']) == \
+        ('done', 'material for notes.txt', None)
+
+
+def test_another_queue_reads_a_failure(store_path):
+    def work(progress):
+        raise ValueError("Unsupported file")
+
+    failures = []
+    job_id = queue(store_path).submit(work, on_failure=failures.append)
+
+    failed = wait_until_finished(queue(store_path), job_id)
+    assert (failed['status'], failed['error']) == ('failed', 'Unsupported file')
+    assert len(failures) == 1
+
+
+def test_unknown_and_expired_jobs_are_not_found(store_path):
+    jobs = queue(store_path, retention_seconds=0)
+    job_id = jobs.submit(lambda progress: 'done')
+    wait_until_finished(queue(store_path), job_id)
+
+    assert jobs.status('no-such-job') is None
+    assert jobs.status(job_id) is None
+    # Submitting prunes the expired job's state from the store
+    jobs.submit(lambda progress: 'done')
+    assert queue(store_path).status(job_id) is None
+
+
+def test_store_survives_pickling_for_process_workers(store_path):
+    store = SQLiteStore(store_path, 1 << 20)
+    store.set('job:x:state', b'{}')
+
+    assert pickle.loads(pickle.dumps(store)).get('job:x:state') == b'{}'
+
+
+def test_jobs_endpoint_answers_only_the_owner(app_module, client):
+    data = {'start_date': '2026-01-05', 'end_date': '2026-02-05', 'daily_hours': '1',
+            'file': (io.BytesIO(study_text().encode('utf-8')), 'notes.txt')}
+    job_id = client.post('/upload', data=data, content_type='multipart/form-data').json['job_id']
+
+    job = finished_job(client, job_id)
+
+    assert (job['status'], job['stage'], job['error']) == ('done', 'done', None)
+    assert job['material_id'] and job['report'] is None
+    assert new_client(app_module).get(f'/jobs/{job_id}').status_code == 404
+    assert app_module.app.test_client().get(f'/jobs/{job_id}').status_code == 401
+    assert client.get('/jobs/no-such-job').status_code == 404
@@ -0,0 +1,69 @@
+import os
+from array import array
+
+import config
+import fingerprints
+from conftest import study_text, upload_job
+
+
+def edited(text):
+    """text with one sentence reworded, like a re-exported copy"""
+    first, rest = text.split('. ', 1)
+    return 'This opening sentence was rewritten for the second edition. ' + rest
+
+
+def test_minhash_matches_an_edited_copy_only():
+    text = study_text(pages=6)
+    original = fingerprints.minhash([text])
+    copy = fingerprints.minhash([edited(text)])
+    unrelated = fingerprints.minhash([study_text(pages=6, seed=1)])
+
+    assert fingerprints.similarity(original, copy) >= config.DEDUPE_DOCUMENT_SIMILARITY
+    assert fingerprints.similarity(original, unrelated) < 0.2
+    assert fingerprints.best_match(copy, {'original': original, 'unrelated': unrelated},
+                                   config.DEDUPE_DOCUMENT_SIMILARITY) == 'original'
+    assert fingerprints.best_match(unrelated, {'original': original},
+                                   config.DEDUPE_DOCUMENT_SIMILARITY) is None
+
+
+def test_repeated_chunks_are_flagged():
+    sentences = study_text(pages=3).split('. ')[:20]
+    # Chunks 0 and 2 are the same ten sentences, chunk 1 different ones
+    chunks = [sentences[:10], sentences[10:20], sentences[:10]]
+    hashes = array('I', [fingerprints.sentence_hash(s) for chunk in chunks for s in chunk])
+    counts = array('I', [s.count(' ') + 1 for chunk in chunks for s in chunk])
+    boundaries = array('I', [0, 10, 20, 30])
+
+    assert list(fingerprints.duplicate_chunks(hashes, counts, boundaries, 3)) == [2]
+    assert not fingerprints.duplicate_chunks(hashes, counts, boundaries, -1)
+
+
+def test_near_duplicate_upload_reuses_the_original(app_module, client, upload):
+    text = study_text(pages=6, seed=7)
+    original_id = upload(text, 'notes.txt')
+    job = upload_job(client, edited(text), 'notes-v2.txt')
+    copy_id = job['material_id']
+
+    # The user is told which material the upload was matched to
+    assert job['duplicate_of'] == original_id
+    with app_module.app.app_context():
+        original = app_module.db.session.get(app_module.Material, original_id)
+        copy = app_module.db.session.get(app_module.Material, copy_id)
+        assert (copy.filepath, copy.content_key) == (original.filepath, original.content_key)
+        assert os.listdir(app_module.app.config['UPLOAD_FOLDER']) == \
+            [os.path.basename(original.filepath)]
+    assert client.get(f'/get_study_plan?material_id={copy_id}').json['study_plan']
+
+
+def test_different_upload_is_kept(app_module, client, upload):
+    first_id = upload(study_text(pages=4, seed=8))
+    job = upload_job(client, study_text(pages=4, seed=9))
+    second_id = job['material_id']
+
+    assert job['duplicate_of'] is None
+
+    with app_module.app.app_context():
+        first = app_module.db.session.get(app_module.Material, first_id)
+        second = app_module.db.session.get(app_module.Material, second_id)
+        assert first.filepath != second.filepath
+        assert first.content_key != second.content_key
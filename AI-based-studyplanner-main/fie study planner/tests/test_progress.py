@@ -0,0 +1,104 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import progress
+from conftest import study_text
+
+MATERIAL = SimpleNamespace(start_date='2026-01-05', end_date='2026-01-14')
+
+
+def totals(planned=10.0, completed=0.0, days=0, streak=0, last=None):
+    return SimpleNamespace(planned_hours=planned, completed_hours=completed,
+                           completed_days=days, streak_days=streak, last_study_date=last)
+
+
+def test_feedback_reports_backlog_against_hours_due():
+    feedback = progress.build_feedback(MATERIAL, totals(completed=1.0, days=1, streak=1,
+                                                        last='2026-01-07'),
+                                       4.0, date(2026, 1, 8))
+
+    assert feedback['backlog_hours'] == 3.0
+    assert not feedback['on_track']
+    assert feedback['progress'] == 10
+    assert feedback['days_remaining'] == 6
+    assert feedback['streak_days'] == 1
+    assert 'behind the plan' in feedback['suggestions'][0]
+    # One hour in four days leaves nine hours at a quarter hour a day
+    assert feedback['estimated_completion'] == '2026-02-13'
+    assert any('after the end date' in text for text in feedback['suggestions'])
+
+
+def test_feedback_ahead_of_plan_and_streak():
+    feedback = progress.build_feedback(MATERIAL, totals(completed=5.0, days=5, streak=3,
+                                                        last='2026-01-08'),
+                                       3.0, date(2026, 1, 8))
+
+    assert feedback['on_track']
+    assert feedback['backlog_hours'] == 0
+    assert 'ahead of the plan' in feedback['suggestions'][0]
+    assert 'Keep your 3-day study streak going.' in feedback['suggestions']
+
+
+def test_streak_lapses_after_a_missed_day():
+    feedback = progress.build_feedback(MATERIAL, totals(completed=2.0, days=2, streak=4,
+                                                        last='2026-01-06'),
+                                       2.0, date(2026, 1, 8))
+
+    assert feedback['streak_days'] == 0
+
+
+def test_feedback_when_everything_is_done():
+    feedback = progress.build_feedback(MATERIAL, totals(completed=10.0, days=8, streak=1,
+                                                        last='2026-01-12'),
+                                       10.0, date(2026, 1, 13))
+
+    assert feedback['progress'] == 100
+    assert feedback['estimated_completion'] == '2026-01-12'
+    assert feedback['suggestions'] == ["All study days are done. Take a quiz to check what stuck."]
+
+
+def test_record_completion_updates_totals_once(app_module, client, upload):
+    material_id = upload(study_text(pages=6), daily_hours='0.5')
+    days = client.get(f'/get_study_plan?material_id={material_id}').json['study_plan']
+
+    with app_module.app.app_context():
+        first = progress.record_completion(material_id, 0, datetime(2026, 1, 5, 9))
+        again = progress.record_completion(material_id, 0, datetime(2026, 1, 5, 10))
+        missing = progress.record_completion(material_id, 999)
+        totals_row = progress.get_progress(material_id)
+
+        assert again == first
+        assert missing is None
+        assert totals_row.completed_days == 1
+        assert totals_row.completed_hours == days[0]['duration_hours']
+        assert totals_row.planned_hours == sum(day['duration_hours'] for day in days)
+
+    day = client.get(f'/get_study_plan_day?material_id={material_id}&day=0').json['day']
+    assert day['completed']
+
+
+def test_streak_counts_consecutive_study_dates(app_module, upload):
+    material_id = upload(study_text(pages=8, seed=2), daily_hours='0.5')
+
+    streaks = []
+    with app_module.app.app_context():
+        for day_number, when in enumerate([datetime(2026, 1, 5), datetime(2026, 1, 6),
+                                           datetime(2026, 1, 6, 20), datetime(2026, 1, 9)]):
+            progress.record_completion(material_id, day_number, when)
+            streaks.append(progress.get_progress(material_id).streak_days)
+
+    # Same-day check-ins keep the streak; a gap starts it over
+    assert streaks == [1, 2, 2, 1]
+
+
+def test_complete_day_endpoint_feeds_feedback(client, upload):
+    material_id = upload(study_text(pages=6, seed=4), daily_hours='0.5')
+
+    response = client.post('/complete_day', data={'material_id': material_id, 'day': 0})
+    feedback = client.post('/feedback', data={'material_id': material_id}).json['feedback']
+
+    assert response.json['success']
+    assert feedback['completed_days'] == 1
+    assert feedback['completed_hours'] > 0
+    assert client.post('/complete_day', data={'material_id': material_id, 'day': 999}) \
+        .status_code == 404
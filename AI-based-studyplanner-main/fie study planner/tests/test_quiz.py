@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from quiz import QUESTION_COUNTS, DistractorIndex, sample_quiz, word_class
+from conftest import new_client, study_text
+from text_index import DocumentIndex, is_content_word
+
+
+def quiz(client, material_id, difficulty='medium', seed=None):
+    data = {'material_id': material_id, 'difficulty': difficulty}
+    if seed is not None:
+        data['seed'] = seed
+    return client.post('/generate_quiz', data=data)
+
+
+def test_sample_quiz_depends_only_on_pool_and_seed():
+    pool = [{'question': f'Question {i}?', 'options': ['w', 'x', 'y', 'z'],
+             'correct_answer': 'ABCD'[i % 4]} for i in range(40)]
+
+    first = sample_quiz(pool, 'hard', 7)
+
+    assert sample_quiz(pool, 'hard', 7) == first
+    assert sample_quiz(pool, 'hard', 8) != first
+    assert len(first) == QUESTION_COUNTS['hard']
+    for item in first:
+        number = int(item['question'].split()[1].rstrip('?'))
+        correct = pool[number]['options'][ord(pool[number]['correct_answer']) - 65]
+        assert item['options'][ord(item['correct_answer']) - 65] == correct
+
+
+def test_same_seed_gives_the_same_quiz(client, upload):
+    material_id = upload(study_text())
+
+    first = quiz(client, material_id, seed=1234).json
+    second = quiz(client, material_id, seed=1234).json
+
+    assert first['success'] and first['seed'] == 1234
+    assert len(first['quiz']) == QUESTION_COUNTS['medium']
+    assert second['quiz'] == first['quiz']
+
+
+def test_returned_seed_reproduces_the_quiz(client, upload):
+    material_id = upload(study_text())
+
+    first = quiz(client, material_id, difficulty='easy').json
+
+    assert quiz(client, material_id, 'easy', first['seed']).json['quiz'] == first['quiz']
+
+
+def test_same_content_gives_the_same_quiz_to_every_user(app_module, client, upload):
+    text = study_text(seed=3)
+    other = new_client(app_module)
+
+    first = quiz(client, upload(text), seed=99).json
+    second = quiz(other, upload(text, 'copy.txt', client=other), seed=99).json
+
+    assert second['quiz'] == first['quiz']
+
+
+def test_unknown_difficulty_is_rejected(client):
+    response = quiz(client, 'no-such-material', difficulty='impossible')
+
+    assert response.status_code == 400
+    assert 'easy, medium, hard, pro' in response.json['error']
+
+
+def test_distractors_share_the_answers_word_class(nltk_data):
+    index = DocumentIndex()
+    for sentence in ['The river rose quickly after the storm',
+                     'Engineers rapidly measured the flooding',
+                     'The water swiftly covered the station',
+                     'Volunteers steadily rebuilt the organization']:
+        index.add_tokens(sentence.split(), sentence)
+    distractors = DistractorIndex(index)
+    quickly = index.term_ids['quickly']
+
+    for seed in range(50):
+        sampled = distractors.sample(quickly, random.Random(seed))
+        assert sorted(index.vocab[term_id] for term_id in sampled) == \
+            ['rapidly', 'steadily', 'swiftly']
+
+
+@pytest.mark.parametrize('difficulty', sorted(QUESTION_COUNTS))
+def test_quiz_length_and_option_quality(client, upload, difficulty):
+    material_id = upload(study_text(pages=12, seed=6))
+
+    questions = quiz(client, material_id, difficulty, seed=5).json['quiz']
+
+    assert len(questions) == QUESTION_COUNTS[difficulty]
+    for item in questions:
+        options = item['options']
+        correct = options[ord(item['correct_answer']) - 65]
+        assert len(options) == 4
+        assert len({option.lower() for option in options}) == 4
+        assert all(is_content_word(option) for option in options)
+        # Distractors come from the answer's own bucket first
+        assert sum(word_class(option) == word_class(correct) for option in options) >= 3
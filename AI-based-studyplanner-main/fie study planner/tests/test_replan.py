@@ -0,0 +1,52 @@
+import os
+
+from conftest import study_text
+
+
+def plan(client, material_id):
+    return client.get(f'/get_study_plan?material_id={material_id}&limit=400').json['study_plan']
+
+
+def replan(client, material_id, **form):
+    return client.post('/replan', data={'material_id': material_id, **form})
+
+
+def test_replan_keeps_completed_days(client, upload):
+    material_id = upload(study_text(pages=8), daily_hours='0.5')
+    before = plan(client, material_id)
+    assert len(before) > 3
+    for day in (0, 1):
+        assert client.post('/complete_day', data={'material_id': material_id,
+                                                  'day': day}).json['success']
+
+    response = replan(client, material_id, start_date='2026-03-02', end_date='2026-03-31',
+                      daily_hours='1')
+    after = plan(client, material_id)
+
+    assert response.status_code == 200, response.json
+    assert response.json['completed_days'] == 2
+    assert after[:2] == [dict(day, completed=True) for day in before[:2]]
+    assert [day['completed'] for day in after] == [True, True] + [False] * (len(after) - 2)
+    assert all(day['date'] >= '2026-03-02' for day in after[2:])
+    # Completed content is not scheduled again
+    kept = {day['content'] for day in before[:2]}
+    assert not kept & {day['content'] for day in after[2:]}
+
+
+def test_replan_reads_the_cached_text_when_the_upload_is_gone(app_module, client, upload):
+    material_id = upload(study_text(pages=3, seed=5))
+    with app_module.app.app_context():
+        os.remove(app_module.db.session.get(app_module.Material, material_id).filepath)
+
+    response = replan(client, material_id, end_date='2026-03-05')
+
+    assert response.status_code == 200, response.json
+    assert plan(client, material_id)
+
+
+def test_replan_rejects_a_range_without_study_time(client, upload):
+    material_id = upload(study_text(pages=2, seed=6))
+
+    assert replan(client, material_id, daily_hours='0').status_code == 400
+    assert replan(client, material_id, start_date='2026-03-01', end_date='2026-02-01') \
+        .status_code == 400
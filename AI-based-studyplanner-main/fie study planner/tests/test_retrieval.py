@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from conftest import study_text
+from retrieval import BM25Index
+from text_index import build_document_index
+
+
+@pytest.fixture
+def bm25(nltk_data):
+    return BM25Index(build_document_index(study_text(pages=10, seed=21).split('. ')))
+
+
+def brute_force(index, term_ids):
+    """BM25 score of every sentence for the query, best first"""
+    scores = []
+    for i in range(len(index.doc_index)):
+        tokens = list(index.doc_index.sentence_term_ids(i))
+        score = sum(index._term_score(index.idf[t], tokens.count(t), index.lengths[i])
+                    for t in set(term_ids) if t in index.postings and t in tokens)
+        if score > 0:
+            scores.append((score, -i))
+    return [(-i, score) for score, i in sorted(scores, reverse=True)]
+
+
+@pytest.mark.parametrize('top_k', [1, 3, 10])
+def test_top_k_matches_brute_force(bm25, top_k):
+    rng = random.Random(top_k)
+    terms = sorted(bm25.postings)
+
+    for _ in range(50):
+        query = rng.sample(terms, rng.randint(1, 6))
+        expected = brute_force(bm25, query)[:top_k + 1]
+
+        found = bm25.search(query, top_k)
+
+        assert [score for _, score in found] == \
+            pytest.approx([score for _, score in expected[:top_k]])
+        # Sentence ids must agree wherever the ranking is not a near-tie
+        for rank, (sentence_id, score) in enumerate(found):
+            neighbours = [other for _, other in expected[max(0, rank - 1):rank + 2]]
+            if sum(other == pytest.approx(score) for other in neighbours) == 1:
+                assert sentence_id == expected[rank][0]
+
+
+def test_unknown_terms_and_empty_queries(bm25):
+    assert bm25.search([], 3) == []
+    assert bm25.search([10 ** 9], 3) == []
+    assert bm25.search(sorted(bm25.postings)[:2], 0) == []
@@ -0,0 +1,59 @@
+from array import array
+from datetime import date
+
+import pytest
+
+import scheduler
+from conftest import study_text, upload_job
+
+
+def schedule(efforts, capacities):
+    return scheduler.schedule(array('f', efforts), array('f', capacities))
+
+
+def test_chunks_go_to_the_day_holding_their_midpoint():
+    # The first day's share ends at 2 hours; the second chunk's midpoint,
+    # 2.25, falls past it
+    days, scale = schedule([1, 2.5, 0.5], [2, 2])
+
+    assert days == [(0, 0, 1, 1.0), (1, 1, 3, 3.0)]
+    assert scale == 1.0
+
+
+def test_days_without_capacity_get_nothing():
+    days, _ = schedule([1, 1, 1, 1], [2, 0, 1, 1])
+
+    assert [day[0] for day in days] == [0, 2, 3]
+    assert [(first, end) for _, first, end, _ in days] == [(0, 2), (2, 3), (3, 4)]
+
+
+def test_overloaded_plan_keeps_real_hours():
+    days, scale = schedule([1] * 6, [1, 1])
+
+    assert scale == pytest.approx(1 / 3)
+    assert days == [(0, 0, 3, 3.0), (1, 3, 6, 3.0)]
+    assert sum(day[3] for day in days) == 6.0
+
+
+def test_capacities_honour_skip_dates_and_weekday_caps():
+    # 2026-01-05 is a Monday
+    capacities = scheduler.day_capacities(date(2026, 1, 5), 7, 2.0, {date(2026, 1, 6)},
+                                          {2: 1.0, 3: 5.0})
+
+    assert list(capacities) == [2.0, 0.0, 1.0, 2.0, 2.0, 2.0, 2.0]
+
+
+def test_overloaded_upload_is_reported(app_module, client):
+    job = upload_job(client, study_text(pages=12, seed=5), start_date='2026-01-05',
+                     end_date='2026-01-07', daily_hours='0.5')
+    days = client.get(f"/get_study_plan?material_id={job['material_id']}").json['study_plan']
+
+    assert job['status'] == 'done'
+    assert job['overloaded']
+    with app_module.app.app_context():
+        material = app_module.db.session.get(app_module.Material, job['material_id'])
+        assert material.overloaded
+        # Stored day hours are rounded to two decimals
+        assert sum(day['duration_hours'] for day in days) == \
+            pytest.approx(material.estimated_hours, abs=0.01 * len(days))
+        assert material.estimated_hours > material.available_hours == 1.0
@@ -0,0 +1,41 @@
+import startup_report
+
+# Real `python -X importtime -c "import json"` output: submodules come first,
+# the package's own line (with its whole subtree's time) last
+JSON_IMPORT = """\
+import time: self [us] | cumulative | imported package
+import time:       112 |        112 |   sitecustomize
+import time:      2153 |      73103 | site
+import time:       361 |        361 |       _json
+import time:       770 |       1131 |     json.scanner
+import time:       703 |       1833 |   json.decoder
+import time:       741 |        741 |   json.encoder
+import time:       450 |       3023 | json
+"""
+
+
+def test_parse_import_times():
+    rows = startup_report.parse_import_times(JSON_IMPORT)
+
+    assert rows[0] == ('sitecustomize', 112, 112, 1)
+    assert rows[-1] == ('json', 450, 3023, 0)
+    assert len(rows) == 7
+
+
+def test_packages_are_ranked_by_their_own_cumulative_time():
+    rows = startup_report.parse_import_times(JSON_IMPORT)
+
+    report = startup_report.summarize(rows, 0.1, top=3)
+
+    assert report['slowest_packages'] == [('site', 73103), ('json', 3023), ('_json', 361)]
+    assert report['slowest_self'][0] == ('site', 2153)
+    assert report['import_seconds'] == round(sum(row[1] for row in rows) / 1e6, 3)
+
+
+def test_report_on_a_real_import():
+    rows, _ = startup_report.import_times('json')
+    report = dict(startup_report.summarize(rows, 0, top=100)['slowest_packages'])
+
+    json_row = next(row for row in rows if row[0] == 'json')
+    assert report['json'] == json_row[2]
+    assert all(row[2] <= report['json'] for row in rows if row[0].startswith('json.'))
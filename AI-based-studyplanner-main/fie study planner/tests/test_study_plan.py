@@ -0,0 +1,141 @@
+import gzip
+import json
+
+import pytest
+from sqlalchemy import event
+
+from conftest import study_text
+
+
+@pytest.fixture
+def material_id(upload):
+    """A material planned over several days"""
+    return upload(study_text(pages=12, seed=11), daily_hours='0.5')
+
+
+def get_plan(client, material_id, **params):
+    query = '&'.join(f'{name}={value}' for name, value in params.items())
+    return client.get(f'/get_study_plan?material_id={material_id}&{query}')
+
+
+def test_pages_follow_the_cursor_to_the_full_plan(client, material_id):
+    full = get_plan(client, material_id, limit=400).json
+    assert full['next_cursor'] is None
+    assert len(full['study_plan']) > 4
+
+    pages = []
+    cursor = 0
+    while cursor is not None:
+        page = get_plan(client, material_id, cursor=cursor, limit=2).json
+        assert len(page['study_plan']) <= 2
+        pages.extend(page['study_plan'])
+        cursor = page['next_cursor']
+
+    assert pages == full['study_plan']
+
+
+def test_date_range_and_summary(client, material_id):
+    full = get_plan(client, material_id, limit=400).json['study_plan']
+    start, end = full[1]['date'], full[3]['date']
+
+    summary = get_plan(client, material_id, start=start, end=end, summary=1).json['study_plan']
+
+    assert [day['day_number'] for day in summary] == [day['day_number'] for day in full[1:4]]
+    for day, full_day in zip(summary, full[1:4]):
+        assert 'content' not in day
+        assert day['content_length'] == len(full_day['content'])
+        assert full_day['content'].startswith(day['first_line'])
+
+
+def test_single_day(client, material_id):
+    full = get_plan(client, material_id, limit=400).json['study_plan']
+
+    day = client.get(f'/get_study_plan_day?material_id={material_id}&day=1').json['day']
+
+    assert day == full[1]
+    assert client.get(f'/get_study_plan_day?material_id={material_id}&day=999') \
+        .status_code == 404
+
+
+def test_unchanged_plan_answers_304(client, material_id):
+    first = get_plan(client, material_id, limit=3)
+    etag = first.headers['ETag']
+
+    again = client.get(f'/get_study_plan?material_id={material_id}&limit=3',
+                       headers={'If-None-Match': etag})
+    other_page = client.get(f'/get_study_plan?material_id={material_id}&limit=3&cursor=3',
+                            headers={'If-None-Match': etag})
+
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    assert other_page.status_code == 200
+
+
+def test_revalidation_reads_no_plan_days(app_module, client, material_id):
+    etag = get_plan(client, material_id, limit=3).headers['ETag']
+    day_etag = client.get(f'/get_study_plan_day?material_id={material_id}&day=1').headers['ETag']
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        plan = client.get(f'/get_study_plan?material_id={material_id}&limit=3',
+                          headers={'If-None-Match': etag})
+        day = client.get(f'/get_study_plan_day?material_id={material_id}&day=1',
+                         headers={'If-None-Match': day_etag})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert (plan.status_code, day.status_code) == (304, 304)
+    assert statements
+    assert not [statement for statement in statements if 'plan_day' in statement]
+
+
+def test_completed_day_gets_a_new_etag(client, material_id):
+    etag = get_plan(client, material_id).headers['ETag']
+    day_etag = client.get(f'/get_study_plan_day?material_id={material_id}&day=0').headers['ETag']
+    client.post('/complete_day', data={'material_id': material_id, 'day': 0})
+
+    plan = client.get(f'/get_study_plan?material_id={material_id}',
+                      headers={'If-None-Match': etag})
+    day = client.get(f'/get_study_plan_day?material_id={material_id}&day=0',
+                     headers={'If-None-Match': day_etag})
+
+    assert (plan.status_code, day.status_code) == (200, 200)
+    assert plan.json['study_plan'][0]['completed']
+    assert day.json['day']['completed']
+
+
+@pytest.mark.parametrize('params', [{'cursor': 'two'}, {'limit': '1.5'}])
+def test_bad_paging_parameters_are_rejected(client, material_id, params):
+    response = get_plan(client, material_id, **params)
+
+    assert response.status_code == 400
+    assert 'whole numbers' in response.json['error']
+
+
+def test_replanned_plan_gets_a_new_etag(client, material_id):
+    etag = get_plan(client, material_id).headers['ETag']
+    client.post('/replan', data={'material_id': material_id, 'start_date': '2026-03-02',
+                                 'end_date': '2026-03-31'})
+
+    response = client.get(f'/get_study_plan?material_id={material_id}',
+                          headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_large_pages_are_gzipped_when_accepted(client, material_id):
+    plain = get_plan(client, material_id, limit=400)
+    compressed = client.get(f'/get_study_plan?material_id={material_id}&limit=400',
+                            headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == plain.json
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import config
+import summarizer
+from conftest import study_text
+
+
+def builder_for(sentences):
+    builder = summarizer.TermMatrixBuilder()
+    for sentence in sentences:
+        builder.add(sentence.split())
+    return builder
+
+
+def test_central_sentences_outrank_isolated_ones(nltk_data):
+    scores = summarizer.sentence_scores(builder_for([
+        'Glaciers carve valleys into mountains',
+        'Valleys carved by glaciers hold lakes',
+        'Mountains with glaciers feed the lakes below',
+        'Stock markets closed early yesterday'
+    ]))
+
+    assert scores.sum() == pytest.approx(1.0)
+    assert scores[3] == scores.min()
+    assert summarizer.top_sentences(scores, 3) == [0, 1, 2]
+
+
+@pytest.mark.parametrize('count', [0, 1, 3, 10])
+def test_summary_length_is_the_requested_count(count):
+    scores = np.array([0.1, 0.4, 0.05, 0.3, 0.15])
+
+    picked = summarizer.top_sentences(scores, count)
+
+    assert len(picked) == min(count, len(scores))
+    assert picked == sorted(picked)
+
+
+def test_top_sentences_keep_document_order_within_a_range():
+    scores = np.array([0.1, 0.4, 0.05, 0.3, 0.15])
+
+    assert summarizer.top_sentences(scores, 2) == [1, 3]
+    assert summarizer.top_sentences(scores, 2, [0, 2, 4]) == [0, 4]
+
+
+def test_material_summary_and_day_recaps_follow_the_configured_lengths(app_module, client,
+                                                                       upload, monkeypatch):
+    monkeypatch.setattr(config, 'SUMMARY_SENTENCES', 3)
+    monkeypatch.setattr(config, 'DAY_SUMMARY_SENTENCES', 1)
+    text = study_text(pages=8, seed=12)
+    material_id = upload(text, daily_hours='0.5')
+
+    with app_module.app.app_context():
+        summary = app_module.db.session.get(app_module.Material, material_id).content_summary
+    days = client.get(f'/get_study_plan?material_id={material_id}&limit=400').json['study_plan']
+
+    assert len(summary.split('\n')) == 3
+    assert all(sentence in text for sentence in summary.split('\n'))
+    assert len(days) > 1
+    for day in days:
+        assert day['recap'] in day['content']
+        assert day['recap'].count('. ') == 0
@@ -0,0 +1,65 @@
+import numpy as np
+
+import metrics
+import shared_cache
+from conftest import study_text
+from text_index import build_document_index
+from user_search import UserSearchIndex
+
+FEATURES = 2 ** 12
+
+
+def doc_index(seed, extra=''):
+    return build_document_index(f"{study_text(pages=2, seed=seed)} {extra}".split('. '))
+
+
+def test_removing_a_material_leaves_the_index_as_if_never_added(nltk_data):
+    first, second = doc_index(1, 'Glaciers carve fjords'), doc_index(2, 'Volcanoes build islands')
+    incremental = UserSearchIndex(FEATURES)
+    incremental.add('first', first)
+    incremental.add('second', second)
+    incremental.add('second', second)
+    incremental.remove('first')
+    incremental.remove('missing')
+
+    fresh = UserSearchIndex(FEATURES)
+    fresh.add('second', second)
+
+    assert incremental.material_ids() == {'second'}
+    assert np.array_equal(incremental.document_frequency, fresh.document_frequency)
+    assert incremental.nbytes == fresh.nbytes
+    for question in ('volcanoes islands', 'glaciers fjords', study_text(pages=1, seed=2)[:80]):
+        assert incremental.search(question) == fresh.search(question)
+    assert incremental.search('glaciers fjords') == []
+
+
+def ask_all(client, question):
+    response = client.post('/ask_all', data={'question': question})
+    assert response.status_code == 200, response.json
+    return {passage['material_id'] for passage in response.json['passages']}
+
+
+def test_search_follows_uploads_and_deletes(app_module, client, upload):
+    glaciers = upload(study_text(pages=3, seed=3) + '\n\nGlaciers carve deep fjords.',
+                      filename='glaciers.txt')
+    assert ask_all(client, 'glaciers fjords') == {glaciers}
+
+    volcanoes = upload(study_text(pages=3, seed=4) + '\n\nVolcanoes build new islands.',
+                       filename='volcanoes.txt')
+    assert ask_all(client, 'volcanoes islands') == {volcanoes}
+    assert ask_all(client, 'glaciers fjords') == {glaciers}
+
+    client.post('/delete_material', data={'material_id': glaciers})
+    assert ask_all(client, 'glaciers fjords') == set()
+    with client.session_transaction() as session:
+        username = session['username']
+    assert app_module.user_search_indexes.get(username).material_ids() == {volcanoes}
+
+
+def test_oversized_index_is_counted(app_module, client, upload, monkeypatch):
+    monkeypatch.setattr(app_module, 'user_search_indexes', shared_cache.LocalTier(1))
+    upload(study_text(pages=2, seed=5) + '\n\nGlaciers carve deep fjords.')
+    rejected = metrics.CACHE_REJECTED.value(cache='user_search')
+
+    assert ask_all(client, 'glaciers fjords')
+    assert metrics.CACHE_REJECTED.value(cache='user_search') == rejected + 1
@@ -0,0 +1,121 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import config
+import http_fetch
+
+# Bump when extraction or normalization changes so stale entries are ignored
+CACHE_VERSION = '1'
+
+
+class TextCache:
+    """Directory of extracted document text as UTF-8 files keyed by content
+    hash. Entries are streamed in and out (document_processor) or read
+    through mmap (text_store), never held whole in memory.
+
+    There is deliberately no in-process memory tier. Every reader streams
+    or maps the file, so the OS page cache already keeps hot entries in
+    memory, shared by all worker processes; a per-process LRU of whole
+    texts would only copy them into each worker again.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path_for(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.txt")
+
+    def disk_path(self, key):
+        """Path of the on-disk entry for key, or None if it is not cached"""
+        path = self.path_for(key)
+        return path if os.path.exists(path) else None
+
+    @contextmanager
+    def writer(self, key):
+        """Stream text into the disk entry for key.
+
+        Writes go to a temp file that replaces the entry only if the block
+        exits cleanly, so readers never see a partial entry.
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                yield file
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def discard(self, key):
+        """Drop the entry for key"""
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+
+# Hashing a large upload on every request would defeat the cache, so remember
+# the digest per (path, size, mtime), least recently used dropped first
+_file_digests = OrderedDict()
+_file_digests_lock = threading.Lock()
+
+
+def file_cache_key(filepath):
+    """SHA-256 of the file bytes, or None if the file does not exist"""
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+
+    stamp = (filepath, stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        if stamp in _file_digests:
+            _file_digests.move_to_end(stamp)
+            return _file_digests[stamp]
+
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    key = digest.hexdigest()
+
+    with _file_digests_lock:
+        _file_digests[stamp] = key
+        while len(_file_digests) > config.TEXT_DIGEST_MAX_ENTRIES:
+            _file_digests.popitem(last=False)
+    return key
+
+
+def url_cache_key(url):
+    """Hash of the page body as served through the HTTP cache.
+
+    Fetching is cheap here: a fresh or 304-revalidated entry is read from
+    the HTTP cache, and the extraction that follows reuses the same entry.
+    Returns None when the page cannot be fetched.
+    """
+    import requests
+    try:
+        result = http_fetch.fetch(url)
+    except (requests.RequestException, ValueError):
+        return None
+
+    material = '\n'.join([CACHE_VERSION, url, result.content_hash])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def cache_key_for(filepath):
+    """Content-addressed cache key for an uploaded file path or URL"""
+    if filepath.startswith(('http://', 'https://')):
+        return url_cache_key(filepath)
+    return file_cache_key(filepath)
+
+
+default_cache = TextCache(config.TEXT_CACHE_FOLDER)
@@ -0,0 +1,90 @@
+from array import array
+
+import nlp
+from nlp import word_tokenize
+
+
+def get_stopwords():
+    """English stopwords, loaded once per process"""
+    return nlp.stopwords()
+
+
+def is_content_word(word):
+    """Words worth matching on: alphabetic, longer than 2 chars, not a stopword"""
+    return word.isalpha() and len(word) > 2 and word.lower() not in get_stopwords()
+
+
+class DocumentIndex:
+    """Pre-tokenized view of one material.
+
+    Sentence i owns token_ids[offsets[i]:offsets[i + 1]], each an index into
+    vocab (lowercased). display[id] keeps the first surface form seen for a
+    term and term_counts[id] its frequency in the document. For cached text
+    only the tokens are indexed (add_tokens) and sentences is then a
+    text_store.MappedText (document_processor.map_sentences), which indexes
+    and slices like the list of strings kept otherwise.
+    """
+
+    def __init__(self):
+        self.sentences = []
+        self.vocab = []
+        self.display = []
+        self.term_ids = {}
+        self.term_counts = array('I')
+        self.token_ids = array('I')
+        self.offsets = array('I', [0])
+
+    def add_tokens(self, tokens, sentence=None):
+        """Index the next sentence from its word tokens; its text is kept
+        only when given"""
+        for token in tokens:
+            lower = token.lower()
+            term_id = self.term_ids.get(lower)
+            if term_id is None:
+                term_id = len(self.vocab)
+                self.term_ids[lower] = term_id
+                self.vocab.append(lower)
+                self.display.append(token)
+                self.term_counts.append(0)
+            self.term_counts[term_id] += 1
+            self.token_ids.append(term_id)
+
+        if sentence is not None:
+            self.sentences.append(sentence)
+        self.offsets.append(len(self.token_ids))
+
+    def add_sentence(self, sentence):
+        self.add_tokens(word_tokenize(sentence), sentence)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def word_count(self):
+        return len(self.token_ids)
+
+    def token_count(self, i):
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def sentence_term_ids(self, i):
+        return self.token_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def query_terms(self, text):
+        """Content term ids of free text that also occur in the document"""
+        ids = set()
+        for token in word_tokenize(text):
+            if is_content_word(token):
+                term_id = self.term_ids.get(token.lower())
+                if term_id is not None:
+                    ids.add(term_id)
+        return ids
+
+
+def build_document_index(sentences):
+    """Tokenize every sentence once and return a DocumentIndex"""
+    index = DocumentIndex()
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if sentence:
+            index.add_sentence(sentence)
+    return index
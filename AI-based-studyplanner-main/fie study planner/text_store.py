@@ -0,0 +1,164 @@
+"""Memory-mapped access to cached document text.
+
+Next to each cached <key>.txt the sentence index <key>.sentences holds
+little-endian uint64 (start, end) byte offsets of every sentence. Both are
+mmapped read-only, so sentences are sliced straight out of the page cache,
+which every worker process shares, rather than kept as Python strings in
+each process.
+"""
+import os
+import mmap
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+
+import config
+import text_cache
+
+_ENTRY = struct.Struct('<QQ')
+
+
+def index_path_for(key):
+    return text_cache.default_cache.path_for(key)[:-len('.txt')] + '.sentences'
+
+
+def iter_byte_offsets(blocks, offsets):
+    """UTF-8 byte offsets for ascending character offsets into the
+    concatenation of blocks"""
+    offsets = iter(offsets)
+    target = next(offsets, None)
+    char_base = byte_base = 0
+    for block in blocks:
+        ascii_only = block.isascii()
+        position = 0
+        position_bytes = 0
+        while target is not None and target <= char_base + len(block):
+            local = target - char_base
+            if ascii_only:
+                position_bytes = local
+            else:
+                position_bytes += len(block[position:local].encode('utf-8'))
+            position = local
+            yield byte_base + position_bytes
+            target = next(offsets, None)
+        char_base += len(block)
+        byte_base += len(block.encode('utf-8')) if not ascii_only else len(block)
+    if target is not None:
+        raise ValueError("Offset beyond end of text")
+
+
+def write_sentence_index(key, blocks, starts, ends):
+    """Write the byte-offset sentence index for a cached text.
+
+    blocks is the cached text; starts/ends are the content model's
+    character offsets.
+    """
+    char_offsets = (offset for pair in zip(starts, ends) for offset in pair)
+    entries = array('Q', iter_byte_offsets(blocks, char_offsets))
+    if entries.itemsize != 8:
+        raise RuntimeError("array('Q') is not 64-bit on this platform")
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        entries.byteswap()
+
+    path = index_path_for(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        entries.tofile(file)
+    os.replace(tmp_path, path)
+
+
+class MappedText:
+    """Sentences of one cached document, read through mmap.
+
+    Supports len(), indexing and slicing like the list of sentence strings
+    it replaces. Maps are opened on demand and closed by the process-wide
+    LRU in this module, so thousands of materials do not pin thousands of
+    file descriptors.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.text_path = text_cache.default_cache.path_for(key)
+        self.index_path = index_path_for(key)
+        self._maps = None
+        self._count = os.path.getsize(self.index_path) // _ENTRY.size
+
+    def __len__(self):
+        return self._count
+
+    def __reduce__(self):
+        # Pickled (e.g. into the shared cache) by key; the text stays on disk
+        return MappedText, (self.key,)
+
+    def _open(self):
+        maps = []
+        try:
+            for path in (self.text_path, self.index_path):
+                with open(path, 'rb') as file:
+                    maps.append(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        except BaseException:
+            for mapped in maps:
+                mapped.close()
+            raise
+        self._maps = tuple(maps)
+
+    def _close(self):
+        if self._maps:
+            for mapped in self._maps:
+                mapped.close()
+            self._maps = None
+
+    def _read(self, first, stop):
+        """Raw UTF-8 bytes of sentences [first, stop), one per sentence"""
+        with _open_lock:
+            _touch(self)
+            text_map, index_map = self._maps
+            chunks = []
+            for i in range(first, stop):
+                start, end = _ENTRY.unpack_from(index_map, i * _ENTRY.size)
+                chunks.append(text_map[start:end])
+        return chunks
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            first, stop, step = item.indices(self._count)
+            if step != 1:
+                return [self[i] for i in range(first, stop, step)]
+            return [data.decode('utf-8') for data in self._read(first, stop)]
+
+        if item < 0:
+            item += self._count
+        if not 0 <= item < self._count:
+            raise IndexError("sentence index out of range")
+        return self._read(item, item + 1)[0].decode('utf-8')
+
+    def __iter__(self):
+        for first in range(0, self._count, 256):
+            yield from self[first:first + 256]
+
+
+_open_maps = OrderedDict()
+_open_lock = threading.Lock()
+
+
+def _touch(mapped):
+    """Mark mapped as most recently used, opening it and closing the least
+    recently used ones over TEXT_MMAP_MAX_OPEN; called with _open_lock held"""
+    if mapped._maps is None:
+        mapped._open()
+    _open_maps[id(mapped)] = mapped
+    _open_maps.move_to_end(id(mapped))
+    while len(_open_maps) > config.TEXT_MMAP_MAX_OPEN:
+        _, evicted = _open_maps.popitem(last=False)
+        evicted._close()
+
+
+def open_text(key):
+    """MappedText for a cache key, or None if its text or index is missing"""
+    if not key:
+        return None
+    if not (os.path.exists(text_cache.default_cache.path_for(key))
+            and os.path.exists(index_path_for(key))):
+        return None
+    return MappedText(key)
@@ -0,0 +1,162 @@
+"""Search across all of a user's materials at once.
+
+Every sentence of every material is a row of a sparse matrix, one block of
+rows per material. Terms are hashed into a fixed number of columns, so a
+material's block can be added or dropped without copying the others or
+re-tokenizing anything. Rows hold L2-normalized log term frequencies; IDF
+changes as materials come and go, so it is applied to the query instead,
+and a search is one matrix-vector product per block.
+"""
+import zlib
+import threading
+from bisect import bisect_right
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from nlp import word_tokenize
+from text_index import is_content_word
+
+
+def term_column(term, num_features):
+    return zlib.crc32(term.encode('utf-8')) % num_features
+
+
+def sentence_vectors(doc_index, num_features):
+    """sentences x num_features CSR matrix of a DocumentIndex's content terms"""
+    columns = np.array([term_column(term, num_features) if is_content_word(term) else -1
+                        for term in doc_index.vocab], dtype=np.int64)
+
+    token_ids = np.frombuffer(doc_index.token_ids, dtype=np.uint32)
+    token_columns = columns[token_ids] if len(token_ids) else np.zeros(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(doc_index)), np.diff(np.frombuffer(doc_index.offsets,
+                                                                      dtype=np.uint32)))
+    keep = token_columns >= 0
+
+    # Duplicate (row, column) pairs are summed into term frequencies
+    matrix = sparse.csr_matrix(
+        (np.ones(int(keep.sum()), dtype=np.float32), (rows[keep], token_columns[keep])),
+        shape=(len(doc_index), num_features))
+    matrix.sum_duplicates()
+    matrix.data = np.log1p(matrix.data)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(np.float32)
+    return matrix
+
+
+class _Segment:
+    """One material's block of rows"""
+
+    __slots__ = ('material_id', 'vectors', 'sentences', 'columns', 'counts')
+
+    def __init__(self, material_id, vectors, sentences, columns, counts):
+        self.material_id = material_id
+        self.vectors = vectors
+        self.sentences = sentences
+        self.columns = columns
+        self.counts = counts
+
+    @property
+    def row_count(self):
+        return self.vectors.shape[0]
+
+    @property
+    def nbytes(self):
+        vectors = self.vectors
+        return vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes \
+            + self.columns.nbytes + self.counts.nbytes
+
+
+class UserSearchIndex:
+    def __init__(self, num_features):
+        self.num_features = num_features
+        self.document_frequency = np.zeros(num_features, dtype=np.int32)
+        self.segments = []
+        self._lock = threading.Lock()
+
+    def material_ids(self):
+        with self._lock:
+            return {segment.material_id for segment in self.segments}
+
+    @property
+    def nbytes(self):
+        """Memory held by the sentence vectors and term statistics"""
+        with self._lock:
+            return self.document_frequency.nbytes + sum(segment.nbytes
+                                                        for segment in self.segments)
+
+    def add(self, material_id, doc_index):
+        """Append a material's sentences, given its DocumentIndex"""
+        vectors = sentence_vectors(doc_index, self.num_features)
+        columns, counts = np.unique(vectors.indices, return_counts=True)
+
+        with self._lock:
+            if any(segment.material_id == material_id for segment in self.segments):
+                return
+            segment = _Segment(material_id, vectors, doc_index.sentences, columns,
+                               counts.astype(np.int32))
+            self.document_frequency[columns] += segment.counts
+            self.segments.append(segment)
+
+    def remove(self, material_id):
+        """Drop a material's rows"""
+        with self._lock:
+            for position, segment in enumerate(self.segments):
+                if segment.material_id == material_id:
+                    break
+            else:
+                return
+
+            self.document_frequency[segment.columns] -= segment.counts
+            del self.segments[position]
+
+    def query_vector(self, question):
+        """Dense query weights: term frequency times squared IDF, since the
+        sentence rows carry no IDF of their own"""
+        terms = Counter(token.lower() for token in word_tokenize(question)
+                        if is_content_word(token))
+        vector = np.zeros(self.num_features, dtype=np.float32)
+        num_sentences = sum(segment.row_count for segment in self.segments)
+        for term, count in terms.items():
+            column = term_column(term, self.num_features)
+            df = self.document_frequency[column]
+            if df:
+                idf = np.log((1 + num_sentences) / (1 + df)) + 1
+                vector[column] += count * idf * idf
+        return vector
+
+    def search(self, question, top_k=5, window=0):
+        """Best-scoring passages across all materials: dicts with material_id,
+        sentence_id, score and text, best first; ties go to the earlier row"""
+        with self._lock:
+            segments = list(self.segments)
+            vector = self.query_vector(question)
+        if not segments or not vector.any():
+            return []
+
+        # Rows are numbered across blocks in segment order
+        starts = np.cumsum([0] + [segment.row_count for segment in segments])[:-1].tolist()
+        scores = np.concatenate([segment.vectors @ vector for segment in segments])
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            # Everything tied with the k-th best, so the sort below breaks ties
+            kth = np.partition(scores[candidates], len(candidates) - top_k)[len(candidates) - top_k]
+            candidates = candidates[scores[candidates] >= kth]
+        ranked = sorted(candidates.tolist(), key=lambda row: (-scores[row], row))[:top_k]
+
+        results = []
+        for row in ranked:
+            position = bisect_right(starts, row) - 1
+            segment = segments[position]
+            sentence_id = row - starts[position]
+            first = max(0, sentence_id - window)
+            stop = min(segment.row_count, sentence_id + window + 1)
+            results.append({
+                'material_id': segment.material_id,
+                'sentence_id': sentence_id,
+                'score': round(float(scores[row]), 4),
+                'text': ' '.join(segment.sentences[first:stop])
+            })
+        return results